@@ -0,0 +1,51 @@
+import functools
+from typing import Dict, Optional, Tuple
+
+# Terraform addresses every known resource is imported into, keyed by the scanner that finds it
+# and the resource's key for that scanner: its CloudFormation logical id, or its name for the
+# resources that aren't in a stack (queues and repositories). {module_prefix} is the path of the
+# spacelift module for the target, see MigrationContext.module_prefix.
+ADDRESS_TEMPLATES: Dict[Tuple[str, str], Tuple[str, ...]] = {
+    ("kms", "KMSMasterKey"): ("aws_kms_key.master",),
+    ("kms", "KMSJWTKey"): ("aws_kms_key.jwt",),
+    ("kms", "KMSEncryptionPrimaryKey"): ("aws_kms_key.encryption_primary",),
+    ("kms", "KMSJWTAlias"): ("aws_kms_alias.jwt_alias",),
+    ("kms", "KMSJWTBackupKey"): ("aws_kms_key.jwt_backup_key",),
+    ("kms", "KMSEncryptionReplicaKey"): ("aws_kms_replica_key.encryption_replica_key",),
+    ("sm", "DBConnectionStringSecret"): ("aws_secretsmanager_secret.db_pw",),
+    ("sm", "SlackCredentialsSecret"): ("aws_secretsmanager_secret.slack_credentials",),
+    ("sm", "AdditionalRootCAsSecret"): (
+        "aws_secretsmanager_secret.additional_root_ca_certificates",
+    ),
+    ("sm", "ExternalValuesSecret"): ("aws_secretsmanager_secret.external",),
+    ("sm", "SAMLCredentialsSecret"): ("aws_secretsmanager_secret.saml_credentials",),
+    ("sqs", "spacelift-dlq"): ("aws_sqs_queue.deadletter_queue",),
+    ("sqs", "spacelift-dlq.fifo"): ("aws_sqs_queue.deadletter_fifo_queue",),
+    ("sqs", "spacelift-async-jobs"): ("aws_sqs_queue.async_jobs_queue",),
+    ("sqs", "spacelift-events-inbox"): ("aws_sqs_queue.events_inbox_queue",),
+    ("sqs", "spacelift-async-jobs.fifo"): ("aws_sqs_queue.async_jobs_fifo_queue",),
+    ("sqs", "spacelift-cronjobs"): ("aws_sqs_queue.cronjobs_queue",),
+    ("sqs", "spacelift-webhooks"): ("aws_sqs_queue.webhooks_queue",),
+    ("sqs", "spacelift-iot"): ("aws_sqs_queue.iot_queue",),
+    ("ecr", "spacelift"): (
+        "{module_prefix}module.ecr.aws_ecr_repository.backend",
+        "{module_prefix}module.ecr.aws_ecr_lifecycle_policy.backend[0]",
+    ),
+    ("ecr", "spacelift-launcher"): (
+        "{module_prefix}module.ecr.aws_ecr_repository.launcher",
+        "{module_prefix}module.ecr.aws_ecr_lifecycle_policy.launcher[0]",
+    ),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _addresses_for_prefix(module_prefix: str) -> Dict[Tuple[str, str], Tuple[str, ...]]:
+    # Resolved once per target, and shared by all the terraformers of that target
+    return {
+        key: tuple(template.format(module_prefix=module_prefix) for template in templates)
+        for key, templates in ADDRESS_TEMPLATES.items()
+    }
+
+
+def resolve_addresses(scanner: str, key: str, module_prefix: str) -> Optional[Tuple[str, ...]]:
+    return _addresses_for_prefix(module_prefix).get((scanner, key))
@@ -2,12 +2,15 @@ from typing import List, Dict
 
 from converters.terraformer import Terraformer
 
+from .import_registry import ImportRegistry, StackResource
 from .migration_context import MigrationContext
 
 
 class EC2Terraformer(Terraformer):
-    def __init__(self, file_path: str, migration_context: MigrationContext):
-        super().__init__(file_path, migration_context)
+    scanner = "ec2"
+
+    def __init__(self, import_registry: ImportRegistry, migration_context: MigrationContext):
+        super().__init__(import_registry, migration_context)
 
         self.vpc_resource_name = f"{self.module_prefix}module.network[0].aws_vpc.spacelift_vpc"
         self.private_subnet_resource_name_one = (
@@ -107,52 +110,75 @@ class EC2Terraformer(Terraformer):
         self.database_server_ingress_rule_resource_name = f"{self.module_prefix}module.network[0].aws_vpc_security_group_ingress_rule.database_server_ingress_rule[0]"
         self.database_scheduler_ingress_rule_resource_name = f"{self.module_prefix}module.network[0].aws_vpc_security_group_ingress_rule.database_scheduler_ingress_rule[0]"
 
+        # Resources keyed by their CloudFormation logical id, as the scanner indexes them
+        self.private_subnet_resource_names = {
+            "PrivateSubnet1": (0, self.private_subnet_resource_name_one),
+            "PrivateSubnet2": (1, self.private_subnet_resource_name_two),
+            "PrivateSubnet3": (2, self.private_subnet_resource_name_three),
+        }
+        self.public_subnet_resource_names = {
+            "PublicSubnet1": (0, self.public_subnet_resource_name_one),
+            "PublicSubnet2": (1, self.public_subnet_resource_name_two),
+            "PublicSubnet3": (2, self.public_subnet_resource_name_three),
+        }
+        self.eip_resource_names = {
+            "NATGatewayEIP1": self.eip_resource_name_one,
+            "NATGatewayEIP2": self.eip_resource_name_two,
+            "NATGatewayEIP3": self.eip_resource_name_three,
+        }
+        # Security groups imported with their egress rule
+        self.egress_security_group_resource_names = {
+            "SchedulerSecurityGroup": (
+                self.scheduler_sg_resource_name,
+                self.scheduler_sg_egress_rule_resource_name,
+            ),
+            "DrainSecurityGroup": (
+                self.drain_sg_resource_name,
+                self.drain_sg_egress_rule_resource_name,
+            ),
+            "ServerSecurityGroup": (
+                self.server_sg_resource_name,
+                self.server_sg_egress_rule_resource_name,
+            ),
+        }
+
     def uses_custom_vpc(self) -> bool:
         return (
             self.migration_context.config.vpc_config
             and self.migration_context.config.vpc_config.use_custom_vpc
         )
 
-    def vpc_to_terraform(self, vpc_id: str, cidr_block: str, tags: List[Dict]):
-        for tag in tags:
-            if tag["Key"] == "aws:cloudformation:logical-id" and tag["Value"] == "VPC":
-                self.migration_context.vpc_cidr_block = cidr_block
-                self.process(self.vpc_resource_name, vpc_id)
-
-    def subnet_to_terraform(self, subnet_id: str, cidr_block: str, tags: List[Dict]):
-        for tag in tags:
-            if tag["Key"] == "aws:cloudformation:logical-id" and tag["Value"] == "PrivateSubnet1":
-                self.migration_context.private_subnet_cidr_blocks[0] = cidr_block
-                self.process(self.private_subnet_resource_name_one, subnet_id)
-            elif tag["Key"] == "aws:cloudformation:logical-id" and tag["Value"] == "PrivateSubnet2":
-                self.migration_context.private_subnet_cidr_blocks[1] = cidr_block
-                self.process(self.private_subnet_resource_name_two, subnet_id)
-            elif tag["Key"] == "aws:cloudformation:logical-id" and tag["Value"] == "PrivateSubnet3":
-                self.migration_context.private_subnet_cidr_blocks[2] = cidr_block
-                self.process(self.private_subnet_resource_name_three, subnet_id)
-            elif tag["Key"] == "aws:cloudformation:logical-id" and tag["Value"] == "PublicSubnet1":
-                self.migration_context.public_subnet_id_1 = subnet_id
-                self.migration_context.public_subnet_cidr_blocks[0] = cidr_block
-                self.process(self.public_subnet_resource_name_one, subnet_id)
-            elif tag["Key"] == "aws:cloudformation:logical-id" and tag["Value"] == "PublicSubnet2":
-                self.migration_context.public_subnet_id_2 = subnet_id
-                self.migration_context.public_subnet_cidr_blocks[1] = cidr_block
-                self.process(self.public_subnet_resource_name_two, subnet_id)
-            elif tag["Key"] == "aws:cloudformation:logical-id" and tag["Value"] == "PublicSubnet3":
-                self.migration_context.public_subnet_id_3 = subnet_id
-                self.migration_context.public_subnet_cidr_blocks[2] = cidr_block
-                self.process(self.public_subnet_resource_name_three, subnet_id)
-
-    def internet_gateway_to_terraform(self, igw_id: str):
+    def vpc_to_terraform(self, vpc_id: str, cidr_block: str, source: StackResource):
+        if source.logical_id == "VPC":
+            self.migration_context.network.vpc_cidr_block = cidr_block
+            self.process(self.vpc_resource_name, vpc_id, source)
+
+    def subnet_to_terraform(self, subnet_id: str, cidr_block: str, source: StackResource):
+        network = self.migration_context.network
+
+        if source.logical_id in self.private_subnet_resource_names:
+            index, resource_name = self.private_subnet_resource_names[source.logical_id]
+            network.private_subnet_cidr_blocks[index] = cidr_block
+            self.process(resource_name, subnet_id, source)
+        elif source.logical_id in self.public_subnet_resource_names:
+            index, resource_name = self.public_subnet_resource_names[source.logical_id]
+            network.public_subnet_ids[index] = subnet_id
+            network.public_subnet_cidr_blocks[index] = cidr_block
+            self.process(resource_name, subnet_id, source)
+
+    def internet_gateway_to_terraform(self, igw_id: str, source: StackResource):
         self.process(
             self.internet_gateway_resource_name,
             igw_id,
+            source,
         )
 
-    def route_table_to_terraform(self, route_table: Dict, route_table_name: str):
-        if route_table_name == "Spacelift InternetGatewayRouteTable1":
+    def route_table_to_terraform(self, route_table: Dict, source: StackResource):
+        # The subnet associations are resources of the same stack. The ones of the second and
+        # third internet gateway subnets are created by first_step.sh, so they have no source.
+        if source.logical_id == "InternetGatewayRouteTable1":
             route_table_id = route_table["RouteTableId"]
-            self.migration_context.gateway1_route_table_id = route_table_id
+            self.migration_context.network.gateway1_route_table_id = route_table_id
             associations = route_table.get("Associations", [])
 
             if len(associations) != 1 and len(associations) != 3:
@@ -162,21 +188,23 @@ class EC2Terraformer(Terraformer):
             self.process(
                 self.internet_gateway_route_table_resource_name,
                 route_table_id,
+                source,
             )
             self.process(
                 self.internet_gateway_route_table_assoc1_resource_name,
-                f"{self.migration_context.public_subnet_id_1}/{route_table_id}",
+                f"{self.migration_context.network.public_subnet_ids[0]}/{route_table_id}",
+                source._replace(logical_id="InternetGatewayRouteTableSubnetAssociation1"),
             )
-        elif route_table_name == "Spacelift InternetGatewayRouteTable2":
+        elif source.logical_id == "InternetGatewayRouteTable2":
             route_table_id = route_table["RouteTableId"]
-            self.migration_context.gateway2_route_table_id = route_table_id
+            self.migration_context.network.gateway2_route_table_id = route_table_id
             associations = route_table.get("Associations", [])
 
             # The script was already ran, igw2 is now empty
             if not associations:
                 self.process(
                     self.internet_gateway_route_table_assoc2_resource_name,
-                    f"{self.migration_context.public_subnet_id_2}/{self.migration_context.gateway1_route_table_id}",
+                    f"{self.migration_context.network.public_subnet_ids[1]}/{self.migration_context.network.gateway1_route_table_id}",
                 )
                 return
 
@@ -185,12 +213,12 @@ class EC2Terraformer(Terraformer):
 
             self.process(
                 self.internet_gateway_route_table_assoc2_resource_name,
-                f"{self.migration_context.public_subnet_id_2}/{self.migration_context.gateway1_route_table_id}",
+                f"{self.migration_context.network.public_subnet_ids[1]}/{self.migration_context.network.gateway1_route_table_id}",
             )
-            self.migration_context.gateway2_association_id = associations[0][
+            self.migration_context.network.gateway2_association_id = associations[0][
                 "RouteTableAssociationId"
             ]
-        elif route_table_name == "Spacelift InternetGatewayRouteTable3":
+        elif source.logical_id == "InternetGatewayRouteTable3":
             route_table_id = route_table["RouteTableId"]
             associations = route_table.get("Associations", [])
 
@@ -198,7 +226,7 @@ class EC2Terraformer(Terraformer):
             if not associations:
                 self.process(
                     self.internet_gateway_route_table_assoc3_resource_name,
-                    f"{self.migration_context.public_subnet_id_3}/{self.migration_context.gateway1_route_table_id}",
+                    f"{self.migration_context.network.public_subnet_ids[2]}/{self.migration_context.network.gateway1_route_table_id}",
                 )
                 return
 
@@ -207,15 +235,16 @@ class EC2Terraformer(Terraformer):
 
             self.process(
                 self.internet_gateway_route_table_assoc3_resource_name,
-                f"{self.migration_context.public_subnet_id_3}/{self.migration_context.gateway1_route_table_id}",
+                f"{self.migration_context.network.public_subnet_ids[2]}/{self.migration_context.network.gateway1_route_table_id}",
             )
-            self.migration_context.gateway3_association_id = associations[0][
+            self.migration_context.network.gateway3_association_id = associations[0][
                 "RouteTableAssociationId"
             ]
-        elif route_table_name == "Spacelift NATGatewayRouteTable1":
+        elif source.logical_id == "NATGatewayRouteTable1":
             self.process(
                 self.nat_gateway_route_table_resource_name_one,
                 route_table["RouteTableId"],
+                source,
             )
             associations = route_table.get("Associations", [])
             if len(associations) != 1:
@@ -223,11 +252,13 @@ class EC2Terraformer(Terraformer):
             self.process(
                 self.nat_gateway_route_table_assoc_resource_name_one,
                 f"{associations[0]['SubnetId']}/{route_table['RouteTableId']}",
+                source._replace(logical_id=f"{source.logical_id}SubnetAssociation"),
             )
-        elif route_table_name == "Spacelift NATGatewayRouteTable2":
+        elif source.logical_id == "NATGatewayRouteTable2":
             self.process(
                 self.nat_gateway_route_table_resource_name_two,
                 route_table["RouteTableId"],
+                source,
             )
             associations = route_table.get("Associations", [])
             if len(associations) != 1:
@@ -235,11 +266,13 @@ class EC2Terraformer(Terraformer):
             self.process(
                 self.nat_gateway_route_table_assoc_resource_name_two,
                 f"{associations[0]['SubnetId']}/{route_table['RouteTableId']}",
+                source._replace(logical_id=f"{source.logical_id}SubnetAssociation"),
             )
-        elif route_table_name == "Spacelift NATGatewayRouteTable3":
+        elif source.logical_id == "NATGatewayRouteTable3":
             self.process(
                 self.nat_gateway_route_table_resource_name_three,
                 route_table["RouteTableId"],
+                source,
             )
             associations = route_table.get("Associations", [])
             if len(associations) != 1:
@@ -247,97 +280,61 @@ class EC2Terraformer(Terraformer):
             self.process(
                 self.nat_gateway_route_table_assoc_resource_name_three,
                 f"{associations[0]['SubnetId']}/{route_table['RouteTableId']}",
+                source._replace(logical_id=f"{source.logical_id}SubnetAssociation"),
             )
 
-    def elastic_ip_to_terraform(self, allocation_id: str, tags: List[Dict]):
-        for tag in tags:
-            if tag["Key"] == "aws:cloudformation:logical-id" and tag["Value"] == "NATGatewayEIP1":
-                self.process(self.eip_resource_name_one, allocation_id)
-            elif tag["Key"] == "aws:cloudformation:logical-id" and tag["Value"] == "NATGatewayEIP2":
-                self.process(self.eip_resource_name_two, allocation_id)
-            elif tag["Key"] == "aws:cloudformation:logical-id" and tag["Value"] == "NATGatewayEIP3":
-                self.process(self.eip_resource_name_three, allocation_id)
-
-    def nat_gateway_to_terraform(self, gateway_logical_id: str, gateway_id: str):
-        if gateway_logical_id == "NATGateway1":
-            self.process(self.nat_gateway_resource_name_one, gateway_id)
-        elif gateway_logical_id == "NATGateway2":
-            self.process(self.nat_gateway_resource_name_two, gateway_id)
-        elif gateway_logical_id == "NATGateway3":
-            self.process(self.nat_gateway_resource_name_three, gateway_id)
+    def elastic_ip_to_terraform(self, allocation_id: str, source: StackResource):
+        resource_name = self.eip_resource_names.get(source.logical_id)
+        if resource_name:
+            self.process(resource_name, allocation_id, source)
+
+    def nat_gateway_to_terraform(self, source: StackResource, gateway_id: str):
+        if source.logical_id == "NATGateway1":
+            self.process(self.nat_gateway_resource_name_one, gateway_id, source)
+        elif source.logical_id == "NATGateway2":
+            self.process(self.nat_gateway_resource_name_two, gateway_id, source)
+        elif source.logical_id == "NATGateway3":
+            self.process(self.nat_gateway_resource_name_three, gateway_id, source)
 
     def security_group_to_terraform(
-        self, security_group_id: str, rules: List[Dict], tags: List[Dict]
+        self, security_group_id: str, rules: List[Dict], source: StackResource
     ):
-        for tag in tags:
-            if (
-                tag["Key"] == "aws:cloudformation:logical-id"
-                and tag["Value"] == "SchedulerSecurityGroup"
-            ):
-                self.process(
-                    self.scheduler_sg_resource_name,
-                    security_group_id,
-                )
-                for rule in rules:
-                    if rule["IsEgress"] == True:
-                        self.process(
-                            self.scheduler_sg_egress_rule_resource_name,
-                            rule["SecurityGroupRuleId"],
-                        )
-            if (
-                tag["Key"] == "aws:cloudformation:logical-id"
-                and tag["Value"] == "DrainSecurityGroup"
-            ):
-                self.process(
-                    self.drain_sg_resource_name,
-                    security_group_id,
-                )
-                for rule in rules:
-                    if rule["IsEgress"] == True:
-                        self.process(
-                            self.drain_sg_egress_rule_resource_name,
-                            rule["SecurityGroupRuleId"],
-                        )
-            if (
-                tag["Key"] == "aws:cloudformation:logical-id"
-                and tag["Value"] == "ServerSecurityGroup"
-            ):
-                self.process(
-                    self.server_sg_resource_name,
-                    security_group_id,
-                )
-                for rule in rules:
-                    if rule["IsEgress"] == True:
-                        self.process(
-                            self.server_sg_egress_rule_resource_name,
-                            rule["SecurityGroupRuleId"],
-                        )
-            if (
-                tag["Key"] == "aws:cloudformation:logical-id"
-                and tag["Value"] == "DatabaseSecurityGroup"
-            ):
-                if self.migration_context.config.uses_custom_database_connection_string():
-                    # When a custom connection string is used, we don't deploy the database, nor its security group
-                    # so we can't import those resources
-                    return
+        # The rules are declared inline in their security group
+        if source.logical_id in self.egress_security_group_resource_names:
+            sg_resource_name, egress_rule_resource_name = self.egress_security_group_resource_names[
+                source.logical_id
+            ]
+            self.process(sg_resource_name, security_group_id, source)
+            for rule in rules:
+                if rule["IsEgress"] == True:
+                    self.process(egress_rule_resource_name, rule["SecurityGroupRuleId"], source)
+        elif source.logical_id == "DatabaseSecurityGroup":
+            if self.migration_context.config.uses_custom_database_connection_string():
+                # When a custom connection string is used, we don't deploy the database, nor its security group
+                # so we can't import those resources
+                return
 
-                self.process(
-                    self.database_sg_resource_name,
-                    security_group_id,
-                )
-                for rule in rules:
-                    if rule["IsEgress"] == False and "from the drain" in rule["Description"]:
-                        self.process(
-                            self.database_drain_ingress_rule_resource_name,
-                            rule["SecurityGroupRuleId"],
-                        )
-                    if rule["IsEgress"] == False and "from the server" in rule["Description"]:
-                        self.process(
-                            self.database_server_ingress_rule_resource_name,
-                            rule["SecurityGroupRuleId"],
-                        )
-                    if rule["IsEgress"] == False and "from the scheduler" in rule["Description"]:
-                        self.process(
-                            self.database_scheduler_ingress_rule_resource_name,
-                            rule["SecurityGroupRuleId"],
-                        )
+            self.process(
+                self.database_sg_resource_name,
+                security_group_id,
+                source,
+            )
+            for rule in rules:
+                if rule["IsEgress"] == False and "from the drain" in rule["Description"]:
+                    self.process(
+                        self.database_drain_ingress_rule_resource_name,
+                        rule["SecurityGroupRuleId"],
+                        source,
+                    )
+                if rule["IsEgress"] == False and "from the server" in rule["Description"]:
+                    self.process(
+                        self.database_server_ingress_rule_resource_name,
+                        rule["SecurityGroupRuleId"],
+                        source,
+                    )
+                if rule["IsEgress"] == False and "from the scheduler" in rule["Description"]:
+                    self.process(
+                        self.database_scheduler_ingress_rule_resource_name,
+                        rule["SecurityGroupRuleId"],
+                        source,
+                    )
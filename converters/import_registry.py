@@ -0,0 +1,183 @@
+import datetime
+import json
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+_INDEX_PATTERN = re.compile(r"\[[^\]]*\]")
+# module.spacelift.module.network[0].aws_eip.eips[2] -> (module.spacelift...aws_eip.eips, 2)
+_TRAILING_INDEX_PATTERN = re.compile(r"^(.*)\[(\d+)\]$")
+
+
+class ImportConflictError(Exception):
+    pass
+
+
+# CloudFormation resource an import comes from, recorded by the scanner that resolved it
+class StackResource(NamedTuple):
+    stack: str
+    logical_id: str
+
+
+def _resource_type(address: str) -> str:
+    # module.spacelift.module.s3.aws_s3_bucket.deliveries[0] -> aws_s3_bucket
+    return _INDEX_PATTERN.sub("", address).split(".")[-2]
+
+
+def group_local_name(resource_address: str) -> str:
+    # module.spacelift.module.network[0].aws_eip.eips -> spacelift_network_0_aws_eip_eips_imports
+    parts = [part for part in re.split(r"[^\w]+", resource_address) if part and part != "module"]
+    return "_".join(parts + ["imports"])
+
+
+def _run_timestamp(source_date_epoch: Optional[int]) -> str:
+    # SOURCE_DATE_EPOCH pins it, for reproducible outputs and bundles
+    if source_date_epoch is not None:
+        moment = datetime.datetime.fromtimestamp(source_date_epoch, datetime.timezone.utc)
+    else:
+        moment = datetime.datetime.now(datetime.timezone.utc)
+    return moment.isoformat(timespec="milliseconds")
+
+
+def _without_timestamps(manifest: str) -> List[Dict]:
+    records = [json.loads(line) for line in manifest.splitlines()]
+    for record in records:
+        record.pop("timestamp", None)
+    return records
+
+
+class ImportRegistry:
+    # Collects the import blocks of every terraformer in memory, so the imports file is rendered
+    # once at the end of the run, sorted by address no matter which scanner finished first.
+    # Conflicting imports are rejected as soon as they are added instead of at terraform plan.
+    def __init__(self, source_date_epoch: Optional[int] = None):
+        self._by_address: Dict[str, str] = {}
+        # Several resource types import the same id, e.g. a bucket and its versioning both
+        # use the bucket name, so ids only have to be unique per resource type
+        self._by_id: Dict[Tuple[str, str], str] = {}
+        # Address -> (scanner, stack resource) of the import, for the manifest
+        self._sources: Dict[str, Tuple[str, Optional[StackResource]]] = {}
+        # One timestamp for the whole run, so the manifest only changes when the imports do
+        self._pinned_timestamp = source_date_epoch is not None
+        self.timestamp = _run_timestamp(source_date_epoch)
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        address: str,
+        import_id: str,
+        scanner: str = "",
+        source: Optional[StackResource] = None,
+    ) -> None:
+        id_key = (_resource_type(address), import_id)
+
+        with self._lock:
+            existing_id = self._by_address.get(address)
+            if existing_id is not None and existing_id != import_id:
+                raise ImportConflictError(
+                    f"{address} is imported twice, with id '{existing_id}' and '{import_id}'"
+                )
+
+            existing_address = self._by_id.get(id_key)
+            if existing_address is not None and existing_address != address:
+                raise ImportConflictError(
+                    f"'{import_id}' is imported twice, into {existing_address} and {address}"
+                )
+
+            self._by_address[address] = import_id
+            self._by_id[id_key] = address
+            self._sources.setdefault(address, (scanner, source))
+
+    def imports(self) -> List[Tuple[str, str]]:
+        # (address, id) of every import, sorted by address
+        with self._lock:
+            return sorted(self._by_address.items())
+
+    def render_manifest(self, previous: Optional[str] = None) -> str:
+        # One JSON object per line and per import, sorted by address like the imports file
+        with self._lock:
+            sources = dict(self._sources)
+
+        lines = []
+        for address, import_id in self.imports():
+            scanner, source = sources[address]
+            record = {
+                "address": address,
+                "id": import_id,
+                "stack": source.stack if source else None,
+                "logical_id": source.logical_id if source else None,
+                "scanner": scanner or None,
+                "timestamp": self.timestamp,
+            }
+            lines.append(json.dumps(record) + "\n")
+        manifest = "".join(lines)
+
+        # Without a pinned timestamp, the manifest of the previous run is kept as long as the
+        # imports are the same, otherwise it would never be up to date
+        if previous is not None and not self._pinned_timestamp:
+            try:
+                if _without_timestamps(previous) == _without_timestamps(manifest):
+                    return previous
+            except ValueError:
+                pass
+        return manifest
+
+    def grouped_imports(self) -> Tuple[List[Tuple[str, str]], Dict[str, List[Tuple[int, str]]]]:
+        # Splits the imports into single ones, and groups of instances of the same counted
+        # resource (subnets, NAT gateways, EIPs, ...) keyed by the resource address. An import
+        # block's for_each can only vary the instance key, not the resource, so this is all
+        # that can be grouped.
+        by_resource: Dict[str, List[Tuple[int, str, str]]] = {}
+        single: List[Tuple[str, str]] = []
+        for address, import_id in self.imports():
+            match = _TRAILING_INDEX_PATTERN.match(address)
+            if match is None:
+                single.append((address, import_id))
+                continue
+            by_resource.setdefault(match.group(1), []).append(
+                (int(match.group(2)), address, import_id)
+            )
+
+        groups: Dict[str, List[Tuple[int, str]]] = {}
+        for resource_address, instances in by_resource.items():
+            if len(instances) == 1:
+                single += [(address, import_id) for _, address, import_id in instances]
+            else:
+                groups[resource_address] = sorted(
+                    (index, import_id) for index, _, import_id in instances
+                )
+        return sorted(single), groups
+
+    def render(self, compact: bool = False) -> str:
+        if not compact:
+            return "".join(
+                f'import {{\n  to = {address}\n  id = "{import_id}"\n}}\n\n'
+                for address, import_id in self.imports()
+            )
+
+        single, groups = self.grouped_imports()
+        blocks = [
+            (address, f'import {{\n  to = {address}\n  id = "{import_id}"\n}}\n\n')
+            for address, import_id in single
+        ]
+        locals_entries = []
+        for resource_address, instances in groups.items():
+            local_name = group_local_name(resource_address)
+            entries = "".join(
+                f'    {{ index = {index}, id = "{import_id}" }},\n'
+                for index, import_id in instances
+            )
+            locals_entries.append(f"  {local_name} = [\n{entries}  ]\n")
+            blocks.append(
+                (
+                    resource_address,
+                    f"import {{\n  for_each = local.{local_name}\n"
+                    f"  to       = {resource_address}[each.value.index]\n"
+                    f"  id       = each.value.id\n}}\n\n",
+                )
+            )
+
+        rendered = "".join(block for _, block in sorted(blocks))
+        if locals_entries:
+            rendered = "locals {\n" + "".join(locals_entries) + "}\n\n" + rendered
+        return rendered
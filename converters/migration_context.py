@@ -1,6 +1,27 @@
+import dataclasses
+import marshal
 from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
 
-from utils.config import AppConfig
+from utils.config import AppConfig, app_config_from_dict
+
+# Bumped whenever the serialized layout below changes, older checkpoints are then rejected
+CONTEXT_FORMAT_VERSION = 1
+
+# Keys of the buckets in S3State.buckets, the same names the generated s3_bucket_configuration uses
+S3_BUCKET_KEYS = (
+    "binaries",
+    "deliveries",
+    "large_queue",
+    "metadata",
+    "modules",
+    "policy",
+    "run_logs",
+    "states",
+    "uploads",
+    "user_uploads",
+    "workspace",
+)
 
 
 class TargetType(Enum):
@@ -8,73 +29,129 @@ class TargetType(Enum):
     EKS = "eks"
 
 
+class _Slotted:
+    # Base of the context groups: fixed attributes, no per-instance __dict__, and a flat tuple
+    # form of the attributes (in __slots__ order) for serialization
+    __slots__ = ()
+
+    def to_tuple(self) -> Tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    @classmethod
+    def from_tuple(cls, values: Tuple) -> Any:
+        instance = cls()
+        for name, value in zip(cls.__slots__, values):
+            setattr(instance, name, value)
+        return instance
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and self.to_tuple() == other.to_tuple()
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+class S3BucketState(_Slotted):
+    __slots__ = ("name", "expiration_days", "replica_arn")
+
+    def __init__(self):
+        self.name: Optional[str] = None
+        self.expiration_days: Optional[str] = None
+        # Only set for the replicated buckets of a primary installation with replication enabled
+        self.replica_arn: Optional[str] = None
+
+
+class S3State(_Slotted):
+    __slots__ = ("buckets", "cors_origin")
+
+    def __init__(self):
+        self.buckets: Dict[str, S3BucketState] = {key: S3BucketState() for key in S3_BUCKET_KEYS}
+        # Website origin, taken from the CORS configuration of the uploads bucket
+        self.cors_origin: Optional[str] = None
+
+    def to_tuple(self) -> Tuple:
+        return ({key: bucket.to_tuple() for key, bucket in self.buckets.items()}, self.cors_origin)
+
+    @classmethod
+    def from_tuple(cls, values: Tuple) -> "S3State":
+        buckets, cors_origin = values
+        instance = cls()
+        instance.buckets = {
+            key: S3BucketState.from_tuple(bucket) for key, bucket in buckets.items()
+        }
+        instance.cors_origin = cors_origin
+        return instance
+
+
+class ReplicationState(_Slotted):
+    __slots__ = ("role_name", "policy_name", "region_name", "region_key_kms_arn")
+
+    def __init__(self):
+        self.role_name: Optional[str] = None
+        self.policy_name: Optional[str] = None
+        self.region_name: Optional[str] = None
+        self.region_key_kms_arn: Optional[str] = None
+
+
+class NetworkState(_Slotted):
+    __slots__ = (
+        "vpc_cidr_block",
+        "private_subnet_cidr_blocks",
+        "public_subnet_cidr_blocks",
+        "public_subnet_ids",
+        "gateway1_route_table_id",
+        "gateway2_association_id",
+        "gateway3_association_id",
+        "gateway2_route_table_id",
+        "gateway3_route_table_id",
+    )
+
+    def __init__(self):
+        self.vpc_cidr_block: Optional[str] = None
+        self.private_subnet_cidr_blocks: List[str] = ["", "", ""]
+        self.public_subnet_cidr_blocks: List[str] = ["", "", ""]
+        self.public_subnet_ids: List[Optional[str]] = [None, None, None]
+        self.gateway1_route_table_id: Optional[str] = None
+        self.gateway2_association_id: Optional[str] = None
+        self.gateway3_association_id: Optional[str] = None
+        self.gateway2_route_table_id: Optional[str] = None
+        self.gateway3_route_table_id: Optional[str] = None
+
+
+class RDSState(_Slotted):
+    __slots__ = (
+        "engine_version",
+        "preferred_backup_window",
+        "instance_identifier",
+        "instance_class",
+        "parameter_group_name",
+        "parameter_group_description",
+    )
+
+    def __init__(self):
+        self.engine_version: Optional[str] = None
+        self.preferred_backup_window: Optional[str] = None
+        self.instance_identifier: Optional[str] = None
+        self.instance_class: Optional[str] = None
+        self.parameter_group_name: Optional[str] = None
+        self.parameter_group_description: Optional[str] = None
+
+
 class MigrationContext:
+    __slots__ = ("target", "config", "s3", "replication", "network", "rds")
+
     def __init__(self):
         self.target: TargetType = TargetType.ECS
 
         # App config loaded from the SH v2 config file
         self.config: AppConfig = None
 
-        # S3 bucket names
-        self.binaries_bucket_name: str | None = None
-        self.deliveries_bucket_name: str | None = None
-        self.large_queue_name: str | None = None
-        self.metadata_bucket_name: str | None = None
-        self.modules_bucket_name: str | None = None
-        self.policy_bucket_name: str | None = None
-        self.run_logs_bucket_name: str | None = None
-        self.states_bucket_name: str | None = None
-        self.uploads_bucket_name: str | None = None
-        self.user_uploads_bucket_name: str | None = None
-        self.workspace_bucket_name: str | None = None
-
-        # S3 bucket expirations
-        self.binaries_bucket_expiration_days: str | None = None
-        self.deliveries_bucket_expiration_days: str | None = None
-        self.large_queue_name: str | None = None
-        self.metadata_bucket_expiration_days: str | None = None
-        self.modules_bucket_expiration_days: str | None = None
-        self.policy_bucket_expiration_days: str | None = None
-        self.run_logs_bucket_expiration_days: str | None = None
-        self.states_bucket_expiration_days: str | None = None
-        self.uploads_bucket_expiration_days: str | None = None
-        self.user_uploads_bucket_expiration_days: str | None = None
-        self.workspace_bucket_expiration_days: str | None = None
-
-        # S3 replication configuration
-        self.s3_replication_role_name: str | None = None
-        self.s3_replication_policy_name: str | None = None
-        self.s3_replica_region_name: str | None = None
-        self.s3_replica_region_key_kms_arn: str | None = None
-        self.s3_states_bucket_replica_arn: str | None = None
-        self.s3_run_logs_bucket_replica_arn: str | None = None
-        self.s3_modules_bucket_replica_arn: str | None = None
-        self.s3_policy_input_bucket_replica_arn: str | None = None
-        self.s3_workspace_bucket_replica_arn: str | None = None
-
-        # Website configuration
-        self.cors_origin: str | None = None
-
-        # VPC and network configuration
-        self.vpc_cidr_block: str | None = None
-        self.private_subnet_cidr_blocks: list[str] = ["", "", ""]
-        self.public_subnet_cidr_blocks: list[str] = ["", "", ""]
-        self.public_subnet_id_1: str | None = None
-        self.public_subnet_id_2: str | None = None
-        self.public_subnet_id_3: str | None = None
-        self.gateway1_route_table_id: str | None = None
-        self.gateway2_association_id: str | None = None
-        self.gateway3_association_id: str | None = None
-        self.gateway2_route_table_id: str | None = None
-        self.gateway3_route_table_id: str | None = None
-
-        # RDS configuration
-        self.rds_engine_version: str | None = None
-        self.rds_preferred_backup_window: str | None = None
-        self.rds_instance_identifier: str | None = None
-        self.rds_instance_class: str | None = None
-        self.rds_parameter_group_name: str | None = None
-        self.rds_parameter_group_description: str | None = None
+        # What the terraformers found while scanning, read by the generators afterwards
+        self.s3 = S3State()
+        self.replication = ReplicationState()
+        self.network = NetworkState()
+        self.rds = RDSState()
 
     @property
     def module_prefix(self) -> str:
@@ -87,3 +164,52 @@ class MigrationContext:
         if self.target == TargetType.EKS:
             return "module.spacelift_eks"
         return "module.spacelift"
+
+    def dumps(self) -> bytes:
+        # marshal only takes builtin types, so the groups are flattened to tuples first. Its
+        # format may change between Python versions, these are checkpoints, not archives.
+        config = _drop_none(dataclasses.asdict(self.config)) if self.config is not None else None
+        return marshal.dumps(
+            (
+                CONTEXT_FORMAT_VERSION,
+                self.target.value,
+                config,
+                self.s3.to_tuple(),
+                self.replication.to_tuple(),
+                self.network.to_tuple(),
+                self.rds.to_tuple(),
+            )
+        )
+
+    @classmethod
+    def loads(cls, data: bytes) -> "MigrationContext":
+        try:
+            values = marshal.loads(data)
+        except (EOFError, ValueError, TypeError) as e:
+            raise ValueError(f"Invalid serialized migration context: {e}")
+
+        if not isinstance(values, tuple) or not values or values[0] != CONTEXT_FORMAT_VERSION:
+            version = values[0] if isinstance(values, tuple) and values else None
+            raise ValueError(
+                f"Serialized migration context has format version {version}, "
+                f"expected {CONTEXT_FORMAT_VERSION}"
+            )
+
+        _, target, config, s3, replication, network, rds = values
+        context = cls()
+        context.target = TargetType(target)
+        context.config = app_config_from_dict(config) if config is not None else None
+        context.s3 = S3State.from_tuple(s3)
+        context.replication = ReplicationState.from_tuple(replication)
+        context.network = NetworkState.from_tuple(network)
+        context.rds = RDSState.from_tuple(rds)
+        return context
+
+
+def _drop_none(value: Any) -> Any:
+    # Unset config sections are left out, as they are in the config file itself
+    if isinstance(value, dict):
+        return {key: _drop_none(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [_drop_none(item) for item in value]
+    return value
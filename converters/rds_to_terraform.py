@@ -1,10 +1,13 @@
 from converters.terraformer import Terraformer
+from .import_registry import ImportRegistry, StackResource
 from .migration_context import MigrationContext
 
 
 class RDSTerraformer(Terraformer):
-    def __init__(self, file_path: str, migration_context: MigrationContext):
-        super().__init__(file_path, migration_context)
+    scanner = "rds"
+
+    def __init__(self, import_registry: ImportRegistry, migration_context: MigrationContext):
+        super().__init__(import_registry, migration_context)
 
         self.db_subnet_group_resource_name = (
             f"{self.module_prefix}module.rds[0].aws_db_subnet_group.db_subnet_group"
@@ -24,23 +27,30 @@ class RDSTerraformer(Terraformer):
             # The user handles their own database outside of Cloudformation
             return
 
-        self.migration_context.rds_engine_version = cluster["EngineVersion"]
-        self.migration_context.rds_preferred_backup_window = cluster["PreferredBackupWindow"]
-        self.migration_context.rds_instance_identifier = instance["DBInstanceIdentifier"]
-        self.migration_context.rds_instance_class = instance["DBInstanceClass"]
-        self.migration_context.rds_parameter_group_name = param_group["DBClusterParameterGroupName"]
-        self.migration_context.rds_parameter_group_description = param_group["Description"]
+        self.migration_context.rds.engine_version = cluster["EngineVersion"]
+        self.migration_context.rds.preferred_backup_window = cluster["PreferredBackupWindow"]
+        self.migration_context.rds.instance_identifier = instance["DBInstanceIdentifier"]
+        self.migration_context.rds.instance_class = instance["DBInstanceClass"]
+        self.migration_context.rds.parameter_group_name = param_group["DBClusterParameterGroupName"]
+        self.migration_context.rds.parameter_group_description = param_group["Description"]
 
         self.process(
             self.db_subnet_group_resource_name,
             "spacelift",
+            StackResource("spacelift-infra-db", "DBSubnetGroup"),
+        )
+        self.process(
+            self.db_cluster_resource_name,
+            "spacelift",
+            StackResource("spacelift-infra-db", "DBCluster"),
         )
-        self.process(self.db_cluster_resource_name, "spacelift")
         self.process(
             self.db_instance_resource_name,
             instance["DBInstanceIdentifier"],
+            StackResource("spacelift-infra-db", "DBInstance"),
         )
         self.process(
             self.parameter_group_resource_name,
-            self.migration_context.rds_parameter_group_name,
+            self.migration_context.rds.parameter_group_name,
+            StackResource("spacelift-infra-db", "DBClusterParameterGroup"),
         )
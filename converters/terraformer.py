@@ -1,20 +1,38 @@
 from abc import ABC
+from typing import Optional
 
+from converters.address_registry import resolve_addresses
+from converters.import_registry import ImportRegistry, StackResource
 from converters.migration_context import MigrationContext
 
 
 class Terraformer(ABC):
-    def __init__(self, file_path: str, migration_context: MigrationContext):
-        self.file_path = file_path
+    # Name of the scanner feeding this terraformer, recorded with each of its imports
+    scanner = ""
+
+    def __init__(self, import_registry: ImportRegistry, migration_context: MigrationContext):
+        self.import_registry = import_registry
         self.migration_context = migration_context
         self.module_prefix = migration_context.module_prefix
 
-    def process(self, resource_name: str, to: str):
-        with open(self.file_path, "a") as f:
-            f.write("import {\n")
-            f.write(f"  to = {resource_name}\n")
-            f.write(f'  id = "{to}"\n')
-            f.write("}\n\n")
+    def process(self, resource_name: str, to: str, source: Optional[StackResource] = None):
+        self.import_registry.add(resource_name, to, self.scanner, source)
+
+    def process_mapped(
+        self, key: str, import_id: str, source: Optional[StackResource] = None
+    ) -> bool:
+        # Imports the resource into the addresses mapped to (scanner, key) in the address registry
+        addresses = resolve_addresses(self.scanner, key, self.module_prefix)
+        if addresses is None:
+            print(
+                f" > Warning: no Terraform address is mapped to {self.scanner} resource "
+                f"'{key}' ({import_id}), it won't be imported"
+            )
+            return False
+
+        for address in addresses:
+            self.process(address, import_id, source)
+        return True
 
     def is_primary_region(self) -> bool:
         return self.migration_context.config.is_primary_region()
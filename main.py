@@ -1,7 +1,8 @@
 import boto3
+import os
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 from packaging import version
 
 from converters.ecr_to_terraform import ECRTerraformer
@@ -11,54 +12,86 @@ from converters.s3_to_terraform import S3Terraformer
 from converters.kms_to_terraform import KMSTerraformer
 from converters.ec2_to_terraform import EC2Terraformer
 from converters.sm_to_terraform import SMTerraformer
+from converters.import_registry import ImportRegistry
 from converters.migration_context import MigrationContext, TargetType
 
 from converters.sqs_to_terraform import SQSTerraformer
 from scanners.iot_scanner import scan_iot_resources
 from scanners.sqs_scanner import scan_sqs_resources
 from utils.cli import parse_args
-from utils.aws import create_session, get_ssm_parameter
+from utils.aws import (
+    configure_clients,
+    create_offline_session,
+    create_session,
+    get_client,
+    get_ssm_parameter,
+    report_rate_limits,
+)
 from scanners.s3_scanner import scan_s3_resources
 from scanners.kms_scanner import scan_kms_resources
 from scanners.ec2_scanner import scan_ec2_resources
 from scanners.ecr_scanner import scan_ecr_resources
 from scanners.rds_scanner import scan_rds_resources
 from scanners.sm_scanner import scan_sm_resources
+from scanners.cloudformation_helper import (
+    SPACELIFT_STACKS,
+    clear_stack_resource_indexes,
+    prefetch_stacks,
+)
 from utils.terraform_generator import generate_tf_files
+from utils.scheduler import run_concurrently
 from utils.config import load_app_config
+from utils import terraform_json
+from utils.output_writer import BundleWriter, OutputWriter
+from utils.snapshot import SnapshotRecorder, SnapshotReplayer
 
 
-def initialize_output_dir(output_dir: str) -> str:
+def initialize_output_dir(output_dir: str, incremental: bool = False) -> OutputWriter:
     output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
 
-    existing_files = list(output_path.iterdir())
-    if existing_files:
+    # Incremental runs only replace the files whose content changed, there's nothing to confirm
+    existing_files = list(output_path.iterdir()) if output_path.is_dir() else []
+    if existing_files and not incremental:
         print(
-            f"\n    !!! Warning: Output directory '{output_dir}' is not empty. You will lose all {len(existing_files)} file(s) if you continue.\n"
+            f"\n    !!! Warning: Output directory '{output_dir}' is not empty. The files generated by this tool will be replaced, any other file (e.g. the terraform state) is kept.\n"
         )
         confirmation = input("Continue? (y/n): ")
         if confirmation.lower() != "y":
             print("Operation cancelled.")
             sys.exit(0)
 
-    f = output_path / "imports.tf"
-    f.unlink(missing_ok=True)
-    f.touch()
+    return OutputWriter(output_dir, incremental)
 
-    return str(f)
 
+def get_source_date_epoch() -> Optional[int]:
+    # https://reproducible-builds.org/specs/source-date-epoch/
+    value = os.environ.get("SOURCE_DATE_EPOCH")
+    if not value:
+        return None
 
-def initialize_terraformers(terraform_file: str, context: MigrationContext) -> tuple:
+    try:
+        source_date_epoch = int(value)
+    except ValueError:
+        source_date_epoch = -1
+    if source_date_epoch < 0:
+        print(
+            f"Error: SOURCE_DATE_EPOCH must be a number of seconds since 1970-01-01 00:00:00 UTC, "
+            f"but is '{value}'"
+        )
+        sys.exit(1)
+    return source_date_epoch
+
+
+def initialize_terraformers(import_registry: ImportRegistry, context: MigrationContext) -> tuple:
     return (
-        EC2Terraformer(terraform_file, context),
-        KMSTerraformer(terraform_file, context),
-        S3Terraformer(terraform_file, context),
-        ECRTerraformer(terraform_file, context),
-        RDSTerraformer(terraform_file, context),
-        SMTerraformer(terraform_file, context),
-        IOTTerraformer(terraform_file, context),
-        SQSTerraformer(terraform_file, context),
+        S3Terraformer(import_registry, context),
+        KMSTerraformer(import_registry, context),
+        EC2Terraformer(import_registry, context),
+        ECRTerraformer(import_registry, context),
+        SMTerraformer(import_registry, context),
+        RDSTerraformer(import_registry, context),
+        IOTTerraformer(import_registry, context),
+        SQSTerraformer(import_registry, context),
     )
 
 
@@ -105,48 +138,106 @@ def get_unique_suffix(session: boto3.Session) -> str:
 
 
 def main(
-    config_path: str, profile: Optional[str], output_dir: str, target_module: str = "ecs"
+    config_path: str,
+    profile: Optional[str],
+    output_dir: str,
+    target_module: str = "ecs",
+    concurrency: int = 4,
+    s3_concurrency: int = 8,
+    rate_limits: Optional[Dict[str, float]] = None,
+    record_path: Optional[str] = None,
+    replay_path: Optional[str] = None,
+    endpoint_url: Optional[str] = None,
+    incremental: bool = False,
+    output_format: str = "hcl",
+    compact_imports: bool = False,
+    bundle_path: Optional[str] = None,
 ) -> None:
     config = load_app_config(config_path)
+    source_date_epoch = get_source_date_epoch()
 
-    session = create_session(config.aws_region, profile)
+    snapshot = None
+    if record_path:
+        snapshot = SnapshotRecorder(record_path)
+    elif replay_path:
+        snapshot = SnapshotReplayer(replay_path)
+        print(f"Replaying AWS responses from {replay_path}, AWS won't be called.")
+
+    configure_clients(max(concurrency, s3_concurrency), rate_limits, snapshot, endpoint_url)
+    if replay_path:
+        session = create_offline_session(config.aws_region)
+    else:
+        session = create_session(config.aws_region, profile)
+    clear_stack_resource_indexes()
+    prefetch_stacks(get_client(session, "cloudformation"), SPACELIFT_STACKS, concurrency)
 
     check_version_requirement(session)
     unique_suffix = get_unique_suffix(session)
 
-    terraform_file = initialize_output_dir(output_dir)
+    if bundle_path:
+        output = BundleWriter(bundle_path, source_date_epoch)
+    else:
+        output = initialize_output_dir(output_dir, incremental)
+    import_registry = ImportRegistry(source_date_epoch)
     migration_context = MigrationContext()
     migration_context.target = TargetType(target_module)
     migration_context.config = config
 
     (
-        ec2_terraformer,
-        kms_terraformer,
         s3_terraformer,
+        kms_terraformer,
+        ec2_terraformer,
         ecr_terraformer,
-        rds_terraformer,
         sm_terraformer,
+        rds_terraformer,
         iot_terraformer,
         sqs_terraformer,
-    ) = initialize_terraformers(terraform_file, migration_context)
+    ) = initialize_terraformers(import_registry, migration_context)
 
     print("Alright, let's start scanning for resources...")
 
-    scan_s3_resources(session, unique_suffix, s3_terraformer)
-    scan_kms_resources(session, kms_terraformer)
-    scan_ec2_resources(session, ec2_terraformer)
-    scan_ecr_resources(ecr_terraformer)
-    scan_sm_resources(session, sm_terraformer)
-    scan_rds_resources(session, rds_terraformer)
-    scan_iot_resources(iot_terraformer)
-    scan_sqs_resources(session, sqs_terraformer)
+    # The scanners touch unrelated AWS services, so they can run at the same time. Each one owns
+    # its terraformer, and the import blocks are written once all of them finished.
+    scans = [
+        lambda: scan_s3_resources(session, unique_suffix, s3_terraformer, s3_concurrency),
+        lambda: scan_kms_resources(session, kms_terraformer),
+        lambda: scan_ec2_resources(session, ec2_terraformer),
+        lambda: scan_ecr_resources(ecr_terraformer),
+        lambda: scan_sm_resources(session, sm_terraformer),
+        lambda: scan_rds_resources(session, rds_terraformer),
+        lambda: scan_iot_resources(iot_terraformer),
+        lambda: scan_sqs_resources(session, sqs_terraformer),
+    ]
+    run_concurrently(scans, concurrency)
 
-    generate_tf_files(unique_suffix, migration_context, output_dir)
+    if output_format == "json":
+        output.write_text(
+            "imports.tf.json", terraform_json.imports(import_registry, compact_imports)
+        )
+        output.remove("imports.tf")
+    else:
+        output.write_text("imports.tf", import_registry.render(compact_imports))
+        output.remove("imports.tf.json")
+    # The same imports, one JSON object per line, for tooling that shouldn't have to parse HCL
+    previous_manifest = output.read_previous("imports.jsonl") if incremental else None
+    output.write_text("imports.jsonl", import_registry.render_manifest(previous_manifest))
 
-    print(
-        f"Terraform files have been generated in the following directory: {output_dir}\n"
-        "Everything is ready to go!\n"
-    )
+    report_rate_limits()
+    if record_path:
+        snapshot.save()
+
+    generate_tf_files(unique_suffix, migration_context, output, concurrency, output_format)
+    output.commit()
+
+    if bundle_path:
+        print(
+            f"Terraform files have been bundled into: {bundle_path}\nEverything is ready to go!\n"
+        )
+    else:
+        print(
+            f"Terraform files have been generated in the following directory: {output_dir}\n"
+            "Everything is ready to go!\n"
+        )
 
 
 if __name__ == "__main__":
@@ -156,4 +247,14 @@ if __name__ == "__main__":
         profile=args.profile,
         output_dir=args.output,
         target_module=args.target_module,
+        concurrency=args.concurrency,
+        s3_concurrency=args.s3_concurrency,
+        rate_limits=dict(args.rate_limit),
+        record_path=args.record,
+        replay_path=args.replay,
+        endpoint_url=args.endpoint_url,
+        incremental=args.incremental,
+        output_format=args.format,
+        compact_imports=args.compact_imports,
+        bundle_path=args.bundle,
     )
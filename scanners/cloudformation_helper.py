@@ -1,20 +1,114 @@
-from typing import List
+import functools
+import threading
+from typing import Dict, List, Tuple
 
+from botocore.exceptions import ClientError
 
-def get_resources_from_cf_stack(cloudformation, stack_name: str, logical_ids: List[str]) -> tuple:
-    stack_resources = cloudformation.describe_stack_resources(StackName=stack_name)
+from utils.scheduler import run_concurrently
+
+# Every stack the scanners read resources from
+SPACELIFT_STACKS = [
+    "spacelift-infra",
+    "spacelift-infra-kms",
+    "spacelift-infra-s3",
+    "spacelift-infra-vpc",
+    "spacelift-infra-vpc-config",
+]
+
+
+class StackResourceIndex:
+    def __init__(self, stack_name: str, resources: List[Dict]):
+        self.stack_name = stack_name
+        self.by_logical_id: Dict[str, Dict] = {}
+
+        for res in resources:
+            self.by_logical_id[res["LogicalResourceId"]] = res
+
+    def physical_ids(self, logical_ids: List[str]) -> List[str]:
+        # The returned ids are in the same order as the logical_ids, missing ones are skipped
+        return [
+            self.by_logical_id[logical_id]["PhysicalResourceId"]
+            for logical_id in logical_ids
+            if logical_id in self.by_logical_id
+        ]
+
+    def physical_ids_by_logical_id(self, logical_ids: List[str]) -> Dict[str, str]:
+        # Same as physical_ids, keyed by the logical id
+        return {
+            logical_id: self.by_logical_id[logical_id]["PhysicalResourceId"]
+            for logical_id in logical_ids
+            if logical_id in self.by_logical_id
+        }
+
+
+# Stack resources don't change during a run, so each stack is only listed once per region
+_stack_indexes: Dict[Tuple[str, str], StackResourceIndex] = {}
+_stack_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_stack_locks_guard = threading.Lock()
+
+
+def get_stack_resource_index(cloudformation, stack_name: str) -> StackResourceIndex:
+    key = (cloudformation.meta.region_name, stack_name)
+
+    index = _stack_indexes.get(key)
+    if index is not None:
+        return index
 
-    # This is a trick to make sure the returned ids are in the same order as the logical_ids:
+    # Concurrent scanners reading the same stack wait for the first one instead of listing it again
+    with _stack_locks_guard:
+        lock = _stack_locks.setdefault(key, threading.Lock())
 
-    resource_map = {
-        res["LogicalResourceId"]: res["PhysicalResourceId"]
-        for res in stack_resources["StackResources"]
-    }
+    with lock:
+        index = _stack_indexes.get(key)
+        if index is None:
+            index = StackResourceIndex(
+                stack_name, _list_stack_resources(cloudformation, stack_name)
+            )
+            _stack_indexes[key] = index
 
-    resource_ids = []
+    return index
+
+
+def _list_stack_resources(cloudformation, stack_name: str) -> List[Dict]:
+    # describe_stack_resources stops at 100 resources, the listing is paginated instead
+    resources = []
+    paginator = cloudformation.get_paginator("list_stack_resources")
+    for page in paginator.paginate(StackName=stack_name):
+        resources.extend(page["StackResourceSummaries"])
+    return resources
+
+
+def _prefetch_stack(cloudformation, stack_name: str) -> None:
+    try:
+        get_stack_resource_index(cloudformation, stack_name)
+    except ClientError as e:
+        # Some stacks don't exist in every installation, e.g. the VPC ones with a custom VPC.
+        # Nothing is cached for them, so a scanner that does need them still fails as before.
+        if e.response["Error"]["Code"] != "ValidationError":
+            raise
+
+
+def prefetch_stacks(cloudformation, stack_names: List[str], concurrency: int) -> None:
+    # Lists all the stacks at once up front, so the scanners only do in-memory lookups later
+    run_concurrently(
+        [functools.partial(_prefetch_stack, cloudformation, name) for name in stack_names],
+        concurrency,
+    )
+
+
+def clear_stack_resource_indexes() -> None:
+    with _stack_locks_guard:
+        _stack_indexes.clear()
+        _stack_locks.clear()
+
+
+def get_resources_from_cf_stack(cloudformation, stack_name: str, logical_ids: List[str]) -> tuple:
+    return get_stack_resource_index(cloudformation, stack_name).physical_ids(logical_ids)
 
-    for logical_id in logical_ids:
-        if logical_id in resource_map:
-            resource_ids.append(resource_map[logical_id])
 
-    return resource_ids
+def get_resources_by_logical_id_from_cf_stack(
+    cloudformation, stack_name: str, logical_ids: List[str]
+) -> Dict[str, str]:
+    return get_stack_resource_index(cloudformation, stack_name).physical_ids_by_logical_id(
+        logical_ids
+    )
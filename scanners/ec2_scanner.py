@@ -1,159 +1,217 @@
-from typing import Dict, List
+import functools
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
 import boto3
 from converters.ec2_to_terraform import EC2Terraformer
+from converters.import_registry import StackResource
 from scanners.cloudformation_helper import get_resources_from_cf_stack
+from utils.aws import get_client, index_by_tag
+
+_VPC_STACK = "spacelift-infra-vpc"
+_VPC_CONFIG_STACK = "spacelift-infra-vpc-config"
+
+_PRIVATE_SUBNET_LOGICAL_IDS = ["PrivateSubnet1", "PrivateSubnet2", "PrivateSubnet3"]
+_SECURITY_GROUP_LOGICAL_IDS = [
+    "ServerSecurityGroup",
+    "DrainSecurityGroup",
+    "DatabaseSecurityGroup",
+    "SchedulerSecurityGroup",
+]
+# Everything else the scanner reads is in the VPC config stack
+_VPC_STACK_LOGICAL_IDS = ["VPC"] + _PRIVATE_SUBNET_LOGICAL_IDS + _SECURITY_GROUP_LOGICAL_IDS
+
+_ROUTE_TABLE_LOGICAL_IDS = [
+    "InternetGatewayRouteTable1",
+    "InternetGatewayRouteTable2",
+    "InternetGatewayRouteTable3",
+    "NATGatewayRouteTable1",
+    "NATGatewayRouteTable2",
+    "NATGatewayRouteTable3",
+]
 
 
 def scan_ec2_resources(session: boto3.Session, terraformer: EC2Terraformer) -> None:
     print(" > Scanning EC2 resources...")
 
-    ec2 = session.client("ec2")
-    cloudformation = session.client("cloudformation")
+    ec2 = get_client(session, "ec2")
+    cloudformation = get_client(session, "cloudformation")
 
     if not terraformer.uses_custom_vpc():
-        _scan_vpcs(ec2, cloudformation, terraformer)
-        _scan_subnets(ec2, cloudformation, terraformer)
-        _scan_internet_gateways(cloudformation, terraformer)
-        _scan_route_tables(ec2, cloudformation, terraformer)
-        _scan_elastic_ips(ec2, cloudformation, terraformer)
-        _scan_nat_gateways(ec2, cloudformation, terraformer)
-        _scan_security_groups(ec2, cloudformation, terraformer)
+        stack_resources = _find_stack_resources(cloudformation)
+        responses = [fetch() for fetch in _describe_fetches(ec2, stack_resources)]
+        _ec2_to_terraform(terraformer, stack_resources, EC2Responses(*responses))
 
 
-def _scan_vpcs(ec2, cloudformation, terraformer: EC2Terraformer) -> None:
-    [vpc_id] = get_resources_from_cf_stack(cloudformation, "spacelift-infra-vpc", ["VPC"])
-    list_resp = ec2.describe_vpcs(VpcIds=[vpc_id])
-    vpc = list_resp["Vpcs"][0]
-    terraformer.vpc_to_terraform(vpc["VpcId"], vpc["CidrBlock"], vpc.get("Tags", []))
+# Physical ids of the EC2 resources in the VPC stacks
+@dataclass
+class EC2StackResources:
+    vpc_id: str
+    subnet_ids: List[str]
+    internet_gateway_id: str
+    route_table_ids: List[str]
+    elastic_ips: List[str]
+    nat_gateway_ids: List[str]
+    security_group_ids: List[str]
 
 
-def _scan_subnets(ec2, cloudformation, terraformer: EC2Terraformer) -> None:
+def _find_stack_resources(cloudformation) -> EC2StackResources:
+    [vpc_id] = get_resources_from_cf_stack(cloudformation, _VPC_STACK, ["VPC"])
     priv_subnets = get_resources_from_cf_stack(
-        cloudformation,
-        "spacelift-infra-vpc",
-        ["PrivateSubnet1", "PrivateSubnet2", "PrivateSubnet3"],
+        cloudformation, _VPC_STACK, _PRIVATE_SUBNET_LOGICAL_IDS
     )
     pub_subnets = get_resources_from_cf_stack(
         cloudformation,
-        "spacelift-infra-vpc-config",
+        _VPC_CONFIG_STACK,
         ["PublicSubnet1", "PublicSubnet2", "PublicSubnet3"],
     )
-
-    list_resp = ec2.describe_subnets(SubnetIds=priv_subnets + pub_subnets)
-
-    for subnet in list_resp["Subnets"]:
+    [igw_id] = get_resources_from_cf_stack(cloudformation, _VPC_CONFIG_STACK, ["InternetGateway"])
+    route_table_ids = get_resources_from_cf_stack(
+        cloudformation, _VPC_CONFIG_STACK, _ROUTE_TABLE_LOGICAL_IDS
+    )
+    ips = get_resources_from_cf_stack(
+        cloudformation,
+        _VPC_CONFIG_STACK,
+        ["NATGatewayEIP1", "NATGatewayEIP2", "NATGatewayEIP3"],
+    )
+    nat_gateway_ids = get_resources_from_cf_stack(
+        cloudformation, _VPC_CONFIG_STACK, ["NATGateway1", "NATGateway2", "NATGateway3"]
+    )
+    if len(nat_gateway_ids) != 3:
+        raise ValueError(f"Expected 3 NAT gateways, but found {len(nat_gateway_ids)}")
+    security_group_ids = get_resources_from_cf_stack(
+        cloudformation, _VPC_STACK, _SECURITY_GROUP_LOGICAL_IDS
+    )
+
+    return EC2StackResources(
+        vpc_id,
+        priv_subnets + pub_subnets,
+        igw_id,
+        route_table_ids,
+        ips,
+        nat_gateway_ids,
+        security_group_ids,
+    )
+
+
+# The raw EC2 describe responses, each fetched exactly once
+@dataclass
+class EC2Responses:
+    vpcs: Dict
+    subnets: Dict
+    route_tables: Dict
+    addresses: Dict
+    security_groups: Dict
+    security_group_rules: List[Dict]
+
+
+def _describe_fetches(ec2, stack_resources: EC2StackResources) -> List[Callable[[], Any]]:
+    # In the order of the EC2Responses fields. None of them depends on another.
+    return [
+        functools.partial(ec2.describe_vpcs, VpcIds=[stack_resources.vpc_id]),
+        functools.partial(ec2.describe_subnets, SubnetIds=stack_resources.subnet_ids),
+        functools.partial(ec2.describe_route_tables, RouteTableIds=stack_resources.route_table_ids),
+        functools.partial(ec2.describe_addresses, PublicIps=stack_resources.elastic_ips),
+        functools.partial(
+            ec2.describe_security_groups, GroupIds=stack_resources.security_group_ids
+        ),
+        functools.partial(_describe_security_group_rules, ec2, stack_resources.security_group_ids),
+    ]
+
+
+def _describe_security_group_rules(ec2, group_ids: List[str]) -> List[Dict]:
+    # One paginated call for the rules of every group, grouped back by group id later
+    rules = []
+    paginator = ec2.get_paginator("describe_security_group_rules")
+    for page in paginator.paginate(Filters=[{"Name": "group-id", "Values": group_ids}]):
+        rules.extend(page["SecurityGroupRules"])
+    return rules
+
+
+def _source(logical_id: str) -> StackResource:
+    if logical_id in _VPC_STACK_LOGICAL_IDS:
+        return StackResource(_VPC_STACK, logical_id)
+    return StackResource(_VPC_CONFIG_STACK, logical_id)
+
+
+def _ec2_to_terraform(
+    terraformer: EC2Terraformer, stack_resources: EC2StackResources, responses: EC2Responses
+) -> None:
+    # The order matters: the route tables reuse the public subnets recorded before them
+    vpcs = _index_by_logical_id(responses.vpcs["Vpcs"], 1, "VPC")
+    for logical_id, vpc in vpcs.items():
+        terraformer.vpc_to_terraform(vpc["VpcId"], vpc["CidrBlock"], _source(logical_id))
+
+    subnets = _index_by_logical_id(
+        responses.subnets["Subnets"], len(stack_resources.subnet_ids), "subnets"
+    )
+    for logical_id, subnet in subnets.items():
         terraformer.subnet_to_terraform(
-            subnet["SubnetId"], subnet["CidrBlock"], subnet.get("Tags", [])
+            subnet["SubnetId"], subnet["CidrBlock"], _source(logical_id)
         )
 
-
-def _scan_internet_gateways(cloudformation, terraformer: EC2Terraformer) -> None:
-    [igw_id] = get_resources_from_cf_stack(
-        cloudformation, "spacelift-infra-vpc-config", ["InternetGateway"]
+    terraformer.internet_gateway_to_terraform(
+        stack_resources.internet_gateway_id, _source("InternetGateway")
     )
-    terraformer.internet_gateway_to_terraform(igw_id)
 
-
-def _scan_route_tables(ec2, cloudformation, terraformer: EC2Terraformer) -> None:
-    route_table_ids = get_resources_from_cf_stack(
-        cloudformation,
-        "spacelift-infra-vpc-config",
-        [
-            "InternetGatewayRouteTable1",
-            "InternetGatewayRouteTable2",
-            "InternetGatewayRouteTable3",
-            "NATGatewayRouteTable1",
-            "NATGatewayRouteTable2",
-            "NATGatewayRouteTable3",
-        ],
+    _route_tables_to_terraform(
+        terraformer, responses.route_tables, len(stack_resources.route_table_ids)
     )
-    table_resp = ec2.describe_route_tables(RouteTableIds=route_table_ids)
 
-    igw_route_table_1 = _get_route_table_by_name(
-        table_resp["RouteTables"], "InternetGatewayRouteTable1"
-    )
-    igw_route_table_2 = _get_route_table_by_name(
-        table_resp["RouteTables"], "InternetGatewayRouteTable2"
-    )
-    igw_route_table_3 = _get_route_table_by_name(
-        table_resp["RouteTables"], "InternetGatewayRouteTable3"
+    elastic_ips = _index_by_logical_id(
+        responses.addresses["Addresses"], len(stack_resources.elastic_ips), "elastic IPs"
     )
-    terraformer.route_table_to_terraform(igw_route_table_1, "Spacelift InternetGatewayRouteTable1")
-    terraformer.route_table_to_terraform(igw_route_table_2, "Spacelift InternetGatewayRouteTable2")
-    terraformer.route_table_to_terraform(igw_route_table_3, "Spacelift InternetGatewayRouteTable3")
+    for logical_id, elastic_ip in elastic_ips.items():
+        terraformer.elastic_ip_to_terraform(elastic_ip["AllocationId"], _source(logical_id))
 
-    nat_gateway_route_table_1 = _get_route_table_by_name(
-        table_resp["RouteTables"], "NATGatewayRouteTable1"
-    )
-    nat_gateway_route_table_2 = _get_route_table_by_name(
-        table_resp["RouteTables"], "NATGatewayRouteTable2"
-    )
-    nat_gateway_route_table_3 = _get_route_table_by_name(
-        table_resp["RouteTables"], "NATGatewayRouteTable3"
-    )
-    terraformer.route_table_to_terraform(
-        nat_gateway_route_table_1, "Spacelift NATGatewayRouteTable1"
-    )
-    terraformer.route_table_to_terraform(
-        nat_gateway_route_table_2, "Spacelift NATGatewayRouteTable2"
-    )
-    terraformer.route_table_to_terraform(
-        nat_gateway_route_table_3, "Spacelift NATGatewayRouteTable3"
-    )
+    for index, gateway_id in enumerate(stack_resources.nat_gateway_ids):
+        terraformer.nat_gateway_to_terraform(_source(f"NATGateway{index + 1}"), gateway_id)
 
+    _security_groups_to_terraform(terraformer, responses, len(stack_resources.security_group_ids))
 
-def _get_route_table_by_name(route_tables: List[Dict], name: str) -> Dict:
-    for route_table in route_tables:
-        tags = route_table.get("Tags", [])
 
-        if any(
-            tag["Key"] == "aws:cloudformation:logical-id" and tag["Value"] == name for tag in tags
-        ):
-            return route_table
+def _route_tables_to_terraform(
+    terraformer: EC2Terraformer, table_resp: Dict, requested: int
+) -> None:
+    route_tables = _index_by_logical_id(table_resp["RouteTables"], requested, "route tables")
 
-    raise ValueError(f"Route table with name {name} not found.")
+    # The internet gateway tables go first, the later ones reuse what the first one recorded
+    for logical_id in _ROUTE_TABLE_LOGICAL_IDS:
+        route_table = _get_route_table_by_name(route_tables, logical_id)
+        terraformer.route_table_to_terraform(route_table, _source(logical_id))
 
 
-def _scan_elastic_ips(ec2, cloudformation, terraformer: EC2Terraformer) -> None:
-    ips = get_resources_from_cf_stack(
-        cloudformation,
-        "spacelift-infra-vpc-config",
-        ["NATGatewayEIP1", "NATGatewayEIP2", "NATGatewayEIP3"],
-    )
-    elastic_ip_resp = ec2.describe_addresses(PublicIps=ips)
+def _index_by_logical_id(items: List[Dict], requested: int, kind: str) -> Dict[str, Dict]:
+    # Every requested resource comes from a stack. One that's missing from the response, or
+    # lacks its logical id tag, would otherwise silently not be imported.
+    index = index_by_tag(items)
+    if len(index) != requested:
+        raise ValueError(
+            f"Expected {requested} {kind} tagged with their CloudFormation logical id, "
+            f"but found {len(index)}"
+        )
+    return index
 
-    for elastic_ip in elastic_ip_resp["Addresses"]:
-        terraformer.elastic_ip_to_terraform(elastic_ip["AllocationId"], elastic_ip.get("Tags", []))
 
+def _get_route_table_by_name(route_tables: Dict[str, Dict], name: str) -> Dict:
+    route_table = route_tables.get(name)
+    if route_table is None:
+        raise ValueError(f"Route table with name {name} not found.")
+    return route_table
 
-def _scan_nat_gateways(ec2, cloudformation, terraformer: EC2Terraformer) -> None:
-    [gw1, gw2, gw3] = get_resources_from_cf_stack(
-        cloudformation, "spacelift-infra-vpc-config", ["NATGateway1", "NATGateway2", "NATGateway3"]
-    )
-    terraformer.nat_gateway_to_terraform("NATGateway1", gw1)
-    terraformer.nat_gateway_to_terraform("NATGateway2", gw2)
-    terraformer.nat_gateway_to_terraform("NATGateway3", gw3)
 
+def _security_groups_to_terraform(
+    terraformer: EC2Terraformer, responses: EC2Responses, requested: int
+) -> None:
+    rules_by_group: Dict[str, List[Dict]] = {}
+    for rule in responses.security_group_rules:
+        rules_by_group.setdefault(rule["GroupId"], []).append(rule)
 
-def _scan_security_groups(ec2, cloudformation, terraformer: EC2Terraformer) -> None:
-    ids = get_resources_from_cf_stack(
-        cloudformation,
-        "spacelift-infra-vpc",
-        [
-            "ServerSecurityGroup",
-            "DrainSecurityGroup",
-            "DatabaseSecurityGroup",
-            "SchedulerSecurityGroup",
-        ],
+    security_groups = _index_by_logical_id(
+        responses.security_groups["SecurityGroups"], requested, "security groups"
     )
-    security_group_resp = ec2.describe_security_groups(GroupIds=ids)
-
-    for security_group in security_group_resp["SecurityGroups"]:
-        rules = ec2.describe_security_group_rules(
-            Filters=[{"Name": "group-id", "Values": [security_group["GroupId"]]}]
-        )
+    for logical_id, security_group in security_groups.items():
         terraformer.security_group_to_terraform(
             security_group["GroupId"],
-            rules["SecurityGroupRules"],
-            security_group.get("Tags", []),
+            rules_by_group.get(security_group["GroupId"], []),
+            _source(logical_id),
         )
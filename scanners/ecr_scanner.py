@@ -1,6 +1,13 @@
 from converters.ecr_to_terraform import ECRTerraformer
+from converters.import_registry import StackResource
+
+# Repository name -> the spacelift-infra resource that created it
+_ECR_REPOSITORIES = {
+    "spacelift": StackResource("spacelift-infra", "ECRRepository"),
+    "spacelift-launcher": StackResource("spacelift-infra", "LauncherECRRepository"),
+}
 
 
 def scan_ecr_resources(terraformer: ECRTerraformer) -> None:
-    for ecr_repo in ["spacelift", "spacelift-launcher"]:
-        terraformer.ecr_to_terraform(ecr_repo)
+    for ecr_repo, source in _ECR_REPOSITORIES.items():
+        terraformer.ecr_to_terraform(ecr_repo, source)
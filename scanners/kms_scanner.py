@@ -1,34 +1,34 @@
+from typing import Dict, List
 import boto3
+from converters.import_registry import StackResource
 from converters.kms_to_terraform import KMSTerraformer
-from scanners.cloudformation_helper import get_resources_from_cf_stack
+from scanners.cloudformation_helper import get_resources_by_logical_id_from_cf_stack
+from utils.aws import get_client
 
 
 def scan_kms_resources(session: boto3.Session, terraformer: KMSTerraformer) -> None:
     print(" > Scanning KMS resources...")
 
-    cloudformation = session.client("cloudformation")
-
-    [master_key_id] = get_resources_from_cf_stack(
-        cloudformation, "spacelift-infra-kms", ["KMSMasterKey"]
-    )
-    [jwt_key_id] = get_resources_from_cf_stack(cloudformation, "spacelift-infra-kms", ["KMSJWTKey"])
-    [backup_key] = get_resources_from_cf_stack(
-        cloudformation, "spacelift-infra-kms", ["KMSJWTBackupKey"]
+    cloudformation = get_client(session, "cloudformation")
+    key_ids = get_resources_by_logical_id_from_cf_stack(
+        cloudformation, "spacelift-infra-kms", _kms_logical_ids(terraformer)
     )
-    [alias] = get_resources_from_cf_stack(cloudformation, "spacelift-infra-kms", ["KMSJWTAlias"])
+    _keys_to_terraform(terraformer, key_ids)
 
+
+def _kms_logical_ids(terraformer: KMSTerraformer) -> List[str]:
+    # The primary region owns the encryption key, the secondary one its replica
     if terraformer.is_primary_region():
-        [app_encryption_key_id] = get_resources_from_cf_stack(
-            cloudformation, "spacelift-infra-kms", ["KMSEncryptionPrimaryKey"]
-        )
-        terraformer.kms_to_terraform(app_encryption_key_id, "KMSEncryptionPrimaryKey")
+        encryption_key = "KMSEncryptionPrimaryKey"
     else:
-        [replica_key] = get_resources_from_cf_stack(
-            cloudformation, "spacelift-infra-kms", ["KMSEncryptionReplicaKey"]
-        )
-        terraformer.kms_to_terraform(replica_key, "KMSEncryptionReplicaKey")
+        encryption_key = "KMSEncryptionReplicaKey"
+    return [encryption_key, "KMSMasterKey", "KMSJWTKey", "KMSJWTBackupKey", "KMSJWTAlias"]
+
 
-    terraformer.kms_to_terraform(master_key_id, "KMSMasterKey")
-    terraformer.kms_to_terraform(jwt_key_id, "KMSJWTKey")
-    terraformer.kms_to_terraform(backup_key, "KMSJWTBackupKey")
-    terraformer.kms_to_terraform(alias, "KMSJWTAlias")
+def _keys_to_terraform(terraformer: KMSTerraformer, key_ids: Dict[str, str]) -> None:
+    for logical_id in _kms_logical_ids(terraformer):
+        if logical_id not in key_ids:
+            raise ValueError(f"{logical_id} not found in the spacelift-infra-kms stack")
+        terraformer.kms_to_terraform(
+            key_ids[logical_id], StackResource("spacelift-infra-kms", logical_id)
+        )
@@ -1,41 +1,55 @@
+from typing import Dict
 import boto3
 from converters.rds_to_terraform import RDSTerraformer
+from utils.aws import get_client
 
 
 def scan_rds_resources(session: boto3.Session, terraformer: RDSTerraformer) -> None:
     print(" > Scanning RDS resources...")
 
+    if not _should_scan(terraformer):
+        return
+
+    rds = get_client(session, "rds")
+    list_resp = rds.describe_db_clusters(DBClusterIdentifier="spacelift")
+
+    for cluster in list_resp["DBClusters"]:
+        instance_resp = rds.describe_db_instances(DBInstanceIdentifier=_member_identifier(cluster))
+        param_group_resp = rds.describe_db_cluster_parameter_groups(
+            DBClusterParameterGroupName=cluster["DBClusterParameterGroup"]
+        )
+        _cluster_to_terraform(terraformer, cluster, instance_resp, param_group_resp)
+
+
+def _should_scan(terraformer: RDSTerraformer) -> bool:
     if not terraformer.is_primary_region():
         print(
             " >   Skipping RDS resource imports in secondary region. RDS resources will be untracked by the generated project!"
         )
-        return
+        return False
 
     if terraformer.uses_custom_database_connection_string():
         print(
             " >   Skipping RDS resource imports due to custom database connection string. RDS resources will be untracked by the generated project!"
         )
-        return
+        return False
 
-    rds = session.client("rds")
-    list_resp = rds.describe_db_clusters(DBClusterIdentifier="spacelift")
+    return True
 
-    for cluster in list_resp["DBClusters"]:
-        cluster_members = cluster.get("DBClusterMembers", [])
-        if len(cluster_members) != 1:
-            raise Exception(
-                f"Expected exactly one cluster member, but found {len(cluster_members)}"
-            )
-
-        instance_resp = rds.describe_db_instances(
-            DBInstanceIdentifier=cluster_members[0]["DBInstanceIdentifier"]
-        )
-        instances = instance_resp.get("DBInstances", [])
-        if len(instances) != 1:
-            raise Exception(f"Expected exactly one instance, but found {len(instances)}")
 
-        param_group = rds.describe_db_cluster_parameter_groups(
-            DBClusterParameterGroupName=cluster["DBClusterParameterGroup"]
-        )["DBClusterParameterGroups"][0]
+def _member_identifier(cluster: Dict) -> str:
+    cluster_members = cluster.get("DBClusterMembers", [])
+    if len(cluster_members) != 1:
+        raise Exception(f"Expected exactly one cluster member, but found {len(cluster_members)}")
+    return cluster_members[0]["DBInstanceIdentifier"]
+
+
+def _cluster_to_terraform(
+    terraformer: RDSTerraformer, cluster: Dict, instance_resp: Dict, param_group_resp: Dict
+) -> None:
+    instances = instance_resp.get("DBInstances", [])
+    if len(instances) != 1:
+        raise Exception(f"Expected exactly one instance, but found {len(instances)}")
 
-        terraformer.rds_to_terraform(cluster, instances[0], param_group)
+    param_group = param_group_resp["DBClusterParameterGroups"][0]
+    terraformer.rds_to_terraform(cluster, instances[0], param_group)
@@ -1,110 +1,162 @@
-from typing import Dict, Any
+import functools
+import itertools
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, List
 import boto3
-from converters.s3_to_terraform import S3Terraformer
+from converters.import_registry import StackResource
+from converters.s3_to_terraform import BUCKET_ROLES, S3Terraformer
 from converters.migration_context import MigrationContext
-from scanners.cloudformation_helper import get_resources_from_cf_stack
+from scanners.cloudformation_helper import (
+    get_resources_by_logical_id_from_cf_stack,
+    get_resources_from_cf_stack,
+)
+from utils.aws import get_client
+from utils.scheduler import run_concurrently
+
+BUCKET_LOGICAL_IDS = [role.logical_id for role in BUCKET_ROLES]
 
 
 def scan_s3_resources(
-    session: boto3.Session, unique_suffix: str, terraformer: S3Terraformer
+    session: boto3.Session, unique_suffix: str, terraformer: S3Terraformer, concurrency: int = 8
 ) -> None:
     # Get the migration context which has the config
     migration_context = terraformer.migration_context
     print(" > Scanning S3 resources...")
 
-    cloudformation = session.client("cloudformation")
-    bucket_names = get_resources_from_cf_stack(
-        cloudformation,
-        "spacelift-infra-s3",
-        [
-            "DeliveriesBucket",
-            "DownloadsBucket",
-            "LargeQueueMessagesBucket",
-            "MetadataBucket",
-            "ModulesBucket",
-            "PolicyInputsBucket",
-            "RunLogsBucket",
-            "StatesBucket",
-            "UploadsBucket",
-            "UserUploadedWorkspacesBucket",
-            "WorkspacesBucket",
-        ],
+    cloudformation = get_client(session, "cloudformation")
+    bucket_names = get_resources_by_logical_id_from_cf_stack(
+        cloudformation, "spacelift-infra-s3", BUCKET_LOGICAL_IDS
     )
 
-    s3 = session.client("s3")
-
-    for bucket_name in bucket_names:
-        bucket_expiration = _get_bucket_expiration(s3, bucket_name)
-        versioning_status = _get_versioning_status(s3, bucket_name)
-        sse_enabled = _is_sse_enabled(s3, bucket_name)
-        lifecycle_enabled = _is_lifecycle_enabled(s3, bucket_name)
-        public_access_blocked = _is_public_access_blocked(s3, bucket_name)
-        cors_rules = _get_bucket_cors(s3, bucket_name).get("CORSRules", [])
-        bucket_replication_rules = (
-            _get_bucket_replication(s3, bucket_name)
-            .get("ReplicationConfiguration", {})
-            .get("Rules", [])
-        )
+    s3 = get_client(session, "s3")
 
-        terraformer.s3_to_terraform(
-            bucket_name,
-            bucket_expiration,
-            versioning_status,
-            sse_enabled,
-            lifecycle_enabled,
-            public_access_blocked,
-            cors_rules,
-            bucket_replication_rules,
-        )
+    # Every sub-resource of every bucket is independent, so they all share one bounded pool.
+    # The results come back in submission order, which keeps the buckets in their original order.
+    results = run_concurrently(bucket_configuration_fetches(s3, bucket_names), concurrency)
 
-    _process_replication_role(session, cloudformation, terraformer, migration_context)
+    for bucket in build_bucket_configurations(bucket_names, results):
+        bucket_to_terraform(terraformer, bucket)
 
+    process_replication_role(session, cloudformation, terraformer, migration_context)
 
-def _get_versioning_status(s3: Any, bucket_name: str) -> bool:
-    versioning_resp = s3.get_bucket_versioning(Bucket=bucket_name)
-    return versioning_resp.get("Status") == "Enabled"
 
+def bucket_to_terraform(terraformer: S3Terraformer, bucket: "BucketConfiguration") -> None:
+    terraformer.s3_to_terraform(
+        StackResource("spacelift-infra-s3", bucket.logical_id),
+        bucket.bucket_name,
+        bucket.expiration_days,
+        bucket.versioning_enabled,
+        bucket.sse_enabled,
+        bucket.lifecycle_enabled,
+        bucket.public_access_blocked,
+        bucket.cors_rules,
+        bucket.replication_rules,
+    )
 
-def _is_sse_enabled(s3: Any, bucket_name: str) -> bool:
-    try:
-        encryption_resp = s3.get_bucket_encryption(Bucket=bucket_name)
-        rules = encryption_resp["ServerSideEncryptionConfiguration"]["Rules"]
+
+# The raw S3 sub-resource responses of a bucket, each fetched exactly once. All the facts the
+# terraformer needs are derived from these, so nothing has to be downloaded twice.
+@dataclass
+class BucketConfiguration:
+    logical_id: str
+    bucket_name: str
+    versioning: Dict
+    encryption: Dict
+    lifecycle: Dict
+    public_access_block: Dict
+    cors: Dict
+    replication: Dict
+
+    @property
+    def versioning_enabled(self) -> bool:
+        return self.versioning.get("Status") == "Enabled"
+
+    @property
+    def sse_enabled(self) -> bool:
+        rules = self.encryption.get("ServerSideEncryptionConfiguration", {}).get("Rules", [])
 
         for rule in rules:
             sse_algorithm = rule["ApplyServerSideEncryptionByDefault"]["SSEAlgorithm"]
             kms_key_id = rule["ApplyServerSideEncryptionByDefault"].get("KMSMasterKeyID")
             if sse_algorithm == "aws:kms" and kms_key_id is not None:
                 return True
-    except s3.exceptions.ClientError as e:
-        if e.response["Error"]["Code"] == "ServerSideEncryptionConfigurationNotFoundError":
-            return False
-        raise
-    return False
-
+        return False
+
+    @property
+    def lifecycle_enabled(self) -> bool:
+        return any(rule.get("Status") == "Enabled" for rule in self.lifecycle["Rules"])
+
+    @property
+    def expiration_days(self) -> int:
+        for rule in self.lifecycle["Rules"]:
+            if rule.get("ID", "").startswith("expire-after-"):
+                return rule.get("Expiration").get("Days")
+        return 0
+
+    @property
+    def public_access_blocked(self) -> bool:
+        return self.public_access_block.get("PublicAccessBlockConfiguration", {}).get(
+            "BlockPublicAcls", False
+        )
 
-def _is_lifecycle_enabled(s3: Any, bucket_name: str) -> bool:
-    lifecycle_resp = _get_bucket_lifecycle(s3, bucket_name)
+    @property
+    def cors_rules(self) -> List[Dict]:
+        return self.cors.get("CORSRules", [])
+
+    @property
+    def replication_rules(self) -> List[Dict]:
+        return self.replication.get("ReplicationConfiguration", {}).get("Rules", [])
+
+
+# Fetchers of every sub-resource a BucketConfiguration is made of, in the order of its fields
+_BUCKET_SUB_RESOURCE_FETCHERS: List[Callable[[Any, str], Dict]] = [
+    lambda s3, bucket_name: _get_bucket_versioning(s3, bucket_name),
+    lambda s3, bucket_name: _get_bucket_encryption(s3, bucket_name),
+    lambda s3, bucket_name: _get_bucket_lifecycle(s3, bucket_name),
+    lambda s3, bucket_name: _get_public_access_block(s3, bucket_name),
+    lambda s3, bucket_name: _get_bucket_cors(s3, bucket_name),
+    lambda s3, bucket_name: _get_bucket_replication(s3, bucket_name),
+]
+
+
+def bucket_configuration_fetches(s3: Any, bucket_names: Dict[str, str]) -> List[Callable[[], Dict]]:
+    return [
+        functools.partial(fetch, s3, bucket_name)
+        for bucket_name in bucket_names.values()
+        for fetch in _BUCKET_SUB_RESOURCE_FETCHERS
+    ]
+
+
+def build_bucket_configurations(
+    bucket_names: Dict[str, str], results: List[Dict]
+) -> List[BucketConfiguration]:
+    # bucket_names maps the logical id of each bucket to its name
+    bucket_results = iter(results)
+    return [
+        BucketConfiguration(
+            logical_id,
+            bucket_name,
+            *itertools.islice(bucket_results, len(_BUCKET_SUB_RESOURCE_FETCHERS)),
+        )
+        for logical_id, bucket_name in bucket_names.items()
+    ]
 
-    for rule in lifecycle_resp["Rules"]:
-        if rule.get("Status") == "Enabled":
-            return True
-    return False
 
+def _get_bucket_versioning(s3: Any, bucket_name: str) -> Dict:
+    return s3.get_bucket_versioning(Bucket=bucket_name)
 
-def _get_bucket_expiration(s3: Any, bucket_name: str) -> int:
-    lifecycle_resp = _get_bucket_lifecycle(s3, bucket_name)
 
-    for rule in lifecycle_resp["Rules"]:
-        if rule.get("ID").startswith("expire-after-"):
-            return rule.get("Expiration").get("Days")
-    return 0
+def _get_bucket_encryption(s3: Any, bucket_name: str) -> Dict:
+    try:
+        return s3.get_bucket_encryption(Bucket=bucket_name)
+    except s3.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] == "ServerSideEncryptionConfigurationNotFoundError":
+            return {}
+        raise
 
 
-def _is_public_access_blocked(s3: Any, bucket_name: str) -> bool:
-    public_access_resp = s3.get_public_access_block(Bucket=bucket_name)
-    return public_access_resp.get("PublicAccessBlockConfiguration", {}).get(
-        "BlockPublicAcls", False
-    )
+def _get_public_access_block(s3: Any, bucket_name: str) -> Dict:
+    return s3.get_public_access_block(Bucket=bucket_name)
 
 
 def _get_bucket_cors(s3: Any, bucket_name: str) -> Dict:
@@ -130,11 +182,11 @@ def _get_bucket_replication(s3: Any, bucket_name: str) -> Dict:
         return s3.get_bucket_replication(Bucket=bucket_name)
     except s3.exceptions.ClientError as e:
         if e.response["Error"]["Code"] == "ReplicationConfigurationNotFoundError":
-            return {"Rules": []}
+            return {}
         raise
 
 
-def _process_replication_role(
+def process_replication_role(
     session: boto3.Session,
     cloudformation: Any,
     terraformer: S3Terraformer,
@@ -157,7 +209,7 @@ def _process_replication_role(
 
     replication_role_name, replication_policy_arn = replication_resources
 
-    iam = session.client("iam")
+    iam = get_client(session, "iam")
     policy = iam.get_policy(PolicyArn=replication_policy_arn)
 
     terraformer.replication_role_to_terraform(
@@ -166,6 +218,8 @@ def _process_replication_role(
         replication_policy_arn,
         migration_context.config.disaster_recovery.s3_bucket_replication.replica_kms_key_arn,
         migration_context.config.disaster_recovery.replica_region,
+        StackResource("spacelift-infra-s3", "S3ReplicationRole"),
+        StackResource("spacelift-infra-s3", "S3ReplicationPolicy"),
     )
 
     print(" > Replication configuration is the following:")
@@ -1,35 +1,37 @@
+from typing import Dict
 import boto3
+from converters.import_registry import StackResource
 from converters.sm_to_terraform import SMTerraformer
-from scanners.cloudformation_helper import get_resources_from_cf_stack
+from scanners.cloudformation_helper import get_resources_by_logical_id_from_cf_stack
+from utils.aws import get_client
+
+# Every secret but the connection string one must be in the stack, that one is only created
+# when the installation doesn't use a custom connection string
+_OPTIONAL_SECRET = "DBConnectionStringSecret"
+_SECRET_LOGICAL_IDS = [
+    _OPTIONAL_SECRET,
+    "SlackCredentialsSecret",
+    "AdditionalRootCAsSecret",
+    "ExternalValuesSecret",
+    "SAMLCredentialsSecret",
+]
 
 
 def scan_sm_resources(session: boto3.Session, terraformer: SMTerraformer) -> None:
     print(" > Scanning Secrets Manager resources...")
 
-    cloudformation = session.client("cloudformation")
-
-    conn_string_arn_resources = get_resources_from_cf_stack(
-        cloudformation, "spacelift-infra", ["DBConnectionStringSecret"]
-    )
-    if conn_string_arn_resources:
-        terraformer.sm_to_terraform("DBConnectionStringSecret", conn_string_arn_resources[0])
-
-    [slack_credentials_arn] = get_resources_from_cf_stack(
-        cloudformation, "spacelift-infra", ["SlackCredentialsSecret"]
+    cloudformation = get_client(session, "cloudformation")
+    secret_arns = get_resources_by_logical_id_from_cf_stack(
+        cloudformation, "spacelift-infra", _SECRET_LOGICAL_IDS
     )
-    terraformer.sm_to_terraform("SlackCredentialsSecret", slack_credentials_arn)
+    _secrets_to_terraform(terraformer, secret_arns)
 
-    [additional_root_cert_arn] = get_resources_from_cf_stack(
-        cloudformation, "spacelift-infra", ["AdditionalRootCAsSecret"]
-    )
-    terraformer.sm_to_terraform("AdditionalRootCAsSecret", additional_root_cert_arn)
-
-    [external_arn] = get_resources_from_cf_stack(
-        cloudformation, "spacelift-infra", ["ExternalValuesSecret"]
-    )
-    terraformer.sm_to_terraform("ExternalValuesSecret", external_arn)
 
-    [saml_credentials_arn] = get_resources_from_cf_stack(
-        cloudformation, "spacelift-infra", ["SAMLCredentialsSecret"]
-    )
-    terraformer.sm_to_terraform("SAMLCredentialsSecret", saml_credentials_arn)
+def _secrets_to_terraform(terraformer: SMTerraformer, secret_arns: Dict[str, str]) -> None:
+    for logical_id in _SECRET_LOGICAL_IDS:
+        if logical_id in secret_arns:
+            terraformer.sm_to_terraform(
+                StackResource("spacelift-infra", logical_id), secret_arns[logical_id]
+            )
+        elif logical_id != _OPTIONAL_SECRET:
+            raise ValueError(f"{logical_id} not found in the spacelift-infra stack")
@@ -1,30 +1,36 @@
+from typing import Dict
 import boto3
+from converters.import_registry import StackResource
 from converters.sqs_to_terraform import SQSTerraformer
-from scanners.cloudformation_helper import get_resources_from_cf_stack
+from scanners.cloudformation_helper import get_resources_by_logical_id_from_cf_stack
+from utils.aws import get_client
+
+_QUEUE_LOGICAL_IDS = [
+    "AsyncJobsFIFOQueue",
+    "AsyncJobsQueue",
+    "CronjobsQueue",
+    "DeadletterFIFOQueue",
+    "DeadletterQueue",
+    "EventsInboxQueue",
+    "IoTQueue",
+    "WebhooksQueue",
+]
 
 
 def scan_sqs_resources(session: boto3.Session, terraformer: SQSTerraformer) -> None:
     print(" > Scanning SQS resources...")
 
-    cloudformation = session.client("cloudformation")
-    queues_urls = get_resources_from_cf_stack(
-        cloudformation,
-        "spacelift-infra",
-        [
-            "AsyncJobsFIFOQueue",
-            "AsyncJobsQueue",
-            "CronjobsQueue",
-            "DeadletterFIFOQueue",
-            "DeadletterQueue",
-            "EventsInboxQueue",
-            "IoTQueue",
-            "WebhooksQueue",
-        ],
+    cloudformation = get_client(session, "cloudformation")
+    queues_urls = get_resources_by_logical_id_from_cf_stack(
+        cloudformation, "spacelift-infra", _QUEUE_LOGICAL_IDS
     )
+    _queues_to_terraform(terraformer, queues_urls)
+
 
+def _queues_to_terraform(terraformer: SQSTerraformer, queues_urls: Dict[str, str]) -> None:
     if not queues_urls:
         raise Exception("No SQS queues found")
 
-    for url in queues_urls:
+    for logical_id, url in queues_urls.items():
         name = url.split("/")[-1]
-        terraformer.sqs_to_terraform(name, url)
+        terraformer.sqs_to_terraform(name, url, StackResource("spacelift-infra", logical_id))
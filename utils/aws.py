@@ -1,5 +1,32 @@
+import threading
 import boto3
-from typing import Dict, Optional
+from botocore.config import Config
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.rate_limiter import FALLBACK_RATE, RateLimiter
+
+# botocore's own default pool size
+_DEFAULT_MAX_POOL_CONNECTIONS = 10
+
+# Throttled calls are retried more patiently than botocore's default, while the rate limiter
+# slows down the calls to the throttled service
+_RETRIES = {"mode": "standard", "max_attempts": 10}
+
+# One client per session, service and region for the whole run. boto3 sessions are not
+# thread-safe, but the clients they create are, so only the creation is done under the lock.
+_clients: Dict[Tuple[boto3.Session, str, Optional[str]], Any] = {}
+_clients_lock = threading.Lock()
+_client_config = Config(
+    max_pool_connections=_DEFAULT_MAX_POOL_CONNECTIONS, tcp_keepalive=True, retries=_RETRIES
+)
+rate_limiter = RateLimiter()
+# Records or replays every AWS response, see utils/snapshot.py
+_snapshot: Any = None
+# Sends every call to a local stand-in of AWS instead, e.g. moto or LocalStack
+_endpoint_url: Optional[str] = None
+
+# Tag CloudFormation puts on every resource it creates, holding the resource's logical id
+LOGICAL_ID_TAG = "aws:cloudformation:logical-id"
 
 
 def create_session(region: str, profile: Optional[str] = None) -> boto3.Session:
@@ -9,9 +36,91 @@ def create_session(region: str, profile: Optional[str] = None) -> boto3.Session:
     return boto3.Session(**boto_args)
 
 
+def configure_clients(
+    concurrency: int,
+    rate_limits: Optional[Dict[str, float]] = None,
+    snapshot: Any = None,
+    endpoint_url: Optional[str] = None,
+) -> None:
+    # Every worker that can use a client at the same time needs its own pooled connection
+    global _client_config, rate_limiter, _snapshot, _endpoint_url
+
+    with _clients_lock:
+        _clients.clear()
+        _client_config = Config(
+            max_pool_connections=max(concurrency, _DEFAULT_MAX_POOL_CONNECTIONS),
+            tcp_keepalive=True,
+            retries=_RETRIES,
+        )
+        rate_limiter = RateLimiter(rate_limits)
+        _snapshot = snapshot
+        _endpoint_url = endpoint_url
+
+
+def create_offline_session(region: str) -> boto3.Session:
+    # Static dummy credentials, so botocore doesn't go through the credential provider chain
+    return boto3.Session(
+        region_name=region, aws_access_key_id="offline", aws_secret_access_key="offline"
+    )
+
+
+def get_client(session: boto3.Session, service_name: str, region_name: Optional[str] = None) -> Any:
+    key = (session, service_name, region_name or session.region_name)
+
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = session.client(
+                service_name,
+                region_name=region_name,
+                endpoint_url=_endpoint_url,
+                config=_client_config,
+            )
+            rate_limiter.attach(client)
+            if _snapshot is not None:
+                _snapshot.attach(client)
+            _clients[key] = client
+
+    return client
+
+
+def report_rate_limits() -> None:
+    throttled = rate_limiter.throttled_services()
+    if not throttled:
+        return
+
+    rates = rate_limiter.effective_rates()
+    print(" > Some AWS calls were throttled, request rates settled at:")
+    for service_name, throttle_count in throttled.items():
+        print(
+            f" >   - {service_name}: {rates[service_name]:.2f} req/s "
+            f"(started at {rate_limiter.rates.get(service_name, FALLBACK_RATE):.2f} req/s, "
+            f"throttled {throttle_count} time(s))"
+        )
+
+
+def tags_to_dict(tags: Optional[List[Dict]]) -> Dict[str, str]:
+    return {tag["Key"]: tag["Value"] for tag in tags or []}
+
+
+def index_by_tag(items: Iterable[Dict], tag_key: str = LOGICAL_ID_TAG) -> Dict[str, Dict]:
+    # Indexes the items of a Describe*/List* response by the value of one of their tags, so every
+    # later lookup is a dict hit. Items without the tag are left out, the first one wins on a tie.
+    index: Dict[str, Dict] = {}
+    for item in items:
+        value = tags_to_dict(item.get("Tags")).get(tag_key)
+        if value is not None:
+            index.setdefault(value, item)
+    return index
+
+
 def get_ssm_parameter(session: boto3.Session, param_name: str) -> Optional[str]:
     try:
-        ssm_client = session.client("ssm")
+        ssm_client = get_client(session, "ssm")
         response = ssm_client.get_parameter(Name=param_name)
         return response["Parameter"]["Value"]
     except ssm_client.exceptions.ParameterNotFound:
@@ -23,24 +132,13 @@ def get_ssm_parameter(session: boto3.Session, param_name: str) -> Optional[str]:
 
 def get_db_password_sm_name(session: boto3.Session) -> str:
     try:
-        secrets_client = session.client("secretsmanager")
+        secrets_client = get_client(session, "secretsmanager")
 
         response = secrets_client.list_secrets()
         secrets = response.get("SecretList", [])
         non_deleted_secrets = [secret for secret in secrets if not secret.get("DeletedDate")]
 
-        target_secret = None
-        for secret in non_deleted_secrets:
-            tags = secret.get("Tags", [])
-            for tag in tags:
-                if (
-                    tag.get("Key") == "aws:cloudformation:logical-id"
-                    and tag.get("Value") == "DBConnectionStringSecret"
-                ):
-                    target_secret = secret
-                    break
-            if target_secret:
-                break
+        target_secret = index_by_tag(non_deleted_secrets).get("DBConnectionStringSecret")
 
         if not target_secret:
             raise ValueError(
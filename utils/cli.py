@@ -1,4 +1,17 @@
 import argparse
+from typing import Tuple
+
+
+def _rate_limit(value: str) -> Tuple[str, float]:
+    service_name, sep, rate = value.partition("=")
+    try:
+        if not sep or not service_name or float(rate) <= 0:
+            raise ValueError
+        return service_name, float(rate)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid rate limit '{value}', expected SERVICE=REQUESTS_PER_SECOND (e.g. ec2=20)"
+        )
 
 
 def parse_args() -> argparse.Namespace:
@@ -30,4 +43,79 @@ def parse_args() -> argparse.Namespace:
         choices=["ecs", "eks"],
         help="Target Terraform module type (default: ecs)",
     )
+    parser.add_argument(
+        "--format",
+        type=str,
+        required=False,
+        default="hcl",
+        choices=["hcl", "json"],
+        help="Syntax of the generated Terraform files, HCL (.tf) or JSON (.tf.json) (default: hcl)",
+    )
+    parser.add_argument(
+        "--compact-imports",
+        action="store_true",
+        help="Import the instances of a counted resource (subnets, NAT gateways, EIPs, ...) "
+        "with a single for_each import block each. Requires Terraform 1.7 or later.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        required=False,
+        default=4,
+        help="Number of scanners to run at the same time (default: 4, use 1 to scan serially)",
+    )
+    parser.add_argument(
+        "--s3-concurrency",
+        type=int,
+        required=False,
+        default=8,
+        help="Number of S3 bucket configuration requests to run at the same time (default: 8)",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=_rate_limit,
+        action="append",
+        required=False,
+        default=[],
+        metavar="SERVICE=RPS",
+        help="Maximum requests per second for an AWS service, e.g. cloudformation=5 (repeatable). "
+        "The rate is lowered automatically when AWS throttles the calls. Services without a "
+        "limit speed up from a default rate until AWS throttles them.",
+    )
+    parser.add_argument(
+        "--endpoint-url",
+        type=str,
+        required=False,
+        help="Send the AWS calls to this endpoint instead, e.g. a local moto or LocalStack server",
+    )
+    output_mode_group = parser.add_mutually_exclusive_group()
+    output_mode_group.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only write the output files whose content changed since the previous run, "
+        "and report which ones did",
+    )
+    output_mode_group.add_argument(
+        "--bundle",
+        type=str,
+        required=False,
+        metavar="ARCHIVE",
+        help="Write every generated file into this archive (.tar, .tar.gz or .tar.zst) "
+        "instead of the output directory",
+    )
+    snapshot_group = parser.add_mutually_exclusive_group()
+    snapshot_group.add_argument(
+        "--record",
+        type=str,
+        required=False,
+        metavar="SNAPSHOT",
+        help="Record every AWS response into this file (.json, .json.gz or .json.zst)",
+    )
+    snapshot_group.add_argument(
+        "--replay",
+        type=str,
+        required=False,
+        metavar="SNAPSHOT",
+        help="Generate the output from a recorded snapshot, without calling AWS",
+    )
     return parser.parse_args()
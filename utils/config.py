@@ -1,8 +1,13 @@
+import dataclasses
+import functools
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional, Type, TypeVar, Union
+from typing import get_args, get_origin, get_type_hints
 import json
 import sys
 
+T = TypeVar("T")
+
 
 @dataclass
 class DatabaseConfig:
@@ -169,51 +174,139 @@ class AppConfig:
         )
 
 
+class ConfigError(ValueError):
+    # Every problem found in a config, reported together instead of one at a time
+    def __init__(self, errors: List[str]):
+        super().__init__(f"{len(errors)} invalid configuration value(s): " + "; ".join(errors))
+        self.errors = errors
+
+
 def load_app_config(config_path: str) -> AppConfig:
     try:
         with open(config_path, "r") as f:
             config_data = json.load(f)
 
-        if "database" in config_data:
-            config_data["database"] = DatabaseConfig(**config_data["database"])
-        if "load_balancer" in config_data:
-            if "tag" in config_data["load_balancer"]:
-                config_data["load_balancer"]["tag"] = TagConfig(
-                    **config_data["load_balancer"]["tag"]
-                )
-            config_data["load_balancer"] = LoadBalancerConfig(**config_data["load_balancer"])
-        if "proxy_config" in config_data:
-            config_data["proxy_config"] = ProxyConfig(**config_data["proxy_config"])
-        if "slack_config" in config_data:
-            config_data["slack_config"] = SlackConfig(**config_data["slack_config"])
-        if "sso_config" in config_data:
-            sso_data = config_data["sso_config"]
-            if "oidc_args" in sso_data:
-                sso_data["oidc_args"] = OidcArgs(**sso_data["oidc_args"])
-            if "saml_args" in sso_data:
-                sso_data["saml_args"] = SamlArgs(**sso_data["saml_args"])
-            config_data["sso_config"] = SSOConfig(**sso_data)
-        if "tls_config" in config_data:
-            config_data["tls_config"] = TLSConfig(**config_data["tls_config"])
-        if "vpc_config" in config_data:
-            config_data["vpc_config"] = VpcConfig(**config_data["vpc_config"])
-        if "disaster_recovery" in config_data:
-            dr_data = config_data["disaster_recovery"]
-            if "s3_bucket_replication" in dr_data:
-                dr_data["s3_bucket_replication"] = S3BucketReplicationConfig(
-                    **dr_data["s3_bucket_replication"]
-                )
-            config_data["disaster_recovery"] = DisasterRecoveryConfig(**dr_data)
-
-        if "alerting" in config_data:
-            config_data["alerting"] = AlertingConfig(**config_data["alerting"])
-        if "s3_config" in config_data:
-            config_data["s3_config"] = S3Config(**config_data["s3_config"])
-
-        return AppConfig(**config_data)
+        return app_config_from_dict(config_data)
     except (json.JSONDecodeError, FileNotFoundError) as e:
         print(f"Error loading configuration file: {e}")
         sys.exit(1)
-    except TypeError as e:
-        print(f"Error parsing configuration: {e}")
+    except ConfigError as e:
+        print(f"Error parsing configuration, {len(e.errors)} problem(s) found:")
+        for error in e.errors:
+            print(f"  - {error}")
         sys.exit(1)
+
+
+def app_config_from_dict(config_data: dict) -> AppConfig:
+    return decode_config(AppConfig, config_data)
+
+
+def decode_config(config_class: Type[T], config_data: Any) -> T:
+    # Builds the config dataclass and all its nested sections from the decoded JSON, checking
+    # every value against the field types. All the problems are collected before raising.
+    errors: List[str] = []
+    config = _decode_dataclass(config_class, config_data, "", errors)
+    if errors:
+        raise ConfigError(errors)
+    return config
+
+
+# A decoder converts one JSON value to its field type, or records why it can't and returns None
+_Decoder = Callable[[Any, str, List[str]], Any]
+
+_JSON_TYPE_NAMES = {
+    bool: "a boolean",
+    int: "a number",
+    float: "a number",
+    str: "a string",
+    list: "an array",
+    dict: "an object",
+}
+
+
+def _json_type(value: Any) -> str:
+    return _JSON_TYPE_NAMES.get(type(value), type(value).__name__)
+
+
+def _decode_str(value: Any, path: str, errors: List[str]) -> Optional[str]:
+    if isinstance(value, str):
+        return value
+    # Numbers are often left unquoted in the config files, e.g. retention periods
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    errors.append(f"{path}: expected a string, got {_json_type(value)}")
+    return None
+
+
+def _decode_bool(value: Any, path: str, errors: List[str]) -> Optional[bool]:
+    if isinstance(value, bool):
+        return value
+    errors.append(f"{path}: expected a boolean, got {_json_type(value)}")
+    return None
+
+
+def _decode_int(value: Any, path: str, errors: List[str]) -> Optional[int]:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    errors.append(f"{path}: expected an integer, got {_json_type(value)}")
+    return None
+
+
+_SCALAR_DECODERS: Dict[Any, _Decoder] = {str: _decode_str, bool: _decode_bool, int: _decode_int}
+
+
+def _decode_list(
+    item_decoder: _Decoder, value: Any, path: str, errors: List[str]
+) -> Optional[List]:
+    if not isinstance(value, list):
+        errors.append(f"{path}: expected an array, got {_json_type(value)}")
+        return None
+    return [item_decoder(item, f"{path}[{index}]", errors) for index, item in enumerate(value)]
+
+
+def _decode_dataclass(config_class: Type[T], value: Any, path: str, errors: List[str]) -> Any:
+    if not isinstance(value, dict):
+        errors.append(f"{path or 'config'}: expected an object, got {_json_type(value)}")
+        return None
+
+    plan = _decode_plan(config_class)
+    fields = {}
+    for key, item in value.items():
+        field_path = f"{path}.{key}" if path else key
+        decoder = plan.get(key)
+        if decoder is None:
+            errors.append(f"{field_path}: unknown field")
+            continue
+        # Every field is optional, an explicit null is the same as leaving it out
+        fields[key] = None if item is None else decoder(item, field_path, errors)
+    return config_class(**fields)
+
+
+def _decoder_for(field_type: Any) -> _Decoder:
+    origin = get_origin(field_type)
+    if origin is Union:
+        types = [arg for arg in get_args(field_type) if arg is not type(None)]
+        if len(types) == 1:
+            return _decoder_for(types[0])
+    elif origin is list:
+        return functools.partial(_decode_list, _decoder_for(get_args(field_type)[0]))
+    elif dataclasses.is_dataclass(field_type):
+        return functools.partial(_decode_dataclass, field_type)
+    elif field_type in _SCALAR_DECODERS:
+        return _SCALAR_DECODERS[field_type]
+
+    raise TypeError(f"Unsupported config field type: {field_type}")
+
+
+@functools.lru_cache(maxsize=None)
+def _decode_plan(config_class: type) -> Dict[str, _Decoder]:
+    # Built once per config class from its field types, and reused for every config decoded
+    hints = get_type_hints(config_class)
+    return {
+        field.name: _decoder_for(hints[field.name]) for field in dataclasses.fields(config_class)
+    }
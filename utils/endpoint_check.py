@@ -0,0 +1,501 @@
+# Runs the whole scan against a local stand-in of AWS, a moto server (a development dependency,
+# see requirements-dev.txt): the CloudFormation stacks of a small installation are created in it,
+# the Terraform project is generated through --endpoint-url and every resource of the stacks is
+# checked to be imported from the stack resource it comes from. The AWS responses are recorded
+# into a zstd compressed snapshot (zstandard is a development dependency too), which must replay
+# into the same files, both in a directory and in a zstd compressed bundle.
+#
+# python -m utils.endpoint_check
+import json
+import os
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple
+
+import boto3
+import zstandard
+from moto.core.common_models import CloudFormationModel
+from moto.secretsmanager.models import secretsmanager_backends
+from moto.server import ThreadedMotoServer
+
+import main as kit
+from converters.s3_to_terraform import BUCKET_ROLES, CORS, VERSIONING
+from utils.aws import LOGICAL_ID_TAG
+
+_REGION = "eu-west-1"
+
+_CONFIG = {
+    "account_name": "acme",
+    "aws_region": _REGION,
+    "database": {"delete_protection_enabled": True, "instance_class": "db.r6g.large"},
+    "load_balancer": {"certificate_arn": "arn:aws:acm:eu-west-1:123456789012:certificate/cert"},
+    "vpc_config": {"use_custom_vpc": False},
+    "iot_broker_endpoint": "iot.example.com",
+}
+
+_QUEUES = {
+    "AsyncJobsFIFOQueue": "spacelift-async-jobs.fifo",
+    "AsyncJobsQueue": "spacelift-async-jobs",
+    "CronjobsQueue": "spacelift-cronjobs",
+    "DeadletterFIFOQueue": "spacelift-dlq.fifo",
+    "DeadletterQueue": "spacelift-dlq",
+    "EventsInboxQueue": "spacelift-events-inbox",
+    "IoTQueue": "spacelift-iot",
+    "WebhooksQueue": "spacelift-webhooks",
+}
+_SECRETS = [
+    "DBConnectionStringSecret",
+    "SlackCredentialsSecret",
+    "AdditionalRootCAsSecret",
+    "ExternalValuesSecret",
+    "SAMLCredentialsSecret",
+]
+_SECURITY_GROUPS = [
+    "ServerSecurityGroup",
+    "DrainSecurityGroup",
+    "SchedulerSecurityGroup",
+    "DatabaseSecurityGroup",
+]
+
+
+def _template(resources: Dict[str, Dict], parameters: Tuple[str, ...] = ()) -> str:
+    template: Dict[str, Any] = {"AWSTemplateFormatVersion": "2010-09-09", "Resources": resources}
+    if parameters:
+        template["Parameters"] = {name: {"Type": "String"} for name in parameters}
+    return json.dumps(template)
+
+
+def _kms_stack() -> str:
+    keys = ["KMSEncryptionPrimaryKey", "KMSMasterKey", "KMSJWTKey", "KMSJWTBackupKey"]
+    policy = {
+        "Version": "2012-10-17",
+        "Statement": [
+            {"Effect": "Allow", "Principal": {"AWS": "*"}, "Action": "kms:*", "Resource": "*"}
+        ],
+    }
+    resources = {
+        name: {"Type": "AWS::KMS::Key", "Properties": {"KeyPolicy": policy}} for name in keys
+    }
+    resources["KMSJWTAlias"] = {
+        "Type": "AWS::KMS::Alias",
+        "Properties": {"AliasName": "alias/spacelift-jwt", "TargetKeyId": {"Ref": "KMSJWTKey"}},
+    }
+    return _template(resources)
+
+
+def _s3_stack() -> str:
+    return _template(
+        {
+            role.logical_id: {
+                "Type": "AWS::S3::Bucket",
+                "Properties": {"BucketName": f"spacelift-{role.key.replace('_', '-')}"},
+            }
+            for role in BUCKET_ROLES
+        }
+    )
+
+
+def _infra_stack() -> str:
+    resources = {}
+    for logical_id, queue_name in _QUEUES.items():
+        properties: Dict[str, Any] = {"QueueName": queue_name}
+        if queue_name.endswith(".fifo"):
+            properties["FifoQueue"] = True
+        resources[logical_id] = {"Type": "AWS::SQS::Queue", "Properties": properties}
+    for logical_id in _SECRETS:
+        resources[logical_id] = {
+            "Type": "AWS::SecretsManager::Secret",
+            "Properties": {"Name": f"spacelift/{logical_id}", "SecretString": "{}"},
+        }
+    return _template(resources)
+
+
+def _vpc_stack() -> str:
+    resources: Dict[str, Dict] = {
+        "VPC": {"Type": "AWS::EC2::VPC", "Properties": {"CidrBlock": "10.0.0.0/16"}},
+    }
+    for index in range(3):
+        resources[f"PrivateSubnet{index + 1}"] = {
+            "Type": "AWS::EC2::Subnet",
+            "Properties": {"VpcId": {"Ref": "VPC"}, "CidrBlock": f"10.0.{index + 1}.0/24"},
+        }
+    for logical_id in _SECURITY_GROUPS:
+        properties: Dict[str, Any] = {
+            "GroupDescription": logical_id,
+            "VpcId": {"Ref": "VPC"},
+            "SecurityGroupEgress": [{"IpProtocol": "-1", "CidrIp": "0.0.0.0/0"}],
+        }
+        resources[logical_id] = {"Type": "AWS::EC2::SecurityGroup", "Properties": properties}
+    return _template(resources)
+
+
+def _vpc_config_stack() -> str:
+    resources: Dict[str, Dict] = {
+        "InternetGateway": {"Type": "AWS::EC2::InternetGateway", "Properties": {}},
+        "InternetGatewayVPCAttachment": {
+            "Type": "AWS::EC2::VPCGatewayAttachment",
+            "Properties": {
+                "VpcId": {"Ref": "VpcId"},
+                "InternetGatewayId": {"Ref": "InternetGateway"},
+            },
+        },
+    }
+    for index in range(1, 4):
+        resources[f"PublicSubnet{index}"] = {
+            "Type": "AWS::EC2::Subnet",
+            "Properties": {"VpcId": {"Ref": "VpcId"}, "CidrBlock": f"10.0.{index + 3}.0/24"},
+        }
+        for table, association, subnet in (
+            (
+                f"InternetGatewayRouteTable{index}",
+                f"InternetGatewayRouteTableSubnetAssociation{index}",
+                f"PublicSubnet{index}",
+            ),
+            (
+                f"NATGatewayRouteTable{index}",
+                f"NATGatewayRouteTable{index}SubnetAssociation",
+                f"PrivateSubnet{index}Id",
+            ),
+        ):
+            resources[table] = {
+                "Type": "AWS::EC2::RouteTable",
+                "Properties": {"VpcId": {"Ref": "VpcId"}},
+            }
+            resources[association] = {
+                "Type": "AWS::EC2::SubnetRouteTableAssociation",
+                "Properties": {"RouteTableId": {"Ref": table}, "SubnetId": {"Ref": subnet}},
+            }
+        resources[f"NATGatewayEIP{index}"] = {
+            "Type": "AWS::EC2::EIP",
+            "Properties": {"Domain": "vpc"},
+        }
+        resources[f"NATGateway{index}"] = {
+            "Type": "AWS::EC2::NatGateway",
+            "Properties": {
+                "AllocationId": {"Fn::GetAtt": [f"NATGatewayEIP{index}", "AllocationId"]},
+                "SubnetId": {"Ref": f"PublicSubnet{index}"},
+            },
+        }
+    return _template(
+        resources, ("VpcId", "PrivateSubnet1Id", "PrivateSubnet2Id", "PrivateSubnet3Id")
+    )
+
+
+class _CloudFormationSecret(CloudFormationModel):
+    # moto's CloudFormation can't create secrets, so it's taught to here, through moto's own
+    # Secrets Manager backend. moto finds every subclass of CloudFormationModel by itself, and files
+    # it under the service its module is named after.
+    __module__ = "moto.secretsmanager.models"
+
+    def __init__(self, arn: str):
+        self.arn = arn
+
+    @staticmethod
+    def cloudformation_name_type() -> str:
+        return "Name"
+
+    @staticmethod
+    def cloudformation_type() -> str:
+        return "AWS::SecretsManager::Secret"
+
+    @classmethod
+    def create_from_cloudformation_json(
+        cls,
+        resource_name: str,
+        cloudformation_json: Any,
+        account_id: str,
+        region_name: str,
+        **kwargs,
+    ) -> "_CloudFormationSecret":
+        properties = cloudformation_json["Properties"]
+        secret = secretsmanager_backends[account_id][region_name].create_secret(
+            name=properties.get("Name", resource_name),
+            secret_string=properties.get("SecretString"),
+            secret_binary=None,
+            description=None,
+            tags=None,
+            kms_key_id=None,
+            client_request_token=None,
+            replica_regions=[],
+            force_overwrite=False,
+        )
+        return cls(json.loads(secret)["ARN"])
+
+    @property
+    def physical_resource_id(self) -> str:
+        return self.arn
+
+
+def _create_stack(
+    cloudformation, name: str, template: str, parameters: Dict[str, str]
+) -> Dict[str, str]:
+    cloudformation.create_stack(
+        StackName=name,
+        TemplateBody=template,
+        Parameters=[
+            {"ParameterKey": key, "ParameterValue": value} for key, value in parameters.items()
+        ],
+    )
+    stack = cloudformation.describe_stacks(StackName=name)["Stacks"][0]
+    if stack["StackStatus"] != "CREATE_COMPLETE":
+        raise RuntimeError(f"Stack {name} wasn't created: {stack.get('StackStatusReason')}")
+
+    # Logical id -> physical id
+    resources = cloudformation.list_stack_resources(StackName=name)["StackResourceSummaries"]
+    return {resource["LogicalResourceId"]: resource["PhysicalResourceId"] for resource in resources}
+
+
+def _seed(session: boto3.Session, endpoint_url: str) -> None:
+    cloudformation = session.client("cloudformation", endpoint_url=endpoint_url)
+    _create_stack(cloudformation, "spacelift-infra-kms", _kms_stack(), {})
+    buckets = _create_stack(cloudformation, "spacelift-infra-s3", _s3_stack(), {})
+
+    # moto's CloudFormation ignores the configuration of a bucket
+    s3 = session.client("s3", endpoint_url=endpoint_url)
+    for role in BUCKET_ROLES:
+        bucket_name = buckets[role.logical_id]
+        s3.put_public_access_block(
+            Bucket=bucket_name,
+            PublicAccessBlockConfiguration={
+                "BlockPublicAcls": True,
+                "BlockPublicPolicy": True,
+                "IgnorePublicAcls": True,
+                "RestrictPublicBuckets": True,
+            },
+        )
+        if VERSIONING in role.sub_resources:
+            s3.put_bucket_versioning(
+                Bucket=bucket_name, VersioningConfiguration={"Status": "Enabled"}
+            )
+        if CORS in role.sub_resources:
+            s3.put_bucket_cors(
+                Bucket=bucket_name,
+                CORSConfiguration={
+                    "CORSRules": [
+                        {
+                            "AllowedMethods": ["PUT"],
+                            "AllowedOrigins": ["https://spacelift.example.com"],
+                        }
+                    ]
+                },
+            )
+
+    _create_stack(cloudformation, "spacelift-infra", _infra_stack(), {})
+    vpc_resources = _create_stack(cloudformation, "spacelift-infra-vpc", _vpc_stack(), {})
+
+    # moto's CloudFormation drops the descriptions the database ingress rules are told apart by, and
+    # moto only describes those of CIDR rules, so these don't reference the services' groups
+    ec2 = session.client("ec2", endpoint_url=endpoint_url)
+    ec2.authorize_security_group_ingress(
+        GroupId=vpc_resources["DatabaseSecurityGroup"],
+        IpPermissions=[
+            {
+                "IpProtocol": "tcp",
+                "FromPort": 5432,
+                "ToPort": 5432,
+                "IpRanges": [
+                    {
+                        "CidrIp": f"10.0.{index + 1}.0/24",
+                        "Description": f"Only accept connections from the {source}",
+                    }
+                ],
+            }
+            for index, source in enumerate(("drain", "server", "scheduler"))
+        ],
+    )
+
+    parameters = {"VpcId": vpc_resources["VPC"]}
+    for index in range(1, 4):
+        parameters[f"PrivateSubnet{index}Id"] = vpc_resources[f"PrivateSubnet{index}"]
+    vpc_config_resources = _create_stack(
+        cloudformation, "spacelift-infra-vpc-config", _vpc_config_stack(), parameters
+    )
+
+    # moto's CloudFormation keeps the subnet associations away from the route tables it describes,
+    # and doesn't tag the elastic IPs it creates
+    for index in range(1, 4):
+        ec2.associate_route_table(
+            RouteTableId=vpc_config_resources[f"InternetGatewayRouteTable{index}"],
+            SubnetId=vpc_config_resources[f"PublicSubnet{index}"],
+        )
+        ec2.associate_route_table(
+            RouteTableId=vpc_config_resources[f"NATGatewayRouteTable{index}"],
+            SubnetId=vpc_resources[f"PrivateSubnet{index}"],
+        )
+    for index in range(1, 4):
+        logical_id = f"NATGatewayEIP{index}"
+        [address] = ec2.describe_addresses(PublicIps=[vpc_config_resources[logical_id]])[
+            "Addresses"
+        ]
+        ec2.create_tags(
+            Resources=[address["AllocationId"]], Tags=[{"Key": LOGICAL_ID_TAG, "Value": logical_id}]
+        )
+
+    ssm = session.client("ssm", endpoint_url=endpoint_url)
+    ssm.put_parameter(Name="/spacelift/install-version", Value="v2.6.0", Type="String")
+    ssm.put_parameter(Name="/spacelift/random-suffix", Value="abc123", Type="String")
+
+    # The database isn't read from its stack, only by its identifier
+    rds = session.client("rds", endpoint_url=endpoint_url)
+    rds.create_db_cluster_parameter_group(
+        DBClusterParameterGroupName="spacelift",
+        DBParameterGroupFamily="aurora-postgresql14",
+        Description="Spacelift parameter group",
+    )
+    rds.create_db_cluster(
+        DBClusterIdentifier="spacelift",
+        Engine="aurora-postgresql",
+        EngineVersion="14.9",
+        MasterUsername="spacelift",
+        MasterUserPassword="spacelift-password",
+        DBClusterParameterGroupName="spacelift",
+    )
+    rds.create_db_instance(
+        DBInstanceIdentifier="spacelift-primary",
+        DBClusterIdentifier="spacelift",
+        DBInstanceClass="db.r6g.large",
+        Engine="aurora-postgresql",
+    )
+
+
+# Stack resources that aren't imported: the associations of the second and third internet gateway
+# tables are replaced by first_step.sh, so only the association of their subnet is imported
+_NOT_IMPORTED = {
+    "InternetGatewayVPCAttachment",
+    "InternetGatewayRouteTable2",
+    "InternetGatewayRouteTable3",
+    "InternetGatewayRouteTableSubnetAssociation2",
+    "InternetGatewayRouteTableSubnetAssociation3",
+}
+
+# Resources imported without being read from a stack, by their well known names
+_NOT_READ_FROM_STACKS = {
+    ("spacelift-infra", "ECRRepository"),
+    ("spacelift-infra", "LauncherECRRepository"),
+    ("spacelift-infra", "IoTMessageSenderRole"),
+    ("spacelift-infra", "IoTMessageSendingRule"),
+    ("spacelift-infra-db", "DBSubnetGroup"),
+    ("spacelift-infra-db", "DBCluster"),
+    ("spacelift-infra-db", "DBInstance"),
+    ("spacelift-infra-db", "DBClusterParameterGroup"),
+}
+
+
+def _expected_sources(cloudformation) -> Set[Tuple[str, str]]:
+    expected = set(_NOT_READ_FROM_STACKS)
+    for stack in cloudformation.describe_stacks()["Stacks"]:
+        resources = cloudformation.list_stack_resources(StackName=stack["StackName"])
+        for resource in resources["StackResourceSummaries"]:
+            if resource["LogicalResourceId"] not in _NOT_IMPORTED:
+                expected.add((stack["StackName"], resource["LogicalResourceId"]))
+    return expected
+
+
+def _check_output(output_dir: Path, expected: Set[Tuple[str, str]]) -> List[str]:
+    manifest = (output_dir / "imports.jsonl").read_text().splitlines()
+    records = [json.loads(line) for line in manifest]
+    imported = {(record["stack"], record["logical_id"]) for record in records if record["stack"]}
+
+    problems = [f"{stack} {logical_id} isn't imported" for stack, logical_id in expected - imported]
+    problems += [
+        f"{stack} {logical_id} is imported, but isn't a resource of the stacks"
+        for stack, logical_id in imported - expected
+    ]
+    return sorted(problems)
+
+
+def _read_tree(path: Path) -> Dict[str, bytes]:
+    return {
+        file.relative_to(path).as_posix(): file.read_bytes()
+        for file in sorted(path.rglob("*"))
+        if file.is_file()
+    }
+
+
+def _read_bundle(path: Path) -> Dict[str, bytes]:
+    with open(path, "rb") as raw, zstandard.ZstdDecompressor().stream_reader(raw) as stream:
+        with tarfile.open(fileobj=stream, mode="r|") as tar:
+            return {
+                member.name: tar.extractfile(member).read() for member in tar if member.isfile()
+            }
+
+
+def _compare_files(expected: Dict[str, bytes], actual: Dict[str, bytes], name: str) -> List[str]:
+    problems = [f"{path} is missing from the {name}" for path in expected if path not in actual]
+    problems += [f"{path} is only in the {name}" for path in actual if path not in expected]
+    problems += [
+        f"{path} differs in the {name}"
+        for path in expected
+        if path in actual and expected[path] != actual[path]
+    ]
+    return problems
+
+
+def main() -> int:
+    # moto accepts any credentials, but botocore needs some
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    # Pins the manifest timestamp, so the live and the replayed outputs can be compared
+    os.environ.setdefault("SOURCE_DATE_EPOCH", "1700000000")
+
+    with tempfile.TemporaryDirectory() as directory:
+        work_path = Path(directory)
+        config_path = work_path / "config.json"
+        config_path.write_text(json.dumps(_CONFIG))
+        snapshot_path = work_path / "snapshot.json.zst"
+        output_path = work_path / "output"
+
+        server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+        server.start()
+        try:
+            host, port = server.get_host_and_port()
+            endpoint_url = f"http://{host}:{port}"
+            session = boto3.Session(region_name=_REGION)
+            _seed(session, endpoint_url)
+
+            kit.main(
+                str(config_path),
+                None,
+                str(output_path),
+                endpoint_url=endpoint_url,
+                record_path=str(snapshot_path),
+            )
+            cloudformation = session.client("cloudformation", endpoint_url=endpoint_url)
+            problems = _check_output(output_path, _expected_sources(cloudformation))
+        finally:
+            server.stop()
+
+        # The recorded (zstd compressed) responses alone must give the same project
+        replayed_path = work_path / "replayed"
+        kit.main(str(config_path), None, str(replayed_path), replay_path=str(snapshot_path))
+        problems += _compare_files(
+            _read_tree(output_path), _read_tree(replayed_path), "replayed output"
+        )
+
+        # And the same files again, bundled into a zstd compressed archive
+        bundle_path = work_path / "spacelift.tar.zst"
+        kit.main(
+            str(config_path),
+            None,
+            str(replayed_path),
+            replay_path=str(snapshot_path),
+            bundle_path=str(bundle_path),
+        )
+        problems += _compare_files(_read_tree(output_path), _read_bundle(bundle_path), "bundle")
+
+    if problems:
+        print(f"The check against {endpoint_url} failed:")
+        for problem in problems:
+            print(f"  - {problem}")
+        return 1
+    print(
+        f"Every stack resource was imported from the scan against {endpoint_url}, "
+        "and replaying and bundling it gave the same files"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# Checks that the HCL and the JSON (--format json) backends generate the same configuration: both
+# render a few sample installations, the HCL is decoded with python-hcl2 (a development
+# dependency, see requirements-dev.txt) and every block, attribute and value is compared.
+#
+# python -m utils.format_parity
+import json
+import re
+import sys
+from typing import Any, Dict, List, Tuple
+
+import hcl2
+
+from converters.migration_context import S3_BUCKET_KEYS, MigrationContext, TargetType
+from utils.config import app_config_from_dict
+from utils.terraform_generator import SERVICES_MODULE_FILE_NAME, render_terraform_files
+
+_BASE_CONFIG = {
+    "account_name": "acme",
+    "aws_region": "eu-west-1",
+    "database": {"delete_protection_enabled": True, "instance_class": "db.r6g.large"},
+    "load_balancer": {"certificate_arn": "arn:aws:acm:eu-west-1:123456789012:certificate/cert"},
+    "vpc_config": {"use_custom_vpc": False},
+    "iot_broker_endpoint": "iot.example.com",
+}
+
+_DR_PRIMARY = {
+    "is_dr_instance": False,
+    "replica_region": "eu-central-1",
+    "s3_bucket_replication": {
+        "enabled": True,
+        "replica_kms_key_arn": "arn:aws:kms:eu-central-1:123456789012:key/replica",
+    },
+}
+
+_DR_SECONDARY = {
+    "is_dr_instance": True,
+    "replica_region": "eu-west-1",
+    "encryption_primary_key_arn": "arn:aws:kms:eu-west-1:123456789012:key/primary",
+}
+
+_CUSTOM_VPC = {
+    "use_custom_vpc": True,
+    "vpc_id": "vpc-1",
+    "private_subnet_ids": "subnet-1, subnet-2",
+    "public_subnet_ids": "subnet-3,subnet-4",
+    "server_security_group_id": "sg-server",
+    "drain_security_group_id": "sg-drain",
+    "scheduler_security_group_id": "sg-scheduler",
+    "database_security_group_id": "sg-database",
+}
+
+# Name -> (target, config overrides, whether the S3 replication is set up)
+_SAMPLES = {
+    "ecs": (TargetType.ECS, {}, False),
+    "eks": (TargetType.EKS, {}, False),
+    "ecs_dr_primary": (TargetType.ECS, {"disaster_recovery": _DR_PRIMARY}, True),
+    "eks_dr_secondary": (TargetType.EKS, {"disaster_recovery": _DR_SECONDARY}, False),
+    "ecs_custom_vpc_and_database": (
+        TargetType.ECS,
+        {
+            "vpc_config": _CUSTOM_VPC,
+            "database": {"connection_string_ssm_arn": "arn:aws:secretsmanager:secret"},
+            "proxy_config": {"http_proxy": "http://proxy", "no_proxy": "localhost"},
+        },
+        False,
+    ),
+}
+
+# hcl2 metadata keys, not part of the configuration
+_HCL_METADATA_KEYS = {"__is_block__", "__comments__", "__inline_comments__"}
+_JSONENCODE_PATTERN = re.compile(r"^\$\{jsonencode\((.*)\)\}$", re.DOTALL)
+
+
+def _sample_context(target: TargetType, overrides: Dict, replication: bool) -> MigrationContext:
+    context = MigrationContext()
+    context.target = target
+    context.config = app_config_from_dict(dict(_BASE_CONFIG, **overrides))
+
+    # What the scanners would have found
+    for index, key in enumerate(S3_BUCKET_KEYS):
+        context.s3.buckets[key].name = f"spacelift-{key.replace('_', '-')}"
+        context.s3.buckets[key].expiration_days = index
+    context.s3.cors_origin = "https://spacelift.example.com"
+    context.network.vpc_cidr_block = "10.0.0.0/16"
+    context.network.private_subnet_cidr_blocks = ["10.0.1.0/24", "10.0.2.0/24", "10.0.3.0/24"]
+    context.network.public_subnet_cidr_blocks = ["10.0.4.0/24", "10.0.5.0/24", "10.0.6.0/24"]
+    context.rds.engine_version = "14.9"
+    context.rds.preferred_backup_window = "03:00-04:00"
+    context.rds.instance_identifier = "spacelift-primary"
+    context.rds.instance_class = "db.r6g.large"
+    context.rds.parameter_group_name = "spacelift"
+    context.rds.parameter_group_description = "Spacelift parameter group"
+    if replication:
+        context.replication.role_name = "spacelift-replication"
+        context.replication.policy_name = "spacelift-replication-policy"
+        context.replication.region_name = "eu-central-1"
+        context.replication.region_key_kms_arn = "arn:aws:kms:eu-central-1:123456789012:key/replica"
+        for key in ("modules", "policy", "run_logs", "states", "workspace"):
+            context.s3.buckets[key].replica_arn = f"arn:aws:s3:::spacelift-{key}-replica"
+    return context
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _normalize(value: Any) -> Any:
+    # Brings the decoded HCL and JSON to the same shape: hcl2 keeps the quotes of strings and
+    # keys, and both syntaxes allow a single nested block to be a list of one object
+    if isinstance(value, dict):
+        return {
+            _unquote(key): _normalize(item)
+            for key, item in value.items()
+            if key not in _HCL_METADATA_KEYS and key != "//"
+        }
+    if isinstance(value, list):
+        if len(value) == 1 and isinstance(value[0], dict):
+            return _normalize(value[0])
+        return [_normalize(item) for item in value]
+    if isinstance(value, str):
+        match = _JSONENCODE_PATTERN.match(value)
+        if match:
+            # jsonencode({...}) in HCL, a JSON document in a string in JSON
+            return _normalize(hcl2.loads(f"value = {match.group(1)}\n")["value"])
+        if value.startswith("{"):
+            try:
+                return _normalize(json.loads(value))
+            except ValueError:
+                pass
+        return _unquote(value)
+    return value
+
+
+def _merge_hcl_blocks(decoded: Dict[str, List[Dict]]) -> Dict[str, Any]:
+    # hcl2 returns a list of every top level block, .tf.json files have them merged by label
+    merged: Dict[str, Any] = {}
+    for block_type, blocks in decoded.items():
+        for block in blocks:
+            if block_type in ("resource", "data"):
+                for resource_type, named in block.items():
+                    for name, body in named.items():
+                        merged.setdefault(block_type, {}).setdefault(resource_type, {})[name] = body
+            elif block_type in ("module", "output", "provider", "locals"):
+                merged.setdefault(block_type, {}).update(block)
+            elif block_type == "terraform":
+                merged[block_type] = block
+            else:
+                merged.setdefault(block_type, []).append(block)
+    return merged
+
+
+def _flatten(value: Any, path: str = "") -> Dict[str, Any]:
+    if isinstance(value, dict):
+        flat: Dict[str, Any] = {}
+        for key, item in value.items():
+            flat.update(_flatten(item, f"{path}.{key}" if path else key))
+        return flat
+    return {path: value}
+
+
+def _decoded_files(files: List[Tuple[str, str]], output_format: str) -> Dict[str, Dict]:
+    decoded = {}
+    for file_name, content in files:
+        if output_format == "json" and file_name == SERVICES_MODULE_FILE_NAME:
+            # Commented out HCL in both formats
+            continue
+        if output_format == "json":
+            configuration = json.loads(content)
+        else:
+            configuration = _merge_hcl_blocks(hcl2.loads(content))
+        name = file_name[: -len(".json")] if file_name.endswith(".json") else file_name
+        decoded[name] = _flatten(_normalize(configuration))
+    return decoded
+
+
+def compare_formats(context: MigrationContext, unique_suffix: str = "abc123") -> List[str]:
+    hcl = _decoded_files(render_terraform_files(unique_suffix, context, "hcl", 1), "hcl")
+    json_files = _decoded_files(render_terraform_files(unique_suffix, context, "json", 1), "json")
+
+    differences = []
+    for file_name in sorted(set(hcl) | set(json_files)):
+        if file_name not in hcl or file_name not in json_files:
+            differences.append(f"{file_name}: only generated in one format")
+            continue
+
+        hcl_values, json_values = hcl[file_name], json_files[file_name]
+        for path in sorted(set(hcl_values) | set(json_values)):
+            if path not in json_values:
+                differences.append(f"{file_name}: {path} is missing from the JSON")
+            elif path not in hcl_values:
+                differences.append(f"{file_name}: {path} is missing from the HCL")
+            elif hcl_values[path] != json_values[path]:
+                differences.append(
+                    f"{file_name}: {path} is {hcl_values[path]!r} in HCL, "
+                    f"but {json_values[path]!r} in JSON"
+                )
+    return differences
+
+
+def main() -> int:
+    failed = False
+    for name, (target, overrides, replication) in _SAMPLES.items():
+        differences = compare_formats(_sample_context(target, overrides, replication))
+        if differences:
+            failed = True
+            print(f"{name}: the HCL and JSON configurations differ")
+            for difference in differences:
+                print(f"  - {difference}")
+        else:
+            print(f"{name}: the HCL and JSON configurations are the same")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MANIFEST_FILE_NAME = ".output-manifest.json"
+MANIFEST_FORMAT_VERSION = 1
+
+# ioctl asking the filesystem for a copy-on-write clone of a whole file (btrfs, xfs, ...)
+_FICLONE = 0x40049409
+
+# The moves a commit is made of, kept in the staging directory until they're all done
+_JOURNAL_FILE_NAME = ".commit-journal.json"
+
+
+class OutputWriter:
+    # Collects the generated files in memory, and only touches the disk in commit: the changed
+    # files are first written to a staging directory next to the output directory, and then moved
+    # into place one by one. A run that fails before that leaves the previous output as it was.
+    #
+    # Only the generated files are touched. The output directory itself stays the same directory,
+    # so a shell or an editor sitting in it keeps working, and everything else in it (the terraform
+    # state, the .terraform directory, ...) is left alone.
+    #
+    # Once every file is staged, the moves are recorded in a journal in the staging directory. The
+    # staging directory has a fixed name, so a run that died half way through the moves is
+    # finished by the next one, and one that died before is cleaned up.
+    #
+    # In incremental mode, the sha256 of every file is kept in a manifest, and a file whose
+    # content didn't change since the last run isn't rewritten, so its mtime (and terraform's view
+    # of it) stays the same.
+    def __init__(self, output_dir: str, incremental: bool = False):
+        self.output_path = Path(output_dir).resolve()
+        self.incremental = incremental
+        self.changed: List[str] = []
+        self.unchanged: List[str] = []
+        self.removed: List[str] = []
+        # Relative path -> (content, source file to clone instead, executable)
+        self._files: Dict[str, Tuple[bytes, Optional[Path], bool]] = {}
+        # Files that must not be left over from the previous output
+        self._removals: Set[str] = set()
+        self._staging_path = self.output_path.with_name(f".{self.output_path.name}.staging")
+        self._recover_interrupted_commit()
+        self._previous_hashes = self._load_manifest() if incremental else {}
+
+    def write_text(self, relative_path: str, content: str, executable: bool = False) -> None:
+        self.write_bytes(relative_path, content.encode("utf-8"), executable)
+
+    def write_bytes(self, relative_path: str, content: bytes, executable: bool = False) -> None:
+        self._files[relative_path] = (content, None, executable)
+
+    def copy_file(self, source: Path, relative_path: str) -> None:
+        self._files[relative_path] = (source.read_bytes(), source, False)
+
+    def remove(self, relative_path: str) -> None:
+        self._removals.add(relative_path)
+
+    def read_previous(self, relative_path: str) -> Optional[str]:
+        # What the previous run generated, None if it's not there
+        try:
+            return (self.output_path / relative_path).read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def commit(self) -> None:
+        staging_path = self._staging_path
+        shutil.rmtree(staging_path, ignore_errors=True)
+        staging_path.mkdir(parents=True)
+
+        try:
+            hashes = self._stage(staging_path)
+            moves = list(self.changed)
+            if self.incremental:
+                manifest = {"version": MANIFEST_FORMAT_VERSION, "files": hashes}
+                (staging_path / MANIFEST_FILE_NAME).write_text(
+                    json.dumps(manifest, indent=2) + "\n"
+                )
+                moves.append(MANIFEST_FILE_NAME)
+
+            journal = None
+            if self.output_path.exists():
+                journal = {"moves": moves, "removals": self.removed}
+                _write_journal(staging_path, journal)
+            else:
+                os.rename(staging_path, self.output_path)
+        except BaseException:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            raise
+
+        if journal is not None:
+            # From here on, an interrupted run is finished by the next one
+            self._apply(staging_path, journal)
+
+        if self.incremental:
+            self.report()
+
+    def report(self) -> None:
+        if not self.changed and not self.removed:
+            print(f" > No file changed, all {len(self.unchanged)} file(s) are up to date.")
+            return
+
+        print(f" > {len(self.changed)} file(s) changed, {len(self.unchanged)} file(s) unchanged:")
+        for relative_path in self.changed:
+            print(f" >   ~ {relative_path}")
+        for relative_path in self.removed:
+            print(f" >   - {relative_path}")
+
+    def _stage(self, staging_path: Path) -> Dict[str, str]:
+        hashes: Dict[str, str] = {}
+
+        for relative_path, (content, source, executable) in self._files.items():
+            digest = hashlib.sha256(content).hexdigest()
+            hashes[relative_path] = digest
+
+            if self.incremental and self._is_unchanged(relative_path, digest):
+                self.unchanged.append(relative_path)
+                continue
+
+            path = staging_path / relative_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if source is not None:
+                _clone_file(source, path)
+            else:
+                path.write_bytes(content)
+            if executable:
+                os.chmod(path, 0o755)
+            self.changed.append(relative_path)
+
+        # Files generated by the previous run, but not by this one, e.g. s3_replication.tf after
+        # disabling the replication
+        removed = set(self._previous_hashes) - set(hashes)
+        removed |= {path for path in self._removals if (self.output_path / path).is_file()}
+        self.removed = sorted(removed - set(self._files))
+
+        return dict(sorted(hashes.items()))
+
+    def _apply(self, staging_path: Path, journal: Dict[str, List[str]]) -> None:
+        for relative_path in journal["moves"]:
+            staged = staging_path / relative_path
+            # Already moved by the run this one is finishing
+            if not staged.exists():
+                continue
+            destination = self.output_path / relative_path
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staged, destination)
+
+        for relative_path in journal["removals"]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.output_path / relative_path)
+
+        shutil.rmtree(staging_path)
+
+    def _recover_interrupted_commit(self) -> None:
+        if not self._staging_path.exists():
+            return
+
+        journal = _read_journal(self._staging_path)
+        if journal is None or not self.output_path.is_dir():
+            # The run died while staging, the output wasn't touched yet
+            shutil.rmtree(self._staging_path)
+            return
+
+        print(
+            f" > Warning: the previous run was interrupted while updating {self.output_path}, "
+            "finishing it."
+        )
+        self._apply(self._staging_path, journal)
+
+    def _is_unchanged(self, relative_path: str, digest: str) -> bool:
+        if self._previous_hashes.get(relative_path) != digest:
+            return False
+
+        # The file could have been edited or deleted since, only trust the manifest if it still
+        # matches what's on disk
+        try:
+            current = (self.output_path / relative_path).read_bytes()
+        except OSError:
+            return False
+        return hashlib.sha256(current).hexdigest() == digest
+
+    def _load_manifest(self) -> Dict[str, str]:
+        try:
+            manifest = json.loads((self.output_path / MANIFEST_FILE_NAME).read_text())
+        except (OSError, ValueError):
+            return {}
+
+        if manifest.get("version") != MANIFEST_FORMAT_VERSION:
+            return {}
+        return manifest.get("files", {})
+
+
+def _write_journal(staging_path: Path, journal: Dict[str, List[str]]) -> None:
+    # Written aside and renamed, so a journal is either complete or missing
+    partial_path = staging_path / f"{_JOURNAL_FILE_NAME}.partial"
+    with open(partial_path, "w") as f:
+        json.dump(journal, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(partial_path, staging_path / _JOURNAL_FILE_NAME)
+
+
+def _read_journal(staging_path: Path) -> Optional[Dict[str, List[str]]]:
+    try:
+        return json.loads((staging_path / _JOURNAL_FILE_NAME).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _clone_file(source: Path, destination: Path) -> None:
+    # The static assets are cloned rather than hard linked: a hard link would share the inode
+    # with this repository's own file, so editing the output would edit the tool itself
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+                return
+            except OSError:
+                pass
+        shutil.copyfileobj(src, dst)
+
+
+class BundleError(Exception):
+    pass
+
+
+class BundleWriter(OutputWriter):
+    # Streams the generated files into a single tar archive instead of a directory. Members are
+    # sorted, owned by root and dated SOURCE_DATE_EPOCH (or the epoch), so generating the same
+    # files always gives the same bundle, byte for byte.
+    def __init__(self, bundle_path: str, source_date_epoch: Optional[int] = None):
+        _check_bundle_compression(bundle_path)
+        super().__init__(bundle_path)
+        self.mtime = source_date_epoch or 0
+
+    def read_previous(self, relative_path: str) -> Optional[str]:
+        # A bundle is always written from scratch
+        return None
+
+    def commit(self) -> None:
+        # Written next to the bundle first, so a failed run doesn't leave a truncated archive
+        partial_path = self.output_path.with_name(f".{self.output_path.name}.partial-{os.getpid()}")
+
+        try:
+            with open(partial_path, "wb") as raw, _compressed(raw, self.output_path.name) as stream:
+                with tarfile.open(fileobj=stream, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+                    for directory in _parent_directories(self._files):
+                        tar.addfile(_tar_info(directory, tarfile.DIRTYPE, 0o755, 0, self.mtime))
+                    for relative_path in sorted(self._files):
+                        content, _, executable = self._files[relative_path]
+                        mode = 0o755 if executable else 0o644
+                        info = _tar_info(
+                            relative_path, tarfile.REGTYPE, mode, len(content), self.mtime
+                        )
+                        tar.addfile(info, io.BytesIO(content))
+            os.replace(partial_path, self.output_path)
+        except BaseException:
+            if partial_path.exists():
+                partial_path.unlink()
+            raise
+
+        self.changed = sorted(self._files)
+        print(f" > Bundled {len(self.changed)} file(s) into {self.output_path}")
+
+
+def _check_bundle_compression(path: str) -> None:
+    if not path.endswith((".tar", ".tar.gz", ".tgz", ".tar.zst")):
+        raise BundleError(f"Bundle '{path}' must be a .tar, .tar.gz, .tgz or .tar.zst file.")
+    if path.endswith(".zst"):
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            raise BundleError(
+                f"Bundle '{path}' is zstd compressed, which needs the zstandard package "
+                "(pip install zstandard). Alternatively, use a .tar or .tar.gz file."
+            )
+
+
+@contextlib.contextmanager
+def _compressed(raw: IO[bytes], name: str) -> Iterator[IO[bytes]]:
+    # The compressed stream has to be closed (and so flushed) before the file below it
+    if name.endswith(".zst"):
+        import zstandard
+
+        stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+    elif name.endswith((".gz", ".tgz")):
+        # The default gzip header holds the current time and the file name
+        stream = gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0)
+    else:
+        yield raw
+        return
+
+    with stream:
+        yield stream
+
+
+def _parent_directories(relative_paths) -> List[str]:
+    directories = set()
+    for relative_path in relative_paths:
+        parent = Path(relative_path).parent
+        while parent != Path("."):
+            directories.add(parent.as_posix())
+            parent = parent.parent
+    return sorted(directories)
+
+
+def _tar_info(name: str, member_type: bytes, mode: int, size: int, mtime: int) -> tarfile.TarInfo:
+    info = tarfile.TarInfo(name)
+    info.type = member_type
+    info.mode = mode
+    info.size = size
+    info.mtime = mtime
+    info.uid = info.gid = 0
+    info.uname = info.gname = ""
+    return info
@@ -0,0 +1,125 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Error codes AWS services use to tell the caller to slow down
+THROTTLING_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "RequestLimitExceeded",
+    "TooManyRequestsException",
+    "SlowDown",
+}
+
+# Requests per second each service starts from. These are conservative compared to the documented
+# API limits, since other tooling in the account shares the same limits, so unless a limit is
+# configured the rate keeps going up while AWS accepts the calls, and is halved when it throttles.
+DEFAULT_RATES: Dict[str, float] = {
+    "cloudformation": 5.0,
+    "ec2": 20.0,
+    "iam": 10.0,
+    "rds": 10.0,
+    "s3": 50.0,
+    "secretsmanager": 20.0,
+    "ssm": 10.0,
+}
+FALLBACK_RATE = 10.0
+
+
+class TokenBucket:
+    def __init__(self, rate: float, max_rate: Optional[float] = None, min_rate: float = 0.5):
+        # Without a max_rate, the rate is only bounded by AWS throttling the calls
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.step = rate / 20
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.throttle_count = 0
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_throttle(self) -> None:
+        # Multiplicative decrease, and drop the burst we might have saved up
+        with self._lock:
+            self.throttle_count += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+    def on_success(self) -> None:
+        # Additive increase, probing for the highest rate AWS accepts, and climbing back after a
+        # throttling episode
+        with self._lock:
+            self.rate += self.step
+            if self.max_rate is not None:
+                self.rate = min(self.max_rate, self.rate)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+
+class RateLimiter:
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        # The configured rates are both where their service starts and its maximum
+        self.limits = dict(rates or {})
+        self.rates = dict(DEFAULT_RATES)
+        self.rates.update(self.limits)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, service_name: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(service_name)
+            if bucket is None:
+                bucket = TokenBucket(
+                    self.rates.get(service_name, FALLBACK_RATE), self.limits.get(service_name)
+                )
+                self._buckets[service_name] = bucket
+            return bucket
+
+    def attach(self, client: Any) -> None:
+        # Every HTTP attempt, retries included, takes a token from the service's bucket
+        bucket = self.bucket(client.meta.service_model.service_name)
+
+        def before_send(**kwargs):
+            bucket.acquire()
+
+        def needs_retry(response=None, **kwargs):
+            if response is None:
+                return None
+            error_code = response[1].get("Error", {}).get("Code")
+            if error_code in THROTTLING_ERROR_CODES:
+                bucket.on_throttle()
+            elif error_code is None:
+                bucket.on_success()
+            return None
+
+        client.meta.events.register("before-send", before_send)
+        client.meta.events.register("needs-retry", needs_retry)
+
+    def effective_rates(self) -> Dict[str, float]:
+        with self._lock:
+            return {name: bucket.rate for name, bucket in sorted(self._buckets.items())}
+
+    def throttled_services(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                name: bucket.throttle_count
+                for name, bucket in sorted(self._buckets.items())
+                if bucket.throttle_count
+            }
@@ -0,0 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, TypeVar
+
+T = TypeVar("T")
+
+
+def run_concurrently(tasks: List[Callable[[], T]], concurrency: int) -> List[T]:
+    # Results are returned in the order of the tasks, regardless of which one finished first
+    if concurrency <= 1 or len(tasks) <= 1:
+        return [task() for task in tasks]
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(tasks))) as executor:
+        futures = [executor.submit(task) for task in tasks]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
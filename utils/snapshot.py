@@ -0,0 +1,135 @@
+import copy
+import datetime
+import gzip
+import io
+import json
+import threading
+from typing import IO, Any, Dict
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class _ReplayedHttpResponse:
+    # botocore only needs the status code to decide whether the parsed response is an error
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.headers: Dict[str, str] = {}
+        self.content = b""
+
+
+def _capture_params(params, context, **kwargs):
+    context["snapshot_params"] = copy.deepcopy(params)
+
+
+def _response_key(client: Any, operation_name: str, params: Dict) -> str:
+    service_name = client.meta.service_model.service_name
+    region_name = client.meta.region_name
+    return f"{service_name}/{region_name}/{operation_name} {_dumps(params, sort_keys=True)}"
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    return str(value)
+
+
+def _json_object_hook(value: Dict) -> Any:
+    if len(value) == 1 and "__datetime__" in value:
+        return datetime.datetime.fromisoformat(value["__datetime__"])
+    return value
+
+
+def _dumps(value: Any, **kwargs) -> str:
+    return json.dumps(value, default=_json_default, separators=(",", ":"), **kwargs)
+
+
+def _check_compression(path: str) -> None:
+    if path.endswith(".zst"):
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            raise SnapshotError(
+                f"Snapshot '{path}' is zstd compressed, which needs the zstandard package "
+                "(pip install zstandard). Alternatively, use a .json or .json.gz file."
+            )
+
+
+def _open_snapshot(path: str, mode: str) -> IO[str]:
+    _check_compression(path)
+
+    if path.endswith(".zst"):
+        import zstandard
+
+        if mode == "r":
+            stream = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(open(path, "wb"), closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class SnapshotRecorder:
+    def __init__(self, path: str):
+        _check_compression(path)
+        self.path = path
+        self.responses: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, client: Any) -> None:
+        def after_call(http_response, parsed, model, context, **kwargs):
+            key = _response_key(client, model.name, context.get("snapshot_params", {}))
+            # Request ids and dates differ on every call, leaving them out keeps snapshots stable
+            response = {k: v for k, v in parsed.items() if k != "ResponseMetadata"}
+            with self._lock:
+                self.responses[key] = {"status": http_response.status_code, "parsed": response}
+
+        client.meta.events.register("before-parameter-build", _capture_params)
+        client.meta.events.register("after-call", after_call)
+
+    def save(self) -> None:
+        with self._lock:
+            content = _dumps(
+                {"version": SNAPSHOT_FORMAT_VERSION, "responses": self.responses}, sort_keys=True
+            )
+        with _open_snapshot(self.path, "w") as f:
+            f.write(content)
+        print(f" > Recorded {len(self.responses)} AWS response(s) to {self.path}")
+
+
+class SnapshotReplayer:
+    def __init__(self, path: str):
+        try:
+            with _open_snapshot(path, "r") as f:
+                snapshot = json.loads(f.read(), object_hook=_json_object_hook)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Could not read snapshot '{path}': {e}")
+
+        if snapshot.get("version") != SNAPSHOT_FORMAT_VERSION:
+            raise SnapshotError(
+                f"Snapshot '{path}' has format version {snapshot.get('version')}, "
+                f"expected {SNAPSHOT_FORMAT_VERSION}. Please record it again."
+            )
+
+        self.path = path
+        self.responses: Dict[str, Dict] = snapshot["responses"]
+
+    def attach(self, client: Any) -> None:
+        # Answering before-call short-circuits botocore, so the request is never signed nor sent
+        def before_call(model, context, **kwargs):
+            key = _response_key(client, model.name, context.get("snapshot_params", {}))
+            response = self.responses.get(key)
+            if response is None:
+                raise SnapshotError(
+                    f"Snapshot '{self.path}' has no recorded response for {key}. "
+                    "The config probably changed in a way that needs a new recording."
+                )
+            return _ReplayedHttpResponse(response["status"]), copy.deepcopy(response["parsed"])
+
+        client.meta.events.register("before-parameter-build", _capture_params)
+        client.meta.events.register("before-call", before_call)
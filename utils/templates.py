@@ -0,0 +1,31 @@
+import functools
+import re
+from typing import Any, Pattern
+
+# {{name}}, so the braces of the HCL (or JSON, or Python) around it don't need any escaping
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class Template:
+    # The source is split into its literal chunks and placeholder names once, rendering is then a
+    # single pass joining the chunks with the values
+    def __init__(self, source: str, pattern: Pattern = PLACEHOLDER_PATTERN):
+        parts = pattern.split(source)
+        self.literals = parts[0::2]
+        self.placeholders = parts[1::2]
+
+    def render(self, **values: Any) -> str:
+        chunks = [self.literals[0]]
+        for placeholder, literal in zip(self.placeholders, self.literals[1:]):
+            try:
+                chunks.append(str(values[placeholder]))
+            except KeyError:
+                raise KeyError(f"No value given for the template placeholder '{placeholder}'")
+            chunks.append(literal)
+        return "".join(chunks)
+
+
+@functools.lru_cache(maxsize=None)
+def load_template(path: str, pattern: Pattern = PLACEHOLDER_PATTERN) -> Template:
+    with open(path, "r") as f:
+        return Template(f.read(), pattern)
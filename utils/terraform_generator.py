@@ -1,91 +1,114 @@
+import functools
+import io
+import re
 from pathlib import Path
-from typing import List, Optional
+from typing import IO, Callable, List, Optional, Tuple
 
 from converters.migration_context import MigrationContext, TargetType
-import os
-import shutil
+from utils import terraform_json
+from utils.output_writer import OutputWriter
+from utils.scheduler import run_concurrently
+from utils.templates import Template, load_template
+
+# Commented out services module written next to the .tf.json files
+SERVICES_MODULE_FILE_NAME = "spacelift_services.tf"
 
 
 def generate_tf_files(
-    unique_suffix: Optional[str], context: MigrationContext, output_dir: str
+    unique_suffix: Optional[str],
+    context: MigrationContext,
+    output: OutputWriter,
+    concurrency: int = 4,
+    output_format: str = "hcl",
 ) -> None:
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
-
-    shutil.copyfile(
-        str(Path(__file__).parent.parent / "README.md"),
-        str(output_path / "README.md"),
-    )
-    Path(output_path / "docs").mkdir(exist_ok=True)
+    output.copy_file(Path(__file__).parent.parent / "README.md", "README.md")
 
     if context.target == TargetType.EKS:
-        shutil.copyfile(
-            str(Path(__file__).parent.parent / "docs/cloudformation_to_eks.md"),
-            str(output_path / "docs/cloudformation_to_eks.md"),
+        output.copy_file(
+            Path(__file__).parent.parent / "docs/cloudformation_to_eks.md",
+            "docs/cloudformation_to_eks.md",
         )
     else:
-        shutil.copyfile(
-            str(Path(__file__).parent.parent / "docs/cloudformation_to_ecs.md"),
-            str(output_path / "docs/cloudformation_to_ecs.md"),
+        output.copy_file(
+            Path(__file__).parent.parent / "docs/cloudformation_to_ecs.md",
+            "docs/cloudformation_to_ecs.md",
         )
 
-    shutil.copyfile(
-        str(Path(__file__).parent / "delete_cf_stacks.py"),
-        str(output_path / "delete_cf_stacks.py"),
-    )
+    output.copy_file(Path(__file__).parent / "delete_cf_stacks.py", "delete_cf_stacks.py")
 
     if not context.config.vpc_config.use_custom_vpc:
-        shutil.copyfile(
-            str(Path(__file__).parent / "internet_gateway_refactor.py"),
-            str(output_path / "internet_gateway_refactor.py"),
+        output.write_text(
+            "internet_gateway_refactor.py",
+            replace_variables_in_gateway_refactor_file(
+                context, str(Path(__file__).parent / "internet_gateway_refactor.py")
+            ),
+            executable=True,
         )
-        replace_variables_in_gateway_refactor_file(
-            context, str(output_path / "internet_gateway_refactor.py")
+
+    if output_format == "hcl":
+        # main.tf carries the services module itself
+        output.remove(SERVICES_MODULE_FILE_NAME)
+
+    for file_name, content in render_terraform_files(
+        unique_suffix, context, output_format, concurrency
+    ):
+        output.write_text(file_name, content)
+        # Terraform would load both if the other format was generated into the same directory
+        output.remove(other_format_file_name(file_name))
+
+
+def render_terraform_files(
+    unique_suffix: Optional[str],
+    context: MigrationContext,
+    output_format: str = "hcl",
+    concurrency: int = 4,
+) -> List[Tuple[str, str]]:
+    if output_format == "json":
+        renderers = terraform_json.renderers(unique_suffix, context)
+        if context.target != TargetType.EKS:
+            # JSON has no comments, the module to uncomment later gets its own (HCL) file instead
+            renderers.append(
+                (SERVICES_MODULE_FILE_NAME, lambda f: write_services_module_file(f, context))
+            )
+    else:
+        renderers = _hcl_renderers(unique_suffix, context)
+
+    # The renderers only read the context, so all files are rendered to memory at the same time
+    contents = run_concurrently(
+        [functools.partial(_render, write_content) for _, write_content in renderers], concurrency
+    )
+    return [(file_name, content) for (file_name, _), content in zip(renderers, contents)]
+
+
+def other_format_file_name(file_name: str) -> str:
+    if file_name.endswith(".tf.json"):
+        return file_name[: -len(".json")]
+    return file_name + ".json"
+
+
+def _hcl_renderers(
+    unique_suffix: Optional[str], context: MigrationContext
+) -> List[Tuple[str, Callable[[IO[str]], None]]]:
+    renderers: List[Tuple[str, Callable[[IO[str]], None]]] = [
+        ("data_sources.tf", write_data_source_terraform_content),
+        ("kms.tf", lambda f: write_kms_terraform_content(f, context)),
+        ("secrets_manager.tf", lambda f: write_secret_resources(f, context)),
+        ("sqs.tf", write_sqs_terraform_content),
+    ]
+    if context.replication.role_name and context.replication.policy_name:
+        renderers.append(
+            ("s3_replication.tf", lambda f: write_s3_replication_terraform_content(f, context))
         )
+    renderers.append(("iot.tf", lambda f: write_iot_terraform_content(f, context)))
+    renderers.append(("main.tf", lambda f: write_main_terraform_content(f, unique_suffix, context)))
 
-    data_source_file = output_path / "data_sources.tf"
-    data_source_file.unlink(missing_ok=True)
-    data_source_file.touch()
-    with open(data_source_file, "a") as f:
-        write_data_source_terraform_content(f)
-
-    kms_file = output_path / "kms.tf"
-    kms_file.unlink(missing_ok=True)
-    kms_file.touch()
-    with open(kms_file, "a") as f:
-        write_kms_terraform_content(f, context)
-
-    secrets_manager_file = output_path / "secrets_manager.tf"
-    secrets_manager_file.unlink(missing_ok=True)
-    secrets_manager_file.touch()
-    with open(secrets_manager_file, "a") as f:
-        write_secret_resources(f, context)
-
-    sqs_file = output_path / "sqs.tf"
-    sqs_file.unlink(missing_ok=True)
-    sqs_file.touch()
-    with open(sqs_file, "a") as f:
-        write_sqs_terraform_content(f)
-
-    if context.s3_replication_role_name and context.s3_replication_policy_name:
-        s3_replication_file = output_path / "s3_replication.tf"
-        s3_replication_file.unlink(missing_ok=True)
-        s3_replication_file.touch()
-        with open(s3_replication_file, "a") as f:
-            write_s3_replication_terraform_content(f, context)
-
-    iot_file = output_path / "iot.tf"
-    iot_file.unlink(missing_ok=True)
-    iot_file.touch()
-    with open(iot_file, "a") as f:
-        write_iot_terraform_content(f, context)
-
-    main_file = output_path / "main.tf"
-    main_file.unlink(missing_ok=True)
-    main_file.touch()
-
-    with open(main_file, "a") as f:
-        write_main_terraform_content(f, unique_suffix, context)
+    return renderers
+
+
+def _render(write_content: Callable[[IO[str]], None]) -> str:
+    buffer = io.StringIO()
+    write_content(buffer)
+    return buffer.getvalue()
 
 
 def write_main_terraform_content(f, unique_suffix: str, context: MigrationContext) -> None:
@@ -99,32 +122,53 @@ def write_main_terraform_content(f, unique_suffix: str, context: MigrationContex
         f.write(create_spacelift_services_module(context))
 
 
+def write_services_module_file(f, context: MigrationContext) -> None:
+    f.write(
+        create_spacelift_services_module(context, "the spacelift module in main.tf.json").lstrip()
+    )
+
+
+# The script keeps its placeholders as {NAME}, the rest of its braces are regular Python
+_GATEWAY_REFACTOR_PLACEHOLDER_PATTERN = re.compile(r"\{([A-Z][A-Z0-9_]*)\}")
+
+
 def replace_variables_in_gateway_refactor_file(
     context: MigrationContext, script_file_path: str
-) -> None:
-    with open(script_file_path, "r") as template_file:
-        template_content = template_file.read()
-
-    # Replace template placeholders with actual values
-    script_content = template_content
-    script_content = script_content.replace("{REGION}", context.config.aws_region)
-    script_content = script_content.replace(
-        "{GATEWAY1_ROUTE_TABLE_ID}", context.gateway1_route_table_id
-    )
-    script_content = script_content.replace("{PUBLIC_SUBNET_ID_2}", context.public_subnet_id_2)
-    script_content = script_content.replace("{PUBLIC_SUBNET_ID_3}", context.public_subnet_id_3)
+) -> str:
+    template = load_template(script_file_path, _GATEWAY_REFACTOR_PLACEHOLDER_PATTERN)
 
     # Handle optional parameters
-    gateway2_id = context.gateway2_association_id if context.gateway2_association_id else "None"
-    gateway3_id = context.gateway3_association_id if context.gateway3_association_id else "None"
-    script_content = script_content.replace("{GATEWAY2_ASSOCIATION_ID}", gateway2_id)
-    script_content = script_content.replace("{GATEWAY3_ASSOCIATION_ID}", gateway3_id)
+    network = context.network
+    gateway2_id = network.gateway2_association_id if network.gateway2_association_id else "None"
+    gateway3_id = network.gateway3_association_id if network.gateway3_association_id else "None"
+
+    return template.render(
+        REGION=context.config.aws_region,
+        GATEWAY1_ROUTE_TABLE_ID=network.gateway1_route_table_id,
+        PUBLIC_SUBNET_ID_2=network.public_subnet_ids[1],
+        PUBLIC_SUBNET_ID_3=network.public_subnet_ids[2],
+        GATEWAY2_ASSOCIATION_ID=gateway2_id,
+        GATEWAY3_ASSOCIATION_ID=gateway3_id,
+    )
 
-    with open(script_file_path, "w") as f:
-        f.write(script_content)
 
-    # Make the script executable
-    os.chmod(script_file_path, 0o755)
+_PROVIDER_BLOCK_TEMPLATE = Template("""
+{{top_of_file_message}}
+terraform {
+  required_providers {
+    aws = {
+      source  = "hashicorp/aws"
+      version = "~> 6.0"
+    }{{random_provider}}
+  }
+
+  # Optionally, set up a remote backend here
+}
+
+provider "aws" {
+  region = local.region
+}
+""")
 
 
 def create_terraform_provider_block(context: MigrationContext) -> str:
@@ -143,35 +187,27 @@ def create_terraform_provider_block(context: MigrationContext) -> str:
       version = "~> 3.0"
     }"""
 
-    return f"""
-{top_of_file_message}
-terraform {{
-  required_providers {{
-    aws = {{
-      source  = "hashicorp/aws"
-      version = "~> 6.0"
-    }}{random_provider}
-  }}
+    return _PROVIDER_BLOCK_TEMPLATE.render(
+        top_of_file_message=top_of_file_message, random_provider=random_provider
+    ).lstrip()
 
-  # Optionally, set up a remote backend here
-}}
 
-provider "aws" {{
-  region = local.region
-}}
-""".lstrip()
+_LOCALS_BLOCK_TEMPLATE = Template("""
+locals {
+  region            = "{{region}}"
+  spacelift_version = "v3.0.0" # TODO: This is the tag of the Docker images uploaded to the "spacelift" and "spacelift-launcher" ECRs.
+  website_domain    = "{{website_domain}}"
+  website_endpoint  = "https://${local.website_domain}"
+  license_token     = "<TODO: you need to set this value>" # This value must be set to the license token you received from Spacelift.
+}
+""")
 
 
 def create_locals_block(context: MigrationContext) -> str:
-    return f"""
-locals {{
-  region            = "{context.config.aws_region}"
-  spacelift_version = "v3.0.0" # TODO: This is the tag of the Docker images uploaded to the "spacelift" and "spacelift-launcher" ECRs.
-  website_domain    = "{context.cors_origin.replace('https://', '')}"
-  website_endpoint  = "https://${{local.website_domain}}"
-  license_token     = "<TODO: you need to set this value>" # This value must be set to the license token you received from Spacelift.
-}}
-"""
+    return _LOCALS_BLOCK_TEMPLATE.render(
+        region=context.config.aws_region,
+        website_domain=context.s3.cors_origin.replace("https://", ""),
+    )
 
 
 def format_subnet_cidr_blocks(cidr_blocks: List[str]) -> str:
@@ -195,149 +231,162 @@ def get_db_password_arn(context: MigrationContext) -> str:
         return "aws_secretsmanager_secret.db_pw.arn"
 
 
-def create_spacelift_module(unique_suffix: str, context: MigrationContext) -> str:
-    if not context.config.uses_custom_database_connection_string():
-        rds_section = f"""
-  rds_engine_version              = "{context.rds_engine_version}"
-  rds_preferred_backup_window     = "{context.rds_preferred_backup_window}"
-  rds_regional_cluster_identifier = "spacelift"
-  rds_parameter_group_name        = "{context.rds_parameter_group_name}"
-  rds_subnet_group_name           = "spacelift"
-  rds_parameter_group_description = "{context.rds_parameter_group_description}"
-  rds_password_sm_arn             = {get_db_password_arn(context)}
-  rds_instance_configuration      = {{
-    "primary" = {{
-      instance_identifier = "{context.rds_instance_identifier}"
-      instance_class      = "{context.rds_instance_class}"
-    }}
-  }}
-""".rstrip()
-    else:
-        rds_section = "  create_database = false  # Note: RDS resources are untracked by Terraform. Feel free to import them."
+_S3_BUCKET_CONFIGURATION_TEMPLATE = Template(
+    """    binaries     = { name = "{{binaries_bucket_name}}", expiration_days = {{binaries_bucket_expiration_days}} }
+    deliveries   = { name = "{{deliveries_bucket_name}}", expiration_days = {{deliveries_bucket_expiration_days}} }
+    large_queue  = { name = "{{large_queue_bucket_name}}", expiration_days = {{large_queue_bucket_expiration_days}} }
+    metadata     = { name = "{{metadata_bucket_name}}", expiration_days = {{metadata_bucket_expiration_days}} }
+    modules      = { name = "{{modules_bucket_name}}", expiration_days = {{modules_bucket_expiration_days}} }
+    policy       = { name = "{{policy_bucket_name}}", expiration_days = {{policy_bucket_expiration_days}} }
+    run_logs     = { name = "{{run_logs_bucket_name}}", expiration_days = {{run_logs_bucket_expiration_days}} }
+    states       = { name = "{{states_bucket_name}}", expiration_days = {{states_bucket_expiration_days}} }
+    uploads      = { name = "{{uploads_bucket_name}}", expiration_days = {{uploads_bucket_expiration_days}} }
+    user_uploads = { name = "{{user_uploads_bucket_name}}", expiration_days = {{user_uploads_bucket_expiration_days}} }
+    workspace    = { name = "{{workspace_bucket_name}}", expiration_days = {{workspace_bucket_expiration_days}} }"""
+)
+
+_CUSTOM_VPC_CONFIG_TEMPLATE = Template("""
+  create_vpc             = false
+  rds_subnet_ids         = {{rds_subnet_ids}}
+  rds_security_group_ids = ["{{database_security_group_id}}"]
+""")
 
+_VPC_CONFIG_TEMPLATE = Template("""
+  vpc_cidr_block             = "{{vpc_cidr_block}}"
+  public_subnet_cidr_blocks  = {{public_subnet_cidr_blocks}}
+  private_subnet_cidr_blocks = {{private_subnet_cidr_blocks}}
+""")
+
+
+def _s3_bucket_configuration(context: MigrationContext) -> str:
+    values = {}
+    for key, bucket in context.s3.buckets.items():
+        values[f"{key}_bucket_name"] = bucket.name
+        values[f"{key}_bucket_expiration_days"] = bucket.expiration_days
+    return _S3_BUCKET_CONFIGURATION_TEMPLATE.render(**values)
+
+
+def _vpc_config(context: MigrationContext) -> str:
     if context.config.vpc_config and context.config.vpc_config.use_custom_vpc:
-        vpc_config = f"""
-  create_vpc             = false
-  rds_subnet_ids         = {format_subnet_ids(context.config.vpc_config.private_subnet_ids)}
-  rds_security_group_ids = ["{context.config.vpc_config.database_security_group_id}"]
-"""
-    else:
-        public_subnet_cidr_blocks = format_subnet_cidr_blocks(context.public_subnet_cidr_blocks)
-        private_subnet_cidr_blocks = format_subnet_cidr_blocks(context.private_subnet_cidr_blocks)
-        vpc_config = f"""
-  vpc_cidr_block             = "{context.vpc_cidr_block}"
-  public_subnet_cidr_blocks  = {public_subnet_cidr_blocks}
-  private_subnet_cidr_blocks = {private_subnet_cidr_blocks}
-"""
-
-    return f"""        
-module "spacelift" {{
+        return _CUSTOM_VPC_CONFIG_TEMPLATE.render(
+            rds_subnet_ids=format_subnet_ids(context.config.vpc_config.private_subnet_ids),
+            database_security_group_id=context.config.vpc_config.database_security_group_id,
+        )
+
+    return _VPC_CONFIG_TEMPLATE.render(
+        vpc_cidr_block=context.network.vpc_cidr_block,
+        public_subnet_cidr_blocks=format_subnet_cidr_blocks(
+            context.network.public_subnet_cidr_blocks
+        ),
+        private_subnet_cidr_blocks=format_subnet_cidr_blocks(
+            context.network.private_subnet_cidr_blocks
+        ),
+    )
+
+
+def _rds_values(context: MigrationContext) -> dict:
+    return {
+        "rds_engine_version": context.rds.engine_version,
+        "rds_preferred_backup_window": context.rds.preferred_backup_window,
+        "rds_parameter_group_name": context.rds.parameter_group_name,
+        "rds_parameter_group_description": context.rds.parameter_group_description,
+        "rds_password_sm_arn": get_db_password_arn(context),
+        "rds_instance_identifier": context.rds.instance_identifier,
+        "rds_instance_class": context.rds.instance_class,
+    }
+
+
+def _kms_encryption_key_arn(context: MigrationContext) -> str:
+    if context.config.is_primary_region():
+        return "aws_kms_key.encryption_primary.arn"
+    return "aws_kms_replica_key.encryption_replica_key.arn"
+
+
+_SPACELIFT_RDS_TEMPLATE = Template("""
+  rds_engine_version              = "{{rds_engine_version}}"
+  rds_preferred_backup_window     = "{{rds_preferred_backup_window}}"
+  rds_regional_cluster_identifier = "spacelift"
+  rds_parameter_group_name        = "{{rds_parameter_group_name}}"
+  rds_subnet_group_name           = "spacelift"
+  rds_parameter_group_description = "{{rds_parameter_group_description}}"
+  rds_password_sm_arn             = {{rds_password_sm_arn}}
+  rds_instance_configuration      = {
+    "primary" = {
+      instance_identifier = "{{rds_instance_identifier}}"
+      instance_class      = "{{rds_instance_class}}"
+    }
+  }
+""")
+
+_SPACELIFT_MODULE_TEMPLATE = Template("""        
+module "spacelift" {
   source = "github.com/spacelift-io/terraform-aws-spacelift-selfhosted?ref=v2.2.0"
 
   region           = local.region
   website_endpoint = local.website_endpoint
-  unique_suffix    = "{unique_suffix}"
+  unique_suffix    = "{{unique_suffix}}"
 
   # Note that certain buckets have no retention rules in place. In which case their expiration_days will be set to 0.
-  s3_bucket_configuration  = {{
-    binaries     = {{ name = "{context.binaries_bucket_name}", expiration_days = {context.binaries_bucket_expiration_days} }}
-    deliveries   = {{ name = "{context.deliveries_bucket_name}", expiration_days = {context.deliveries_bucket_expiration_days} }}
-    large_queue  = {{ name = "{context.large_queue_name}", expiration_days = {context.large_queue_bucket_expiration_days} }}
-    metadata     = {{ name = "{context.metadata_bucket_name}", expiration_days = {context.metadata_bucket_expiration_days} }}
-    modules      = {{ name = "{context.modules_bucket_name}", expiration_days = {context.modules_bucket_expiration_days} }}
-    policy       = {{ name = "{context.policy_bucket_name}", expiration_days = {context.policy_bucket_expiration_days} }}
-    run_logs     = {{ name = "{context.run_logs_bucket_name}", expiration_days = {context.run_logs_bucket_expiration_days} }}
-    states       = {{ name = "{context.states_bucket_name}", expiration_days = {context.states_bucket_expiration_days} }}
-    uploads      = {{ name = "{context.uploads_bucket_name}", expiration_days = {context.uploads_bucket_expiration_days} }}
-    user_uploads = {{ name = "{context.user_uploads_bucket_name}", expiration_days = {context.user_uploads_bucket_expiration_days} }}
-    workspace    = {{ name = "{context.workspace_bucket_name}", expiration_days = {context.workspace_bucket_expiration_days} }}
-  }}
+  s3_bucket_configuration  = {
+{{s3_buckets}}
+  }
 
   kms_arn                       = aws_kms_key.master.arn
   kms_master_key_multi_regional = false
   kms_jwt_key_multi_regional    = false
-{vpc_config}        
+{{vpc_config}}        
   number_of_images_to_retain   = 10
   backend_ecr_repository_name  = "spacelift"
   launcher_ecr_repository_name = "spacelift-launcher"
 
-  security_group_names = {{
+  security_group_names = {
     database    = "database_sg"
     drain       = "drain_sg"
     scheduler   = "scheduler_sg"
     server      = "server_sg"
     vcs_gateway = "" # Mandatory, but leave it empty
-  }}
+  }
         
-{rds_section}        
-}}
-"""
+{{rds_section}}        
+}
+""")
 
 
-def create_spacelift_services_module(context: MigrationContext) -> str:
-    if context.config.vpc_config and context.config.vpc_config.use_custom_vpc:
-        vpc_config = f"""
-#  vpc_id                      = "{context.config.vpc_config.vpc_id}"
-#  ecs_subnets                 = {format_subnet_ids(context.config.vpc_config.private_subnet_ids)}
-#  server_lb_subnets           = {format_subnet_ids(context.config.vpc_config.public_subnet_ids)}
-#  server_security_group_id    = "{context.config.vpc_config.server_security_group_id}"
-#  drain_security_group_id     = "{context.config.vpc_config.drain_security_group_id}"
-#  scheduler_security_group_id = "{context.config.vpc_config.scheduler_security_group_id}"
-""".lstrip()
+def create_spacelift_module(unique_suffix: str, context: MigrationContext) -> str:
+    if not context.config.uses_custom_database_connection_string():
+        rds_section = _SPACELIFT_RDS_TEMPLATE.render(**_rds_values(context)).rstrip()
     else:
-        vpc_config = """
-#  vpc_id      = module.spacelift.vpc_id
-#  ecs_subnets = module.spacelift.private_subnet_ids
-#  
-#  server_lb_subnets           = module.spacelift.public_subnet_ids
-#  server_security_group_id    = module.spacelift.server_security_group_id
-#  
-#  drain_security_group_id     = module.spacelift.drain_security_group_id
-#  scheduler_security_group_id = module.spacelift.scheduler_security_group_id
-""".lstrip()
-    ecs_service_desired_count = ""
-    if not context.config.is_primary_region():
-        ecs_service_desired_count = """
-#  drain_desired_count = 0
-#  scheduler_desired_count = 0
-#  server_desired_count = 0
-        """.strip()
+        rds_section = "  create_database = false  # Note: RDS resources are untracked by Terraform. Feel free to import them."
 
-    if context.config.uses_custom_database_connection_string():
-        db_secret = f"""
-#    {{
-#      name = "DATABASE_URL"
-#      valueFrom = "{context.config.database.connection_string_ssm_arn}:DATABASE_URL::"
-#    }}
-        """.strip()
-    else:
-        db_secret = """
+    return _SPACELIFT_MODULE_TEMPLATE.render(
+        unique_suffix=unique_suffix,
+        s3_buckets=_s3_bucket_configuration(context),
+        vpc_config=_vpc_config(context),
+        rds_section=rds_section,
+    )
+
+
+_SERVICES_CUSTOM_VPC_CONFIG_TEMPLATE = Template("""
+#  vpc_id                      = "{{vpc_id}}"
+#  ecs_subnets                 = {{ecs_subnets}}
+#  server_lb_subnets           = {{server_lb_subnets}}
+#  server_security_group_id    = "{{server_security_group_id}}"
+#  drain_security_group_id     = "{{drain_security_group_id}}"
+#  scheduler_security_group_id = "{{scheduler_security_group_id}}"
+""")
+
+_SERVICES_CUSTOM_DB_SECRET_TEMPLATE = Template("""
 #    {
 #      name = "DATABASE_URL"
-#      valueFrom = "${module.spacelift.database_secret_arn}:DATABASE_URL::"
-#    },
-#    {
-#      name = "DATABASE_READ_ONLY_URL"
-#      valueFrom = "${module.spacelift.database_secret_arn}:DATABASE_READ_ONLY_URL::"
+#      valueFrom = "{{connection_string_ssm_arn}}:DATABASE_URL::"
 #    }
-""".lstrip()
+        """)
 
-    additional_env_vars = ""
-    if context.config.has_custom_proxy_config():
-        additional_env_vars = "  additional_env_vars = ["
-        if context.config.proxy_config.http_proxy:
-            additional_env_vars += f'\n#    {{ name = "HTTP_PROXY", value = "{context.config.proxy_config.http_proxy}" }},'
-        if context.config.proxy_config.https_proxy:
-            additional_env_vars += f'\n#    {{ name = "HTTPS_PROXY", value = "{context.config.proxy_config.https_proxy}" }},'
-        if context.config.proxy_config.no_proxy:
-            additional_env_vars += (
-                f'\n#    {{ name = "NO_PROXY", value = "{context.config.proxy_config.no_proxy}" }},'
-            )
-        additional_env_vars += "\n#  ]"
+_PROXY_ENV_VAR_TEMPLATE = Template('\n#    { name = "{{name}}", value = "{{value}}" },')
 
-    return f"""
-# Uncomment after the above module applied successfully
-#module "spacelift_services" {{
+_SPACELIFT_SERVICES_MODULE_TEMPLATE = Template("""
+# Uncomment after {{applied_module}} applied successfully
+#module "spacelift_services" {
 #  source = "github.com/spacelift-io/terraform-aws-ecs-spacelift-selfhosted?ref=v2.5.0"
 #  
 #  region               = local.region
@@ -348,38 +397,38 @@ def create_spacelift_services_module(context: MigrationContext) -> str:
 #  license_token = local.license_token
 #  
 #  encryption_type        = "kms"
-#  kms_encryption_key_arn = {"aws_kms_key.encryption_primary.arn" if context.config.is_primary_region() else "aws_kms_replica_key.encryption_replica_key.arn"}  
+#  kms_encryption_key_arn = {{kms_encryption_key_arn}}  
 #  kms_signing_key_arn    = aws_kms_key.jwt.arn
-{f'#  iot_endpoint = "{context.config.iot_broker_endpoint}"' if context.config.iot_broker_endpoint else ""}
-#{additional_env_vars}
+{{iot_endpoint}}
+#{{additional_env_vars}}
 #  secrets_manager_secret_arns = [
-{"#    module.spacelift.database_secret_arn," if not context.config.uses_custom_database_connection_string() else f'#    "{context.config.database.connection_string_ssm_arn}",'}
+{{database_secret_arn}}
 #    aws_secretsmanager_secret.slack_credentials.arn,
 #    aws_secretsmanager_secret.additional_root_ca_certificates.arn,
 #    aws_secretsmanager_secret.saml_credentials.arn,
 #  ]
 #  sensitive_env_vars          = [
-#    {{
+#    {
 #      name = "SAML_CERT"
-#      valueFrom = "${{aws_secretsmanager_secret.saml_credentials.arn}}:certificate::"
-#    }},
-#    {{
+#      valueFrom = "${aws_secretsmanager_secret.saml_credentials.arn}:certificate::"
+#    },
+#    {
 #      name = "SAML_KEY"
-#      valueFrom = "${{aws_secretsmanager_secret.saml_credentials.arn}}:key::"
-#    }},
-#    {{
+#      valueFrom = "${aws_secretsmanager_secret.saml_credentials.arn}:key::"
+#    },
+#    {
 #      name = "SLACK_APP_CLIENT_ID"
-#      valueFrom = "${{aws_secretsmanager_secret.slack_credentials.arn}}:SLACK_APP_CLIENT_ID::"
-#    }},
-#    {{
+#      valueFrom = "${aws_secretsmanager_secret.slack_credentials.arn}:SLACK_APP_CLIENT_ID::"
+#    },
+#    {
 #      name = "SLACK_APP_CLIENT_SECRET"
-#      valueFrom = "${{aws_secretsmanager_secret.slack_credentials.arn}}:SLACK_APP_CLIENT_SECRET::"
-#    }},
-#    {{
+#      valueFrom = "${aws_secretsmanager_secret.slack_credentials.arn}:SLACK_APP_CLIENT_SECRET::"
+#    },
+#    {
 #      name = "SLACK_SECRET"
-#      valueFrom = "${{aws_secretsmanager_secret.slack_credentials.arn}}:SLACK_SECRET::"
-#    }},
-{db_secret}
+#      valueFrom = "${aws_secretsmanager_secret.slack_credentials.arn}:SLACK_SECRET::"
+#    },
+{{db_secret}}
 #  ]
 #  
 #  backend_image      = module.spacelift.ecr_backend_repository_url
@@ -387,45 +436,45 @@ def create_spacelift_services_module(context: MigrationContext) -> str:
 #  launcher_image     = module.spacelift.ecr_launcher_repository_url
 #  launcher_image_tag = local.spacelift_version
 
-#  server_log_configuration = {{
+#  server_log_configuration = {
 #    logDriver : "awslogs",
-#    options : {{
+#    options : {
 #      "awslogs-region": local.region,
 #      "awslogs-group": "/ecs/spacelift-server",
 #      "awslogs-create-group": "true",
 #      "awslogs-stream-prefix": "server"
 #      "mode": "non-blocking"
 #      "max-buffer-size": "25m"
-#    }}
-#  }}
+#    }
+#  }
 #
-#  drain_log_configuration = {{
+#  drain_log_configuration = {
 #    logDriver : "awslogs",
-#    options : {{
+#    options : {
 #      "awslogs-region": local.region,
 #      "awslogs-group": "/ecs/spacelift-drain",
 #      "awslogs-create-group": "true",
 #      "awslogs-stream-prefix": "drain"
 #      "mode": "non-blocking"
 #      "max-buffer-size": "25m"
-#    }}
-#  }}
+#    }
+#  }
 #
-#  scheduler_log_configuration = {{
+#  scheduler_log_configuration = {
 #    logDriver : "awslogs",
-#    options : {{
+#    options : {
 #      "awslogs-region": local.region,
 #      "awslogs-group": "/ecs/spacelift-scheduler",
 #      "awslogs-create-group": "true",
 #      "awslogs-stream-prefix": "scheduler"
 #      "mode": "non-blocking"
 #      "max-buffer-size": "25m"
-#    }}
-#  }}
+#    }
+#  }
 #
-{ecs_service_desired_count}
-{vpc_config}
-#  server_lb_certificate_arn   = "{context.config.load_balancer.certificate_arn}"
+{{ecs_service_desired_count}}
+{{vpc_config}}
+#  server_lb_certificate_arn   = "{{server_lb_certificate_arn}}"
 #  
 #  mqtt_broker_type = "iotcore"
 #  
@@ -441,7 +490,7 @@ def create_spacelift_services_module(context: MigrationContext) -> str:
 #  user_uploaded_workspaces_bucket_name = module.spacelift.user_uploaded_workspaces_bucket_name
 #  workspace_bucket_name                = module.spacelift.workspace_bucket_name
 #
-#  sqs_queues = {{
+#  sqs_queues = {
 #    deadletter      = aws_sqs_queue.deadletter_queue.name
 #    deadletter_fifo = aws_sqs_queue.deadletter_fifo_queue.name
 #    async_jobs      = aws_sqs_queue.async_jobs_queue.name
@@ -450,64 +499,127 @@ def create_spacelift_services_module(context: MigrationContext) -> str:
 #    cronjobs        = aws_sqs_queue.cronjobs_queue.name
 #    webhooks        = aws_sqs_queue.webhooks_queue.name
 #    iot             = aws_sqs_queue.iot_queue.name
-#  }}
-#}}
+#  }
+#}
 #
-# output "load_balancer_dns_name" {{
+# output "load_balancer_dns_name" {
 #   value = module.spacelift_services.server_lb_dns_name
-# }}
-"""
+# }
+""")
 
 
-def create_eks_module(unique_suffix: str, context: MigrationContext) -> str:
-    if not context.config.uses_custom_database_connection_string():
-        rds_section = f"""
-  rds_engine_version         = "{context.rds_engine_version}"
-  rds_password_sm_arn        = {get_db_password_arn(context)}
-  rds_instance_configuration = {{
-    "primary" = {{
-      instance_identifier     = "{context.rds_instance_identifier}"
-      instance_class          = "{context.rds_instance_class}"
-    }}
-  }}
-  rds_preferred_backup_window     = "{context.rds_preferred_backup_window}"
-  rds_regional_cluster_identifier = "spacelift"
-  rds_parameter_group_name        = "{context.rds_parameter_group_name}"
-  rds_subnet_group_name           = "spacelift"
-  rds_parameter_group_description = "{context.rds_parameter_group_description}"
-""".rstrip()
+def create_spacelift_services_module(
+    context: MigrationContext, applied_module: str = "the above module"
+) -> str:
+    if context.config.vpc_config and context.config.vpc_config.use_custom_vpc:
+        vpc_config = _SERVICES_CUSTOM_VPC_CONFIG_TEMPLATE.render(
+            vpc_id=context.config.vpc_config.vpc_id,
+            ecs_subnets=format_subnet_ids(context.config.vpc_config.private_subnet_ids),
+            server_lb_subnets=format_subnet_ids(context.config.vpc_config.public_subnet_ids),
+            server_security_group_id=context.config.vpc_config.server_security_group_id,
+            drain_security_group_id=context.config.vpc_config.drain_security_group_id,
+            scheduler_security_group_id=context.config.vpc_config.scheduler_security_group_id,
+        ).lstrip()
     else:
-        rds_section = "  create_database = false"
+        vpc_config = """
+#  vpc_id      = module.spacelift.vpc_id
+#  ecs_subnets = module.spacelift.private_subnet_ids
+#  
+#  server_lb_subnets           = module.spacelift.public_subnet_ids
+#  server_security_group_id    = module.spacelift.server_security_group_id
+#  
+#  drain_security_group_id     = module.spacelift.drain_security_group_id
+#  scheduler_security_group_id = module.spacelift.scheduler_security_group_id
+""".lstrip()
+    ecs_service_desired_count = ""
+    if not context.config.is_primary_region():
+        ecs_service_desired_count = """
+#  drain_desired_count = 0
+#  scheduler_desired_count = 0
+#  server_desired_count = 0
+        """.strip()
 
-    if context.config.vpc_config and context.config.vpc_config.use_custom_vpc:
-        vpc_config = f"""
-  create_vpc             = false
-  rds_subnet_ids         = {format_subnet_ids(context.config.vpc_config.private_subnet_ids)}
-  rds_security_group_ids = ["{context.config.vpc_config.database_security_group_id}"]
-"""
+    if context.config.uses_custom_database_connection_string():
+        db_secret = _SERVICES_CUSTOM_DB_SECRET_TEMPLATE.render(
+            connection_string_ssm_arn=context.config.database.connection_string_ssm_arn
+        ).strip()
     else:
-        public_subnet_cidr_blocks = format_subnet_cidr_blocks(context.public_subnet_cidr_blocks)
-        private_subnet_cidr_blocks = format_subnet_cidr_blocks(context.private_subnet_cidr_blocks)
-        vpc_config = f"""
-  vpc_cidr_block             = "{context.vpc_cidr_block}"
-  public_subnet_cidr_blocks  = {public_subnet_cidr_blocks}
-  private_subnet_cidr_blocks = {private_subnet_cidr_blocks}
-"""
-    sqs_variable_name = (
-        "sqs_queue_names_override" if context.target == TargetType.EKS else "sqs_queues"
+        db_secret = """
+#    {
+#      name = "DATABASE_URL"
+#      valueFrom = "${module.spacelift.database_secret_arn}:DATABASE_URL::"
+#    },
+#    {
+#      name = "DATABASE_READ_ONLY_URL"
+#      valueFrom = "${module.spacelift.database_secret_arn}:DATABASE_READ_ONLY_URL::"
+#    }
+""".lstrip()
+
+    additional_env_vars = ""
+    if context.config.has_custom_proxy_config():
+        additional_env_vars = "  additional_env_vars = ["
+        if context.config.proxy_config.http_proxy:
+            additional_env_vars += _PROXY_ENV_VAR_TEMPLATE.render(
+                name="HTTP_PROXY", value=context.config.proxy_config.http_proxy
+            )
+        if context.config.proxy_config.https_proxy:
+            additional_env_vars += _PROXY_ENV_VAR_TEMPLATE.render(
+                name="HTTPS_PROXY", value=context.config.proxy_config.https_proxy
+            )
+        if context.config.proxy_config.no_proxy:
+            additional_env_vars += _PROXY_ENV_VAR_TEMPLATE.render(
+                name="NO_PROXY", value=context.config.proxy_config.no_proxy
+            )
+        additional_env_vars += "\n#  ]"
+
+    return _SPACELIFT_SERVICES_MODULE_TEMPLATE.render(
+        applied_module=applied_module,
+        kms_encryption_key_arn=_kms_encryption_key_arn(context),
+        iot_endpoint=(
+            f'#  iot_endpoint = "{context.config.iot_broker_endpoint}"'
+            if context.config.iot_broker_endpoint
+            else ""
+        ),
+        additional_env_vars=additional_env_vars,
+        database_secret_arn=(
+            "#    module.spacelift.database_secret_arn,"
+            if not context.config.uses_custom_database_connection_string()
+            else f'#    "{context.config.database.connection_string_ssm_arn}",'
+        ),
+        db_secret=db_secret,
+        ecs_service_desired_count=ecs_service_desired_count,
+        vpc_config=vpc_config,
+        server_lb_certificate_arn=context.config.load_balancer.certificate_arn,
     )
 
-    return f"""
-module "spacelift_eks" {{
+
+_EKS_RDS_TEMPLATE = Template("""
+  rds_engine_version         = "{{rds_engine_version}}"
+  rds_password_sm_arn        = {{rds_password_sm_arn}}
+  rds_instance_configuration = {
+    "primary" = {
+      instance_identifier     = "{{rds_instance_identifier}}"
+      instance_class          = "{{rds_instance_class}}"
+    }
+  }
+  rds_preferred_backup_window     = "{{rds_preferred_backup_window}}"
+  rds_regional_cluster_identifier = "spacelift"
+  rds_parameter_group_name        = "{{rds_parameter_group_name}}"
+  rds_subnet_group_name           = "spacelift"
+  rds_parameter_group_description = "{{rds_parameter_group_description}}"
+""")
+
+_EKS_MODULE_TEMPLATE = Template("""
+module "spacelift_eks" {
   source = "github.com/spacelift-io/terraform-aws-eks-spacelift-selfhosted?ref=v3.9.0"
 
-  eks_upgrade_policy  = {{
+  eks_upgrade_policy  = {
     support_type = "STANDARD"
-  }}
+  }
 
   aws_region        = local.region
   server_domain     = local.website_domain
-  unique_suffix     = "{unique_suffix}"
+  unique_suffix     = "{{unique_suffix}}"
   license_token     = local.license_token
   spacelift_version = local.spacelift_version
 
@@ -515,42 +627,32 @@ module "spacelift_eks" {{
   kms_master_key_multi_regional = false
   kms_jwt_key_multi_regional    = false
 
-  s3_bucket_configuration = {{
-    binaries     = {{ name = "{context.binaries_bucket_name}", expiration_days = {context.binaries_bucket_expiration_days} }}
-    deliveries   = {{ name = "{context.deliveries_bucket_name}", expiration_days = {context.deliveries_bucket_expiration_days} }}
-    large_queue  = {{ name = "{context.large_queue_name}", expiration_days = {context.large_queue_bucket_expiration_days} }}
-    metadata     = {{ name = "{context.metadata_bucket_name}", expiration_days = {context.metadata_bucket_expiration_days} }}
-    modules      = {{ name = "{context.modules_bucket_name}", expiration_days = {context.modules_bucket_expiration_days} }}
-    policy       = {{ name = "{context.policy_bucket_name}", expiration_days = {context.policy_bucket_expiration_days} }}
-    run_logs     = {{ name = "{context.run_logs_bucket_name}", expiration_days = {context.run_logs_bucket_expiration_days} }}
-    states       = {{ name = "{context.states_bucket_name}", expiration_days = {context.states_bucket_expiration_days} }}
-    uploads      = {{ name = "{context.uploads_bucket_name}", expiration_days = {context.uploads_bucket_expiration_days} }}
-    user_uploads = {{ name = "{context.user_uploads_bucket_name}", expiration_days = {context.user_uploads_bucket_expiration_days} }}
-    workspace    = {{ name = "{context.workspace_bucket_name}", expiration_days = {context.workspace_bucket_expiration_days} }}
-  }}
-{vpc_config}
+  s3_bucket_configuration = {
+{{s3_buckets}}
+  }
+{{vpc_config}}
   number_of_images_to_retain   = 10
   backend_ecr_repository_name  = "spacelift"
   launcher_ecr_repository_name = "spacelift-launcher"
 
-  security_group_names = {{
+  security_group_names = {
     database  = "database_sg"
     drain     = "drain_sg"
     scheduler = "scheduler_sg"
     server    = "server_sg"
     vcs_gateway = "" # Mandatory, but leave it empty
-  }}
+  }
 
   create_sqs = false
-{rds_section}
+{{rds_section}}
 
   encryption_type        = "kms"
-  kms_encryption_key_arn = {"aws_kms_key.encryption_primary.arn" if context.config.is_primary_region() else "aws_kms_replica_key.encryption_replica_key.arn"}
+  kms_encryption_key_arn = {{kms_encryption_key_arn}}
   kms_signing_key_arn    = aws_kms_key.jwt.arn
   mqtt_broker_type     = "iotcore"
   server_acm_arn         = "<TODO: you need to set this value>" # ACM certificate ARN for the server domain
 
-  {sqs_variable_name} = {{
+  {{sqs_variable_name}} = {
     deadletter      = aws_sqs_queue.deadletter_queue.name
     deadletter_fifo = aws_sqs_queue.deadletter_fifo_queue.name
     async_jobs      = aws_sqs_queue.async_jobs_queue.name
@@ -559,27 +661,47 @@ module "spacelift_eks" {{
     cronjobs        = aws_sqs_queue.cronjobs_queue.name
     webhooks        = aws_sqs_queue.webhooks_queue.name
     iot             = aws_sqs_queue.iot_queue.name
-  }}
-}}
+  }
+}
 
-output "shell" {{
+output "shell" {
   value     = module.spacelift_eks.shell
   sensitive = true
-}}
+}
 
-output "kubernetes_ingress_class" {{
+output "kubernetes_ingress_class" {
   value = module.spacelift_eks.kubernetes_ingress_class
-}}
+}
 
-output "kubernetes_secrets" {{
+output "kubernetes_secrets" {
   sensitive = true
   value     = module.spacelift_eks.kubernetes_secrets
-}}
+}
 
-output "helm_values" {{
+output "helm_values" {
   value = module.spacelift_eks.helm_values
-}}
-"""
+}
+""")
+
+
+def create_eks_module(unique_suffix: str, context: MigrationContext) -> str:
+    if not context.config.uses_custom_database_connection_string():
+        rds_section = _EKS_RDS_TEMPLATE.render(**_rds_values(context)).rstrip()
+    else:
+        rds_section = "  create_database = false"
+
+    sqs_variable_name = (
+        "sqs_queue_names_override" if context.target == TargetType.EKS else "sqs_queues"
+    )
+
+    return _EKS_MODULE_TEMPLATE.render(
+        unique_suffix=unique_suffix,
+        s3_buckets=_s3_bucket_configuration(context),
+        vpc_config=_vpc_config(context),
+        rds_section=rds_section,
+        kms_encryption_key_arn=_kms_encryption_key_arn(context),
+        sqs_variable_name=sqs_variable_name,
+    )
 
 
 def write_data_source_terraform_content(f) -> None:
@@ -643,71 +765,46 @@ resource "aws_secretsmanager_secret" "saml_credentials" {
 """.lstrip())
 
 
-def write_kms_terraform_content(f, context: MigrationContext) -> None:
-    if (
-        context.config.disaster_recovery
-        and context.config.disaster_recovery.encryption_primary_key_arn
-    ):
-        primary_key_resource = f"""
-resource "aws_kms_replica_key" "encryption_replica_key" {{
-  primary_key_arn = "{context.config.disaster_recovery.encryption_primary_key_arn}"
+_KMS_REPLICA_KEY_TEMPLATE = Template("""
+resource "aws_kms_replica_key" "encryption_replica_key" {
+  primary_key_arn = "{{encryption_primary_key_arn}}"
   description     = "Spacelift in-app encryption primary key. Used to encrypt user data stored in the database like VCS tokens."
 
-  policy = jsonencode({{
+  policy = jsonencode({
     Version = "2012-10-17",
     Statement = [
-      {{
+      {
         Effect = "Allow",
         Action = "kms:*",
         Resource = "*",
-        Principal = {{
-           AWS = "arn:${{data.aws_partition.current.partition}}:iam::${{data.aws_caller_identity.current.account_id}}:root"
-        }}
-      }}
-    ]
-  }})
-}}
-            """.lstrip()
-    else:
-        primary_key_resource = """
-resource "aws_kms_key" "encryption_primary" {
-  description         = "Spacelift in-app encryption primary key. Used to encrypt user data stored in the database like VCS tokens."
-  enable_key_rotation = true
-  multi_region        = true
-
-  policy = jsonencode({
-    Version   = "2012-10-17"
-    Statement = [
-      {
-        Effect    = "Allow"
-        Principal = { AWS = "arn:${data.aws_partition.current.partition}:iam::${data.aws_caller_identity.current.account_id}:root" }
-        Action    = "kms:*"
-        Resource  = "*"
+        Principal = {
+           AWS = "arn:${data.aws_partition.current.partition}:iam::${data.aws_caller_identity.current.account_id}:root"
+        }
       }
     ]
   })
 }
-            """.lstrip()
+            """)
 
-    f.write(f"""
-resource "aws_kms_key" "master" {{
+_KMS_TEMPLATE = Template("""
+resource "aws_kms_key" "master" {
   description         = "Spacelift master KMS key"
   enable_key_rotation = true
 
-  policy = jsonencode({{
+  policy = jsonencode({
     Version   = "2012-10-17"
     Statement = [
-      {{
+      {
         Effect    = "Allow"
-        Principal = {{ AWS = "arn:${{data.aws_partition.current.partition}}:iam::${{data.aws_caller_identity.current.account_id}}:root" }}
+        Principal = { AWS = "arn:${data.aws_partition.current.partition}:iam::${data.aws_caller_identity.current.account_id}:root" }
         Action    = "kms:*"
         Resource  = "*"
-      }},
-      {{
+      },
+      {
         Effect    = "Allow"
-        Principal = {{
-          Service = "logs.${{local.region}}.amazonaws.com"
-        }}
+        Principal = {
+          Service = "logs.${local.region}.amazonaws.com"
+        }
         Action   = [
           "kms:Encrypt*",
           "kms:Decrypt*",
@@ -716,67 +813,99 @@ resource "aws_kms_key" "master" {{
           "kms:Describe*"
         ]
         Resource = "*"
-      }},
-      {{
+      },
+      {
         Effect    = "Allow"
-        Principal = {{
+        Principal = {
           Service = ["sns.amazonaws.com", "events.amazonaws.com"]
-        }}
+        }
         Action   = [
           "kms:Decrypt",
           "kms:GenerateDataKey"
         ]
         Resource = "*"
-      }}
+      }
     ]
-  }})
-}}
+  })
+}
 
-resource "aws_kms_key" "jwt" {{
+resource "aws_kms_key" "jwt" {
   description = "Spacelift KMS key used to sign and verify JWTs"
   key_usage   = "SIGN_VERIFY"
   customer_master_key_spec = "RSA_4096"
 
-  policy = jsonencode({{
+  policy = jsonencode({
     Version   = "2012-10-17"
     Statement = [
-      {{
+      {
         Effect    = "Allow"
-        Principal = {{ AWS = "arn:${{data.aws_partition.current.partition}}:iam::${{data.aws_caller_identity.current.account_id}}:root" }}
+        Principal = { AWS = "arn:${data.aws_partition.current.partition}:iam::${data.aws_caller_identity.current.account_id}:root" }
         Action    = "kms:*"
         Resource  = "*"
-      }}
+      }
     ]
-  }})
-}}
+  })
+}
 
-{primary_key_resource}
+{{primary_key_resource}}
 
-resource "aws_kms_key" "jwt_backup_key" {{
+resource "aws_kms_key" "jwt_backup_key" {
   description              = "Backup Spacelift KMS key used to sign and verify JWTs"
   key_usage                = "SIGN_VERIFY"
   customer_master_key_spec = "RSA_4096"
 
-  policy = jsonencode({{
+  policy = jsonencode({
     Version = "2012-10-17"
     Statement = [
-      {{
+      {
         Effect = "Allow"
         Action = "kms:*"
-        Principal = {{
-          AWS = "arn:${{data.aws_partition.current.partition}}:iam::${{data.aws_caller_identity.current.account_id}}:root"
-        }}
+        Principal = {
+          AWS = "arn:${data.aws_partition.current.partition}:iam::${data.aws_caller_identity.current.account_id}:root"
+        }
         Resource = "*"
-      }}
+      }
     ]
-  }})
-}}
+  })
+}
 
-resource "aws_kms_alias" "jwt_alias" {{
+resource "aws_kms_alias" "jwt_alias" {
   name          = "alias/spacelift-jwt"
   target_key_id = aws_kms_key.jwt.key_id
-}}
-""".lstrip())
+}
+""")
+
+
+def write_kms_terraform_content(f, context: MigrationContext) -> None:
+    if (
+        context.config.disaster_recovery
+        and context.config.disaster_recovery.encryption_primary_key_arn
+    ):
+        primary_key_resource = _KMS_REPLICA_KEY_TEMPLATE.render(
+            encryption_primary_key_arn=context.config.disaster_recovery.encryption_primary_key_arn
+        ).lstrip()
+    else:
+        primary_key_resource = """
+resource "aws_kms_key" "encryption_primary" {
+  description         = "Spacelift in-app encryption primary key. Used to encrypt user data stored in the database like VCS tokens."
+  enable_key_rotation = true
+  multi_region        = true
+
+  policy = jsonencode({
+    Version   = "2012-10-17"
+    Statement = [
+      {
+        Effect    = "Allow"
+        Principal = { AWS = "arn:${data.aws_partition.current.partition}:iam::${data.aws_caller_identity.current.account_id}:root" }
+        Action    = "kms:*"
+        Resource  = "*"
+      }
+    ]
+  })
+}
+            """.lstrip()
+
+    f.write(_KMS_TEMPLATE.render(primary_key_resource=primary_key_resource).lstrip())
 
 
 def write_sqs_terraform_content(f) -> None:
@@ -880,39 +1009,38 @@ resource "aws_sqs_queue" "iot_queue" {
 """.lstrip())
 
 
-def write_s3_replication_terraform_content(f, context: MigrationContext) -> None:
-    f.write(f"""
-locals {{
-  replication_region_name        = "{context.s3_replica_region_name}"
-  replication_region_key_kms_arn = "{context.s3_replica_region_key_kms_arn}"
-}}
-
-resource "aws_iam_role" "replication_role" {{
-  name        = "{context.s3_replication_role_name}"
+_S3_REPLICATION_TEMPLATE = Template("""
+locals {
+  replication_region_name        = "{{replica_region_name}}"
+  replication_region_key_kms_arn = "{{replica_region_key_kms_arn}}"
+}
+
+resource "aws_iam_role" "replication_role" {
+  name        = "{{replication_role_name}}"
   description = "Used to allow S3 replication from the Spacelift primary region to the DR region"
 
-  assume_role_policy = jsonencode({{
+  assume_role_policy = jsonencode({
     Version = "2012-10-17"
     Statement = [
-      {{
+      {
         Action = "sts:AssumeRole"
         Effect = "Allow"
-        Principal = {{
+        Principal = {
           Service = "s3.amazonaws.com"
-        }}
-      }},
+        }
+      },
     ]
-  }})
-}}
+  })
+}
 
-resource "aws_iam_policy" "s3_replication_policy" {{
-  name        = "{context.s3_replication_policy_name}"
+resource "aws_iam_policy" "s3_replication_policy" {
+  name        = "{{replication_policy_name}}"
   description = "Used to allow S3 replication from the Spacelift primary region to the DR region"
 
-  policy = jsonencode({{
+  policy = jsonencode({
     Version = "2012-10-17",
     Statement = [
-      {{
+      {
         Action = [
           "s3:ListBucket",
           "s3:GetReplicationConfiguration",
@@ -924,19 +1052,19 @@ resource "aws_iam_policy" "s3_replication_policy" {{
         ],
         Effect   = "Allow",
         Resource = [
-          {context.module_output_ref}.states_bucket_arn,
-          "${{{context.module_output_ref}.states_bucket_arn}}/*",
-          {context.module_output_ref}.run_logs_bucket_arn,
-          "${{{context.module_output_ref}.run_logs_bucket_arn}}/*",
-          {context.module_output_ref}.modules_bucket_arn,
-          "${{{context.module_output_ref}.modules_bucket_arn}}/*",
-          {context.module_output_ref}.policy_inputs_bucket_arn,
-          "${{{context.module_output_ref}.policy_inputs_bucket_arn}}/*",
-          {context.module_output_ref}.workspace_bucket_arn,
-          "${{{context.module_output_ref}.workspace_bucket_arn}}/*",
+          {{module_output_ref}}.states_bucket_arn,
+          "${{{module_output_ref}}.states_bucket_arn}/*",
+          {{module_output_ref}}.run_logs_bucket_arn,
+          "${{{module_output_ref}}.run_logs_bucket_arn}/*",
+          {{module_output_ref}}.modules_bucket_arn,
+          "${{{module_output_ref}}.modules_bucket_arn}/*",
+          {{module_output_ref}}.policy_inputs_bucket_arn,
+          "${{{module_output_ref}}.policy_inputs_bucket_arn}/*",
+          {{module_output_ref}}.workspace_bucket_arn,
+          "${{{module_output_ref}}.workspace_bucket_arn}/*",
         ]
-      }},
-      {{
+      },
+      {
         Action = [
           "s3:ReplicateObject",
           "s3:ReplicateDelete",
@@ -945,156 +1073,218 @@ resource "aws_iam_policy" "s3_replication_policy" {{
           "s3:ObjectOwnerOverrideToBucketOwner"
         ],
         Effect    = "Allow",
-        Condition = {{
-          StringLikeIfExists = {{
+        Condition = {
+          StringLikeIfExists = {
             "s3:x-amz-server-side-encryption" = ["aws:kms", "AES256"],
-            "s3:x-amz-server-side-encryption-aws-kms-key-id" = "${{local.replication_region_key_kms_arn}}"
-          }}
-        }},
+            "s3:x-amz-server-side-encryption-aws-kms-key-id" = "${local.replication_region_key_kms_arn}"
+          }
+        },
         Resource = [
-          "{context.s3_states_bucket_replica_arn}/*",
-          "{context.s3_run_logs_bucket_replica_arn}/*",
-          "{context.s3_modules_bucket_replica_arn}/*",
-          "{context.s3_policy_input_bucket_replica_arn}/*",
-          "{context.s3_workspace_bucket_replica_arn}/*",
+          "{{states_bucket_replica_arn}}/*",
+          "{{run_logs_bucket_replica_arn}}/*",
+          "{{modules_bucket_replica_arn}}/*",
+          "{{policy_input_bucket_replica_arn}}/*",
+          "{{workspace_bucket_replica_arn}}/*",
         ]
-      }},
-      {{
+      },
+      {
         Action = [
           "kms:Decrypt"
         ],
         Effect    = "Allow",
-        Condition = {{
-          StringLike = {{
-            "kms:ViaService"                   = "s3.${{local.region}}.amazonaws.com",
+        Condition = {
+          StringLike = {
+            "kms:ViaService"                   = "s3.${local.region}.amazonaws.com",
             "kms:EncryptionContext:aws:s3:arn" = [
-              "${{{context.module_output_ref}.states_bucket_arn}}/*",
-              "${{{context.module_output_ref}.run_logs_bucket_arn}}/*",
-              "${{{context.module_output_ref}.modules_bucket_arn}}/*",
-              "${{{context.module_output_ref}.policy_inputs_bucket_arn}}/*",
-              "${{{context.module_output_ref}.workspace_bucket_arn}}/*"
+              "${{{module_output_ref}}.states_bucket_arn}/*",
+              "${{{module_output_ref}}.run_logs_bucket_arn}/*",
+              "${{{module_output_ref}}.modules_bucket_arn}/*",
+              "${{{module_output_ref}}.policy_inputs_bucket_arn}/*",
+              "${{{module_output_ref}}.workspace_bucket_arn}/*"
             ]
-          }}
-        }},
+          }
+        },
         Resource = aws_kms_key.master.arn
-      }},
-      {{
+      },
+      {
         Action = [
           "kms:Encrypt"
         ],
         Effect    = "Allow",
-        Condition = {{
-          StringLike = {{
-            "kms:ViaService"                   = "s3.${{local.replication_region_name}}.amazonaws.com",
+        Condition = {
+          StringLike = {
+            "kms:ViaService"                   = "s3.${local.replication_region_name}.amazonaws.com",
             "kms:EncryptionContext:aws:s3:arn" = [
-              "{context.s3_states_bucket_replica_arn}/*",
-              "{context.s3_run_logs_bucket_replica_arn}/*",
-              "{context.s3_modules_bucket_replica_arn}/*",
-              "{context.s3_policy_input_bucket_replica_arn}/*",
-              "{context.s3_workspace_bucket_replica_arn}/*",
+              "{{states_bucket_replica_arn}}/*",
+              "{{run_logs_bucket_replica_arn}}/*",
+              "{{modules_bucket_replica_arn}}/*",
+              "{{policy_input_bucket_replica_arn}}/*",
+              "{{workspace_bucket_replica_arn}}/*",
             ]
-          }}
-        }},
-        Resource = "${{local.replication_region_key_kms_arn}}"
-      }}
+          }
+        },
+        Resource = "${local.replication_region_key_kms_arn}"
+      }
     ]
-  }})
-}}
+  })
+}
 
-resource "aws_iam_role_policy_attachment" "s3_replication_attachment" {{
+resource "aws_iam_role_policy_attachment" "s3_replication_attachment" {
   role       = aws_iam_role.replication_role.name
   policy_arn = aws_iam_policy.s3_replication_policy.arn
-}}
+}
 
-{generate_s3_replication_bucket_resource("states", f"{context.module_output_ref}.states_bucket_name", context.s3_states_bucket_replica_arn, context.s3_replica_region_key_kms_arn)}
+{{states_replication}}
 
-{generate_s3_replication_bucket_resource("run_logs", f"{context.module_output_ref}.run_logs_bucket_name", context.s3_run_logs_bucket_replica_arn, context.s3_replica_region_key_kms_arn)}
+{{run_logs_replication}}
 
-{generate_s3_replication_bucket_resource("modules", f"{context.module_output_ref}.modules_bucket_name", context.s3_modules_bucket_replica_arn, context.s3_replica_region_key_kms_arn)}
+{{modules_replication}}
 
-{generate_s3_replication_bucket_resource("policy_inputs", f"{context.module_output_ref}.policy_inputs_bucket_name", context.s3_policy_input_bucket_replica_arn, context.s3_replica_region_key_kms_arn)}
+{{policy_inputs_replication}}
 
-{generate_s3_replication_bucket_resource("workspaces", f"{context.module_output_ref}.workspace_bucket_name", context.s3_workspace_bucket_replica_arn, context.s3_replica_region_key_kms_arn)}
-        """.lstrip())
+{{workspaces_replication}}
+        """)
 
 
-def generate_s3_replication_bucket_resource(
-    bucket_friendly_name: str,
-    source_bucket_name: str,
-    destination_bucket_arn: str,
-    replica_kms_key_arn: str,
-) -> str:
-    return f"""
-resource "aws_s3_bucket_replication_configuration" "{bucket_friendly_name}" {{
-  bucket = {source_bucket_name}
+def write_s3_replication_terraform_content(f, context: MigrationContext) -> None:
+    module_output_ref = context.module_output_ref
+    replica_kms_key_arn = context.replication.region_key_kms_arn
+    buckets = context.s3.buckets
+
+    f.write(
+        _S3_REPLICATION_TEMPLATE.render(
+            replica_region_name=context.replication.region_name,
+            replica_region_key_kms_arn=context.replication.region_key_kms_arn,
+            replication_role_name=context.replication.role_name,
+            replication_policy_name=context.replication.policy_name,
+            module_output_ref=module_output_ref,
+            states_bucket_replica_arn=buckets["states"].replica_arn,
+            run_logs_bucket_replica_arn=buckets["run_logs"].replica_arn,
+            modules_bucket_replica_arn=buckets["modules"].replica_arn,
+            policy_input_bucket_replica_arn=buckets["policy"].replica_arn,
+            workspace_bucket_replica_arn=buckets["workspace"].replica_arn,
+            states_replication=generate_s3_replication_bucket_resource(
+                "states",
+                f"{module_output_ref}.states_bucket_name",
+                buckets["states"].replica_arn,
+                replica_kms_key_arn,
+            ),
+            run_logs_replication=generate_s3_replication_bucket_resource(
+                "run_logs",
+                f"{module_output_ref}.run_logs_bucket_name",
+                buckets["run_logs"].replica_arn,
+                replica_kms_key_arn,
+            ),
+            modules_replication=generate_s3_replication_bucket_resource(
+                "modules",
+                f"{module_output_ref}.modules_bucket_name",
+                buckets["modules"].replica_arn,
+                replica_kms_key_arn,
+            ),
+            policy_inputs_replication=generate_s3_replication_bucket_resource(
+                "policy_inputs",
+                f"{module_output_ref}.policy_inputs_bucket_name",
+                buckets["policy"].replica_arn,
+                replica_kms_key_arn,
+            ),
+            workspaces_replication=generate_s3_replication_bucket_resource(
+                "workspaces",
+                f"{module_output_ref}.workspace_bucket_name",
+                buckets["workspace"].replica_arn,
+                replica_kms_key_arn,
+            ),
+        ).lstrip()
+    )
+
+
+_S3_REPLICATION_BUCKET_TEMPLATE = Template("""
+resource "aws_s3_bucket_replication_configuration" "{{bucket_friendly_name}}" {
+  bucket = {{source_bucket_name}}
 
   role = aws_iam_role.replication_role.arn
 
-  rule {{
+  rule {
     id       = "spacelift-dr-replication-rule"
     priority = 0
     status   = "Enabled"
 
-    filter {{
+    filter {
       prefix = ""
-    }}
+    }
 
-    destination {{
-      bucket        = "{destination_bucket_arn}"
+    destination {
+      bucket        = "{{destination_bucket_arn}}"
       storage_class = "STANDARD"
 
-      encryption_configuration {{
-        replica_kms_key_id = "{replica_kms_key_arn}"
-      }}
-    }}
+      encryption_configuration {
+        replica_kms_key_id = "{{replica_kms_key_arn}}"
+      }
+    }
 
-    delete_marker_replication {{
+    delete_marker_replication {
       status = "Enabled"
-    }}
+    }
 
-    source_selection_criteria {{
-      replica_modifications {{
+    source_selection_criteria {
+      replica_modifications {
         status = "Enabled"
-      }}
+      }
 
-      sse_kms_encrypted_objects {{
+      sse_kms_encrypted_objects {
         status = "Enabled"
-      }}
-    }}
-  }}
-}}
-    """.lstrip().rstrip()
+      }
+    }
+  }
+}
+    """)
 
 
-def write_iot_terraform_content(f, migration_context: MigrationContext) -> None:
-    f.write(f"""
-resource "aws_iam_role" "iot_message_sender_role" {{
-  name = "spacelift-iot-{migration_context.config.aws_region}"
+def generate_s3_replication_bucket_resource(
+    bucket_friendly_name: str,
+    source_bucket_name: str,
+    destination_bucket_arn: str,
+    replica_kms_key_arn: str,
+) -> str:
+    return (
+        _S3_REPLICATION_BUCKET_TEMPLATE.render(
+            bucket_friendly_name=bucket_friendly_name,
+            source_bucket_name=source_bucket_name,
+            destination_bucket_arn=destination_bucket_arn,
+            replica_kms_key_arn=replica_kms_key_arn,
+        )
+        .lstrip()
+        .rstrip()
+    )
+
+
+_IOT_TEMPLATE = Template("""
+resource "aws_iam_role" "iot_message_sender_role" {
+  name = "spacelift-iot-{{region}}"
 
-  assume_role_policy = jsonencode({{
+  assume_role_policy = jsonencode({
     Version = "2012-10-17"
     Statement = [
-      {{
+      {
         Effect = "Allow"
-        Principal = {{
+        Principal = {
           Service = "iot.amazonaws.com"
-        }}
+        }
         Action = "sts:AssumeRole"
-      }}
+      }
     ]
-  }})
+  })
 
   description = "Used by the API Gateway when publishing messages to the webhooks SNS topic"
-}}
+}
 
-resource "aws_iam_role_policy" "iot_message_sender_role_policy" {{
+resource "aws_iam_role_policy" "iot_message_sender_role_policy" {
   name = "allow-iot-sqs-sending"
   role = aws_iam_role.iot_message_sender_role.id
 
-  policy = jsonencode({{
+  policy = jsonencode({
     Version = "2012-10-17"
     Statement = [
-      {{
+      {
         Effect = "Allow"
         Action = [
           "kms:Decrypt",
@@ -1102,28 +1292,32 @@ resource "aws_iam_role_policy" "iot_message_sender_role_policy" {{
           "kms:GenerateDataKey*"
         ]
         Resource = aws_kms_key.master.arn
-      }},
-      {{
+      },
+      {
         Effect = "Allow"
         Action = "sqs:SendMessage"
         Resource = aws_sqs_queue.iot_queue.arn
-      }}
+      }
     ]
-  }})
-}}
+  })
+}
 
-resource "aws_iot_topic_rule" "iot_message_sending_rule" {{
+resource "aws_iot_topic_rule" "iot_message_sending_rule" {
   name = "spacelift"
 
   sql = "SELECT *, Timestamp() as timestamp, topic(3) as worker_pool_ulid, topic(4) as worker_ulid FROM 'spacelift/writeonly/#'"
   sql_version = "2016-03-23"
-  description = "Send all messages published in the spacelift namespace to the ${{aws_sqs_queue.iot_queue.name}}"
+  description = "Send all messages published in the spacelift namespace to the ${aws_sqs_queue.iot_queue.name}"
   enabled = true
 
-  sqs {{
+  sqs {
     role_arn  = aws_iam_role.iot_message_sender_role.arn
     queue_url = aws_sqs_queue.iot_queue.id
     use_base64 = true
-  }}
-}}
-""".lstrip())
+  }
+}
+""")
+
+
+def write_iot_terraform_content(f, migration_context: MigrationContext) -> None:
+    f.write(_IOT_TEMPLATE.render(region=migration_context.config.aws_region).lstrip())
@@ -0,0 +1,686 @@
+import json
+from typing import Any, Callable, Dict, IO, List, Optional, Tuple
+
+from converters.import_registry import ImportRegistry, group_local_name
+from converters.migration_context import MigrationContext, TargetType
+
+# Terraform's JSON syntax (.tf.json) of the same configuration terraform_generator writes as HCL.
+# Every file is built as plain Python data and serialized with a single json.dumps. In this
+# syntax, strings are templates, so references are written as "${...}" and IAM and KMS policies
+# are JSON documents with "${...}" interpolations in them, like jsonencode would produce.
+
+ACCOUNT_ROOT_PRINCIPAL = (
+    "arn:${data.aws_partition.current.partition}:iam::"
+    "${data.aws_caller_identity.current.account_id}:root"
+)
+TODO_VALUE = "<TODO: you need to set this value>"
+
+
+def _ref(expression: str) -> str:
+    return "${" + expression + "}"
+
+
+def _policy(document: Dict) -> str:
+    return json.dumps(document)
+
+
+def _dumps(configuration: Dict) -> str:
+    return json.dumps(configuration, indent=2) + "\n"
+
+
+def renderers(
+    unique_suffix: Optional[str], context: MigrationContext
+) -> List[Tuple[str, Callable[[IO[str]], None]]]:
+    # Same files as the HCL backend, with the same write_content(f) signature
+    files: List[Tuple[str, Callable[[], Dict]]] = [
+        ("data_sources.tf.json", data_sources),
+        ("kms.tf.json", lambda: kms(context)),
+        ("secrets_manager.tf.json", lambda: secrets_manager(context)),
+        ("sqs.tf.json", sqs),
+    ]
+    if context.replication.role_name and context.replication.policy_name:
+        files.append(("s3_replication.tf.json", lambda: s3_replication(context)))
+    files.append(("iot.tf.json", lambda: iot(context)))
+    files.append(("main.tf.json", lambda: main(unique_suffix, context)))
+
+    return [
+        (file_name, lambda f, build=build: f.write(_dumps(build()))) for file_name, build in files
+    ]
+
+
+def imports(import_registry: ImportRegistry, compact: bool = False) -> str:
+    if not compact:
+        return _dumps(
+            {
+                "import": [
+                    {"to": address, "id": import_id}
+                    for address, import_id in import_registry.imports()
+                ]
+            }
+        )
+
+    single, groups = import_registry.grouped_imports()
+    blocks = [(address, {"to": address, "id": import_id}) for address, import_id in single]
+    group_locals = {}
+    for resource_address, instances in groups.items():
+        local_name = group_local_name(resource_address)
+        group_locals[local_name] = [
+            {"index": index, "id": import_id} for index, import_id in instances
+        ]
+        block = {
+            "for_each": _ref(f"local.{local_name}"),
+            "to": f"{resource_address}[each.value.index]",
+            "id": _ref("each.value.id"),
+        }
+        blocks.append((resource_address, block))
+
+    configuration: Dict[str, Any] = {}
+    if group_locals:
+        configuration["locals"] = group_locals
+    configuration["import"] = [block for _, block in sorted(blocks, key=lambda b: b[0])]
+    return _dumps(configuration)
+
+
+def data_sources() -> Dict:
+    return {"data": {"aws_partition": {"current": {}}, "aws_caller_identity": {"current": {}}}}
+
+
+def kms(context: MigrationContext) -> Dict:
+    root_statement = {
+        "Effect": "Allow",
+        "Principal": {"AWS": ACCOUNT_ROOT_PRINCIPAL},
+        "Action": "kms:*",
+        "Resource": "*",
+    }
+    encryption_key_description = (
+        "Spacelift in-app encryption primary key. "
+        "Used to encrypt user data stored in the database like VCS tokens."
+    )
+
+    resources: Dict[str, Dict[str, Any]] = {
+        "aws_kms_key": {
+            "master": {
+                "description": "Spacelift master KMS key",
+                "enable_key_rotation": True,
+                "policy": _policy(
+                    {
+                        "Version": "2012-10-17",
+                        "Statement": [
+                            root_statement,
+                            {
+                                "Effect": "Allow",
+                                "Principal": {"Service": "logs.${local.region}.amazonaws.com"},
+                                "Action": [
+                                    "kms:Encrypt*",
+                                    "kms:Decrypt*",
+                                    "kms:ReEncrypt*",
+                                    "kms:GenerateDataKey*",
+                                    "kms:Describe*",
+                                ],
+                                "Resource": "*",
+                            },
+                            {
+                                "Effect": "Allow",
+                                "Principal": {
+                                    "Service": ["sns.amazonaws.com", "events.amazonaws.com"]
+                                },
+                                "Action": ["kms:Decrypt", "kms:GenerateDataKey"],
+                                "Resource": "*",
+                            },
+                        ],
+                    }
+                ),
+            },
+            "jwt": {
+                "description": "Spacelift KMS key used to sign and verify JWTs",
+                "key_usage": "SIGN_VERIFY",
+                "customer_master_key_spec": "RSA_4096",
+                "policy": _policy({"Version": "2012-10-17", "Statement": [root_statement]}),
+            },
+        },
+        "aws_kms_alias": {
+            "jwt_alias": {
+                "name": "alias/spacelift-jwt",
+                "target_key_id": _ref("aws_kms_key.jwt.key_id"),
+            }
+        },
+    }
+
+    if (
+        context.config.disaster_recovery
+        and context.config.disaster_recovery.encryption_primary_key_arn
+    ):
+        resources["aws_kms_replica_key"] = {
+            "encryption_replica_key": {
+                "primary_key_arn": context.config.disaster_recovery.encryption_primary_key_arn,
+                "description": encryption_key_description,
+                "policy": _policy({"Version": "2012-10-17", "Statement": [root_statement]}),
+            }
+        }
+    else:
+        resources["aws_kms_key"]["encryption_primary"] = {
+            "description": encryption_key_description,
+            "enable_key_rotation": True,
+            "multi_region": True,
+            "policy": _policy({"Version": "2012-10-17", "Statement": [root_statement]}),
+        }
+
+    resources["aws_kms_key"]["jwt_backup_key"] = {
+        "description": "Backup Spacelift KMS key used to sign and verify JWTs",
+        "key_usage": "SIGN_VERIFY",
+        "customer_master_key_spec": "RSA_4096",
+        "policy": _policy({"Version": "2012-10-17", "Statement": [root_statement]}),
+    }
+
+    return {"resource": resources}
+
+
+def secrets_manager(context: MigrationContext) -> Dict:
+    secrets: Dict[str, Dict] = {}
+    if not context.config.uses_custom_database_connection_string():
+        secrets["db_pw"] = {
+            "name": "spacelift/database",
+            "description": "Connection string for the Spacelift database",
+            "kms_key_id": _ref("aws_kms_key.master.arn"),
+        }
+
+    for name, secret_name, description in [
+        (
+            "slack_credentials",
+            "spacelift/slack-application",
+            "Contains the Spacelift Slack application configuration",
+        ),
+        (
+            "additional_root_ca_certificates",
+            "spacelift/additional-root-ca-certificates",
+            "Contains additional CA certificates to use when making HTTPS requests",
+        ),
+        (
+            "external",
+            "spacelift/external",
+            "Externally managed and supplied secrets used by Spacelift app",
+        ),
+        (
+            "saml_credentials",
+            "spacelift/saml-credentials",
+            "Contains the SAML certificate and signing key",
+        ),
+    ]:
+        secrets[name] = {
+            "name": secret_name,
+            "description": description,
+            "kms_key_id": _ref("aws_kms_key.master.arn"),
+        }
+
+    configuration: Dict[str, Any] = {"resource": {"aws_secretsmanager_secret": secrets}}
+    if context.target == TargetType.EKS:
+        configuration = {
+            "//": "Apart from db_pw, these secrets will NOT be used by the EKS services at all. "
+            "They are just created for the sake of IaC completeness during the migration. "
+            "Inject these variables into the services as K8s secrets instead, then remove them. "
+            'Keep the "db_pw" secret, it is attached to the RDS instance as a master password.',
+            **configuration,
+        }
+    return configuration
+
+
+def _queue(
+    name: str,
+    visibility_timeout_seconds: int,
+    dead_letter_queue: Optional[str] = None,
+    **attributes,
+) -> Dict:
+    queue = {
+        "name": name,
+        **attributes,
+        "kms_master_key_id": _ref("aws_kms_key.master.arn"),
+        "visibility_timeout_seconds": visibility_timeout_seconds,
+        "max_message_size": 1048576,
+    }
+    if dead_letter_queue:
+        queue["receive_wait_time_seconds"] = 20
+        queue["redrive_policy"] = _policy(
+            {
+                "deadLetterTargetArn": _ref(f"aws_sqs_queue.{dead_letter_queue}.arn"),
+                "maxReceiveCount": 3,
+            }
+        )
+    return queue
+
+
+def sqs() -> Dict:
+    return {
+        "resource": {
+            "aws_sqs_queue": {
+                "deadletter_queue": _queue("spacelift-dlq", 300),
+                "deadletter_fifo_queue": _queue("spacelift-dlq.fifo", 300, fifo_queue=True),
+                "async_jobs_queue": _queue("spacelift-async-jobs", 300, "deadletter_queue"),
+                "events_inbox_queue": _queue("spacelift-events-inbox", 300, "deadletter_queue"),
+                "async_jobs_fifo_queue": _queue(
+                    "spacelift-async-jobs.fifo",
+                    300,
+                    "deadletter_fifo_queue",
+                    fifo_queue=True,
+                    deduplication_scope="messageGroup",
+                    fifo_throughput_limit="perMessageGroupId",
+                ),
+                "cronjobs_queue": _queue(
+                    "spacelift-cronjobs", 300, "deadletter_queue", message_retention_seconds=3600
+                ),
+                "webhooks_queue": _queue("spacelift-webhooks", 600, "deadletter_queue"),
+                "iot_queue": _queue("spacelift-iot", 45, "deadletter_queue"),
+            }
+        }
+    }
+
+
+def s3_replication(context: MigrationContext) -> Dict:
+    module_output_ref = context.module_output_ref
+    # Friendly name, output name of the source bucket in the module, replica bucket ARN
+    replica_arns = {key: bucket.replica_arn for key, bucket in context.s3.buckets.items()}
+    buckets = [
+        ("states", "states", replica_arns["states"]),
+        ("run_logs", "run_logs", replica_arns["run_logs"]),
+        ("modules", "modules", replica_arns["modules"]),
+        ("policy_inputs", "policy_inputs", replica_arns["policy"]),
+        ("workspaces", "workspace", replica_arns["workspace"]),
+    ]
+    source_arns = [_ref(f"{module_output_ref}.{output}_bucket_arn") for _, output, _ in buckets]
+    source_objects = [f"{arn}/*" for arn in source_arns]
+    replica_objects = [f"{replica_arn}/*" for _, _, replica_arn in buckets]
+    replication_description = (
+        "Used to allow S3 replication from the Spacelift primary region to the DR region"
+    )
+
+    return {
+        "locals": {
+            "replication_region_name": context.replication.region_name,
+            "replication_region_key_kms_arn": context.replication.region_key_kms_arn,
+        },
+        "resource": {
+            "aws_iam_role": {
+                "replication_role": {
+                    "name": context.replication.role_name,
+                    "description": replication_description,
+                    "assume_role_policy": _policy(
+                        {
+                            "Version": "2012-10-17",
+                            "Statement": [
+                                {
+                                    "Action": "sts:AssumeRole",
+                                    "Effect": "Allow",
+                                    "Principal": {"Service": "s3.amazonaws.com"},
+                                }
+                            ],
+                        }
+                    ),
+                }
+            },
+            "aws_iam_policy": {
+                "s3_replication_policy": {
+                    "name": context.replication.policy_name,
+                    "description": replication_description,
+                    "policy": _policy(
+                        {
+                            "Version": "2012-10-17",
+                            "Statement": [
+                                {
+                                    "Action": [
+                                        "s3:ListBucket",
+                                        "s3:GetReplicationConfiguration",
+                                        "s3:GetObjectVersionForReplication",
+                                        "s3:GetObjectVersionAcl",
+                                        "s3:GetObjectVersionTagging",
+                                        "s3:GetObjectRetention",
+                                        "s3:GetObjectLegalHold",
+                                    ],
+                                    "Effect": "Allow",
+                                    "Resource": [
+                                        arn
+                                        for pair in zip(source_arns, source_objects)
+                                        for arn in pair
+                                    ],
+                                },
+                                {
+                                    "Action": [
+                                        "s3:ReplicateObject",
+                                        "s3:ReplicateDelete",
+                                        "s3:ReplicateTags",
+                                        "s3:GetObjectVersionTagging",
+                                        "s3:ObjectOwnerOverrideToBucketOwner",
+                                    ],
+                                    "Effect": "Allow",
+                                    "Condition": {
+                                        "StringLikeIfExists": {
+                                            "s3:x-amz-server-side-encryption": [
+                                                "aws:kms",
+                                                "AES256",
+                                            ],
+                                            "s3:x-amz-server-side-encryption-aws-kms-key-id": _ref(
+                                                "local.replication_region_key_kms_arn"
+                                            ),
+                                        }
+                                    },
+                                    "Resource": replica_objects,
+                                },
+                                {
+                                    "Action": ["kms:Decrypt"],
+                                    "Effect": "Allow",
+                                    "Condition": {
+                                        "StringLike": {
+                                            "kms:ViaService": "s3.${local.region}.amazonaws.com",
+                                            "kms:EncryptionContext:aws:s3:arn": source_objects,
+                                        }
+                                    },
+                                    "Resource": _ref("aws_kms_key.master.arn"),
+                                },
+                                {
+                                    "Action": ["kms:Encrypt"],
+                                    "Effect": "Allow",
+                                    "Condition": {
+                                        "StringLike": {
+                                            "kms:ViaService": "s3.${local.replication_region_name}.amazonaws.com",
+                                            "kms:EncryptionContext:aws:s3:arn": replica_objects,
+                                        }
+                                    },
+                                    "Resource": _ref("local.replication_region_key_kms_arn"),
+                                },
+                            ],
+                        }
+                    ),
+                }
+            },
+            "aws_iam_role_policy_attachment": {
+                "s3_replication_attachment": {
+                    "role": _ref("aws_iam_role.replication_role.name"),
+                    "policy_arn": _ref("aws_iam_policy.s3_replication_policy.arn"),
+                }
+            },
+            "aws_s3_bucket_replication_configuration": {
+                name: _replication_configuration(
+                    _ref(f"{module_output_ref}.{output}_bucket_name"),
+                    replica_arn,
+                    context.replication.region_key_kms_arn,
+                )
+                for name, output, replica_arn in buckets
+            },
+        },
+    }
+
+
+def _replication_configuration(
+    source_bucket_name: str, destination_bucket_arn: str, replica_kms_key_arn: str
+) -> Dict:
+    return {
+        "bucket": source_bucket_name,
+        "role": _ref("aws_iam_role.replication_role.arn"),
+        "rule": {
+            "id": "spacelift-dr-replication-rule",
+            "priority": 0,
+            "status": "Enabled",
+            "filter": {"prefix": ""},
+            "destination": {
+                "bucket": destination_bucket_arn,
+                "storage_class": "STANDARD",
+                "encryption_configuration": {"replica_kms_key_id": replica_kms_key_arn},
+            },
+            "delete_marker_replication": {"status": "Enabled"},
+            "source_selection_criteria": {
+                "replica_modifications": {"status": "Enabled"},
+                "sse_kms_encrypted_objects": {"status": "Enabled"},
+            },
+        },
+    }
+
+
+def iot(context: MigrationContext) -> Dict:
+    return {
+        "resource": {
+            "aws_iam_role": {
+                "iot_message_sender_role": {
+                    "name": f"spacelift-iot-{context.config.aws_region}",
+                    "assume_role_policy": _policy(
+                        {
+                            "Version": "2012-10-17",
+                            "Statement": [
+                                {
+                                    "Effect": "Allow",
+                                    "Principal": {"Service": "iot.amazonaws.com"},
+                                    "Action": "sts:AssumeRole",
+                                }
+                            ],
+                        }
+                    ),
+                    "description": "Used by the API Gateway when publishing messages to the webhooks SNS topic",
+                }
+            },
+            "aws_iam_role_policy": {
+                "iot_message_sender_role_policy": {
+                    "name": "allow-iot-sqs-sending",
+                    "role": _ref("aws_iam_role.iot_message_sender_role.id"),
+                    "policy": _policy(
+                        {
+                            "Version": "2012-10-17",
+                            "Statement": [
+                                {
+                                    "Effect": "Allow",
+                                    "Action": [
+                                        "kms:Decrypt",
+                                        "kms:Encrypt",
+                                        "kms:GenerateDataKey*",
+                                    ],
+                                    "Resource": _ref("aws_kms_key.master.arn"),
+                                },
+                                {
+                                    "Effect": "Allow",
+                                    "Action": "sqs:SendMessage",
+                                    "Resource": _ref("aws_sqs_queue.iot_queue.arn"),
+                                },
+                            ],
+                        }
+                    ),
+                }
+            },
+            "aws_iot_topic_rule": {
+                "iot_message_sending_rule": {
+                    "name": "spacelift",
+                    "sql": "SELECT *, Timestamp() as timestamp, topic(3) as worker_pool_ulid, "
+                    "topic(4) as worker_ulid FROM 'spacelift/writeonly/#'",
+                    "sql_version": "2016-03-23",
+                    "description": "Send all messages published in the spacelift namespace to the "
+                    "${aws_sqs_queue.iot_queue.name}",
+                    "enabled": True,
+                    "sqs": {
+                        "role_arn": _ref("aws_iam_role.iot_message_sender_role.arn"),
+                        "queue_url": _ref("aws_sqs_queue.iot_queue.id"),
+                        "use_base64": True,
+                    },
+                }
+            },
+        }
+    }
+
+
+def _subnet_ids(subnet_ids_str: Optional[str]) -> List[str]:
+    if not subnet_ids_str:
+        return [TODO_VALUE]
+    return [subnet_id.strip() for subnet_id in subnet_ids_str.split(",")]
+
+
+def _s3_bucket_configuration(context: MigrationContext) -> Dict:
+    return {
+        key: {"name": bucket.name, "expiration_days": bucket.expiration_days}
+        for key, bucket in context.s3.buckets.items()
+    }
+
+
+def _vpc_config(context: MigrationContext) -> Dict:
+    if context.config.vpc_config and context.config.vpc_config.use_custom_vpc:
+        return {
+            "create_vpc": False,
+            "rds_subnet_ids": _subnet_ids(context.config.vpc_config.private_subnet_ids),
+            "rds_security_group_ids": [context.config.vpc_config.database_security_group_id],
+        }
+
+    return {
+        "vpc_cidr_block": context.network.vpc_cidr_block,
+        "public_subnet_cidr_blocks": context.network.public_subnet_cidr_blocks,
+        "private_subnet_cidr_blocks": context.network.private_subnet_cidr_blocks,
+    }
+
+
+def _rds_config(context: MigrationContext) -> Dict:
+    if context.config.uses_custom_database_connection_string():
+        return {"create_database": False}
+
+    return {
+        "rds_engine_version": context.rds.engine_version,
+        "rds_password_sm_arn": _ref("aws_secretsmanager_secret.db_pw.arn"),
+        "rds_instance_configuration": {
+            "primary": {
+                "instance_identifier": context.rds.instance_identifier,
+                "instance_class": context.rds.instance_class,
+            }
+        },
+        "rds_preferred_backup_window": context.rds.preferred_backup_window,
+        "rds_regional_cluster_identifier": "spacelift",
+        "rds_parameter_group_name": context.rds.parameter_group_name,
+        "rds_subnet_group_name": "spacelift",
+        "rds_parameter_group_description": context.rds.parameter_group_description,
+    }
+
+
+def _kms_encryption_key_arn(context: MigrationContext) -> str:
+    if context.config.is_primary_region():
+        return _ref("aws_kms_key.encryption_primary.arn")
+    return _ref("aws_kms_replica_key.encryption_replica_key.arn")
+
+
+def _sqs_queue_names() -> Dict:
+    return {
+        name: _ref(f"aws_sqs_queue.{queue}.name")
+        for name, queue in [
+            ("deadletter", "deadletter_queue"),
+            ("deadletter_fifo", "deadletter_fifo_queue"),
+            ("async_jobs", "async_jobs_queue"),
+            ("events_inbox", "events_inbox_queue"),
+            ("async_jobs_fifo", "async_jobs_fifo_queue"),
+            ("cronjobs", "cronjobs_queue"),
+            ("webhooks", "webhooks_queue"),
+            ("iot", "iot_queue"),
+        ]
+    }
+
+
+_SECURITY_GROUP_NAMES = {
+    "database": "database_sg",
+    "drain": "drain_sg",
+    "scheduler": "scheduler_sg",
+    "server": "server_sg",
+    "vcs_gateway": "",
+}
+
+
+def main(unique_suffix: Optional[str], context: MigrationContext) -> Dict:
+    required_providers = {"aws": {"source": "hashicorp/aws", "version": "~> 6.0"}}
+    if context.target == TargetType.EKS:
+        required_providers["random"] = {"source": "hashicorp/random", "version": "~> 3.0"}
+
+    comments = []
+    if not (context.config.vpc_config and context.config.vpc_config.use_custom_vpc):
+        comments.append(
+            "Apply this file once internet_gateway_refactor.py script has finished running."
+        )
+    comments.append(
+        "locals.spacelift_version is the tag of the Docker images uploaded to the "
+        '"spacelift" and "spacelift-launcher" ECRs, and locals.license_token must be set to the '
+        "license token you received from Spacelift."
+    )
+    if context.target != TargetType.EKS:
+        comments.append(
+            "The spacelift_services module is in spacelift_services.tf, uncomment it once this "
+            "configuration is applied successfully."
+        )
+
+    configuration: Dict[str, Any] = {
+        "//": "\n".join(comments),
+        "terraform": {"required_providers": required_providers},
+        "provider": {"aws": {"region": _ref("local.region")}},
+        "locals": {
+            "region": context.config.aws_region,
+            "spacelift_version": "v3.0.0",
+            "website_domain": context.s3.cors_origin.replace("https://", ""),
+            "website_endpoint": "https://${local.website_domain}",
+            "license_token": TODO_VALUE,
+        },
+    }
+
+    if context.target == TargetType.EKS:
+        configuration["module"] = {"spacelift_eks": _eks_module(unique_suffix, context)}
+        configuration["output"] = {
+            "shell": {"value": _ref("module.spacelift_eks.shell"), "sensitive": True},
+            "kubernetes_ingress_class": {
+                "value": _ref("module.spacelift_eks.kubernetes_ingress_class")
+            },
+            "kubernetes_secrets": {
+                "sensitive": True,
+                "value": _ref("module.spacelift_eks.kubernetes_secrets"),
+            },
+            "helm_values": {"value": _ref("module.spacelift_eks.helm_values")},
+        }
+    else:
+        configuration["module"] = {"spacelift": _spacelift_module(unique_suffix, context)}
+
+    return configuration
+
+
+def _spacelift_module(unique_suffix: Optional[str], context: MigrationContext) -> Dict:
+    rds_config = _rds_config(context)
+    if "create_database" in rds_config:
+        rds_config["//"] = "RDS resources are untracked by Terraform. Feel free to import them."
+
+    return {
+        "source": "github.com/spacelift-io/terraform-aws-spacelift-selfhosted?ref=v2.2.0",
+        "region": _ref("local.region"),
+        "website_endpoint": _ref("local.website_endpoint"),
+        "unique_suffix": unique_suffix,
+        "s3_bucket_configuration": _s3_bucket_configuration(context),
+        "kms_arn": _ref("aws_kms_key.master.arn"),
+        "kms_master_key_multi_regional": False,
+        "kms_jwt_key_multi_regional": False,
+        **_vpc_config(context),
+        "number_of_images_to_retain": 10,
+        "backend_ecr_repository_name": "spacelift",
+        "launcher_ecr_repository_name": "spacelift-launcher",
+        "security_group_names": _SECURITY_GROUP_NAMES,
+        **rds_config,
+    }
+
+
+def _eks_module(unique_suffix: Optional[str], context: MigrationContext) -> Dict:
+    return {
+        "source": "github.com/spacelift-io/terraform-aws-eks-spacelift-selfhosted?ref=v3.9.0",
+        "eks_upgrade_policy": {"support_type": "STANDARD"},
+        "aws_region": _ref("local.region"),
+        "server_domain": _ref("local.website_domain"),
+        "unique_suffix": unique_suffix,
+        "license_token": _ref("local.license_token"),
+        "spacelift_version": _ref("local.spacelift_version"),
+        "kms_arn": _ref("aws_kms_key.master.arn"),
+        "kms_master_key_multi_regional": False,
+        "kms_jwt_key_multi_regional": False,
+        "s3_bucket_configuration": _s3_bucket_configuration(context),
+        **_vpc_config(context),
+        "number_of_images_to_retain": 10,
+        "backend_ecr_repository_name": "spacelift",
+        "launcher_ecr_repository_name": "spacelift-launcher",
+        "security_group_names": _SECURITY_GROUP_NAMES,
+        "create_sqs": False,
+        **_rds_config(context),
+        "encryption_type": "kms",
+        "kms_encryption_key_arn": _kms_encryption_key_arn(context),
+        "kms_signing_key_arn": _ref("aws_kms_key.jwt.arn"),
+        "mqtt_broker_type": "iotcore",
+        "server_acm_arn": TODO_VALUE,
+        "sqs_queue_names_override": _sqs_queue_names(),
+    }